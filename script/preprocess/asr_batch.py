@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+"""funASR识别的按时长分桶动态批处理。
+
+funasrRun原先把scp按列出顺序一次性交给model.generate，并固定batch_size_s=300，长短录音混在同一批里，
+短录音要按最长录音补齐，浪费CPU时间。本模块从音频文件头读取时长，按时长升序排列后贪心装箱：
+每一批的补齐后总时长（批内条数×批内最长时长）不超过batch_size_s，估算内存不超过max_memory_mb。
+识别结果按批次产出，调用方可以逐批提交，最终再按原始key顺序读出。
+
+经典的使用案例：
+    throughput_dict = {}
+    for rs_list in generateByBucket(model, item_list, tmp_scp_path, batch_size_s=300,
+                                    throughput_dict=throughput_dict):
+        ...
+    print(formatThroughput(throughput_dict))
+"""
+
+from setting import *
+from preprocess.asr_cache import writeScpFile
+from preprocess.prep_audio import getAudioInfo, getSegmentWindow, decodeAudio
+from preprocess.asr_daemon import AsrDaemonClient
+import time
+
+
+def getAudioDuration(audio_path) -> float:
+    """
+    从音频文件头读取时长（秒），不解码音频数据，见prep_audio.getAudioInfo。
+    """
+    return getAudioInfo(audio_path)["duration"]
+
+
+def bucketAudioByDuration(
+    item_list: list,
+    batch_size_s: float = 300.0,
+    max_memory_mb: float = None,
+    mem_per_s_mb: float = 0.5,
+    max_batch_num: int = None,
+    duration_func=getAudioDuration,
+) -> list:
+    """
+    将[(key, 音频路径), ...]按时长升序排列后贪心分批。
+
+    参数：
+    - item_list (list): [(key, 音频路径), ...]。
+    - batch_size_s (float, 默认300): 每批补齐后的总时长上限（秒），即批内条数×批内最长时长。
+    - max_memory_mb (float, 可选): 每批估算内存上限（MB），为None时不限制。
+    - mem_per_s_mb (float, 默认0.5): 每秒补齐后音频估算占用的内存（MB），需按机器和模型实测校准。
+    - max_batch_num (int, 可选): 每批最多条数，用于限制中断时最多损失的识别量。
+    - duration_func (Callable): 由音频路径得到时长（秒）的函数，默认读取文件头。
+
+    返回：
+    - batch_list (list): [[(key, 音频路径, 时长), ...], ...]，批内与批间均按时长升序。
+      单条时长超过预算的音频单独成批。
+    """
+    duration_item_list = sorted(
+        ((key, audio_path, duration_func(audio_path)) for key, audio_path in item_list),
+        key=lambda x: x[2],
+    )
+
+    batch_list = []
+    batch = []
+    for item in duration_item_list:
+        # 升序排列时新加入的音频就是批内最长的一条
+        padded_s = (len(batch) + 1) * item[2]
+        over_budget = padded_s > batch_size_s
+        if max_memory_mb is not None:
+            over_budget = over_budget or padded_s * mem_per_s_mb > max_memory_mb
+        if max_batch_num is not None:
+            over_budget = over_budget or len(batch) >= max_batch_num
+        if batch and over_budget:
+            batch_list.append(batch)
+            batch = []
+        batch.append(item)
+    if batch:
+        batch_list.append(batch)
+
+    return batch_list
+
+
+def _loadAsrInput(audio_path, pcm_store=None, virtual_segment: bool = True):
+    """读取识别用的16k单声道数组，虚拟剪辑清单中有记录时只读取保留区间。"""
+    start, end = (getSegmentWindow(audio_path) if virtual_segment else None) or (0.0, None)
+    if pcm_store is not None:
+        return pcm_store.load(audio_path, start=start, end=end)[0]
+
+    return decodeAudio(audio_path, sr=ASR_SAMPLE_RATE, mono=True, start=start, end=end)[0]
+
+
+def getAsrInputRef(audio_path, pcm_store=None, virtual_segment: bool = True) -> dict:
+    """
+    识别输入的引用（文件路径与区间），交给本机的ASR守护进程自己读取，见asr_daemon模块的通信协议。
+
+    返回：
+        有PCM存储时为{"npy": 规范化PCM的.npy路径, "sr", "start", "end"}，否则为{"audio": 原始音频路径, "sr", "start", "end"}。
+    """
+    start, end = (getSegmentWindow(audio_path) if virtual_segment else None) or (0.0, None)
+    if pcm_store is not None:
+        return {"npy": str(pcm_store.getPcmPath(audio_path)), "sr": pcm_store.sr, "start": start, "end": end}
+
+    return {"audio": os.path.abspath(audio_path), "sr": ASR_SAMPLE_RATE, "start": start, "end": end}
+
+
+def _getAsrInputDuration(audio_path, pcm_store=None, virtual_segment: bool = True) -> float:
+    """识别输入的时长（秒），虚拟剪辑时为保留区间的时长，只读取文件头。"""
+    duration = getAudioDuration(audio_path) if pcm_store is None else pcm_store.getDuration(audio_path)
+    window = getSegmentWindow(audio_path) if virtual_segment else None
+    if window is None:
+        return duration
+
+    return max(min(duration, window[1] or duration) - window[0], 0.0)
+
+
+def _generatePcm(model, key_list: list, pcm_list: list, sr: int, batch_size_s: float) -> list:
+    """以数组作为输入识别。数组没有文件名，AutoModel按输入顺序返回结果，逐条回填key；守护进程客户端按key回填。"""
+    if isinstance(model, AsrDaemonClient):
+        return model.generate(input=pcm_list, batch_size_s=batch_size_s, sr=sr, key=key_list)
+    rs_list = model.generate(input=pcm_list, fs=sr, batch_size_s=batch_size_s)
+
+    return [{**record, "key": key} for key, record in zip(key_list, rs_list)]
+
+
+def generateByBucket(
+    model,
+    item_list: list,
+    tmp_scp_path: Path,
+    batch_size_s: float = 300.0,
+    max_memory_mb: float = None,
+    mem_per_s_mb: float = 0.5,
+    max_batch_num: int = None,
+    throughput_dict: dict = None,
+    pcm_store=None,
+    virtual_segment: bool = True,
+):
+    """
+    按时长分桶后逐批调用model.generate，每识别完一批产出该批的结果列表。
+
+    参数：
+    - model: loadAsrModel返回的AutoModel实例。
+    - item_list (list): [(key, 音频路径), ...]。
+    - tmp_scp_path (Path): 每批写入的临时scp路径，全部完成后删除。
+    - batch_size_s、max_memory_mb、mem_per_s_mb、max_batch_num: 见bucketAudioByDuration。
+    - throughput_dict (dict, 可选): 传入时原地累计"audio_s"（音频总秒数）、"wall_s"（识别耗时）、
+      "batch_num"（批数），可交给formatThroughput输出吞吐报告。
+    - pcm_store (PcmStore, 可选): 给出时从规范化PCM存储读取16k单声道数组直接交给模型，不再写临时scp、由funASR重新解码。
+    - virtual_segment (bool): 为True时虚拟剪辑清单中有记录的音频（见prep_audio.getSegmentWindow）只识别保留区间，
+      时间戳相对于区间起点；为False时识别完整音频。
+
+    产出：
+    - rs_list (list): 一批的识别结果，元素结构与model.generate一致。
+    """
+    if throughput_dict is None:
+        throughput_dict = {}
+    for field in ("audio_s", "wall_s", "batch_num"):
+        throughput_dict.setdefault(field, 0)
+
+    batch_list = bucketAudioByDuration(
+        item_list,
+        batch_size_s=batch_size_s,
+        max_memory_mb=max_memory_mb,
+        mem_per_s_mb=mem_per_s_mb,
+        max_batch_num=max_batch_num,
+        duration_func=lambda audio_path: _getAsrInputDuration(audio_path, pcm_store, virtual_segment),
+    )
+    for batch in batch_list:
+        start = time.perf_counter()
+        is_trimmed = virtual_segment and any(getSegmentWindow(audio_path) is not None for _, audio_path, _ in batch)
+        if pcm_store is None and not is_trimmed:
+            writeScpFile([(key, audio_path) for key, audio_path, _ in batch], tmp_scp_path)
+            rs_list = model.generate(input=str(tmp_scp_path), batch_size_s=batch_size_s)
+        elif isinstance(model, AsrDaemonClient) and model.isLocal():
+            # 本机守护进程自己读取同一份PCM或原始音频，只发送路径与区间，不把数组编码后经TCP传输
+            key_list = [key for key, _, _ in batch]
+            ref_list = [getAsrInputRef(audio_path, pcm_store, virtual_segment) for _, audio_path, _ in batch]
+            rs_list = model.generate(input=ref_list, batch_size_s=batch_size_s, key=key_list)
+        else:
+            key_list = [key for key, _, _ in batch]
+            pcm_list = [_loadAsrInput(audio_path, pcm_store, virtual_segment) for _, audio_path, _ in batch]
+            sr = ASR_SAMPLE_RATE if pcm_store is None else pcm_store.sr
+            rs_list = _generatePcm(model, key_list, pcm_list, sr, batch_size_s)
+        throughput_dict["wall_s"] += time.perf_counter() - start
+        throughput_dict["audio_s"] += sum(duration for _, _, duration in batch)
+        throughput_dict["batch_num"] += 1
+        yield rs_list
+
+    if os.path.exists(tmp_scp_path):
+        os.remove(tmp_scp_path)
+
+
+def formatThroughput(throughput_dict: dict) -> str:
+    """将generateByBucket累计的吞吐信息格式化为一行报告，吞吐以每秒墙钟时间识别的音频秒数表示。"""
+    wall_s = throughput_dict.get("wall_s", 0)
+    audio_s = throughput_dict.get("audio_s", 0)
+    speed = audio_s / wall_s if wall_s > 0 else float("nan")
+
+    return (
+        f"{throughput_dict.get('batch_num', 0)} batches, {audio_s:.1f} audio-s in {wall_s:.1f} wall-s, "
+        f"throughput {speed:.2f} audio-s/wall-s"
+    )
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+"""以音频内容哈希+模型版本为键的逐条ASR结果缓存。
+
+funasrRun原先以输出文件名（resultJson/<scp>.json）作为缓存，scp新增一个文件就要整体重新识别，
+改名或重复的音频也会被再次识别。本模块把每条识别结果按 (音频内容sha1, 模型组合) 单独存放，
+scp识别时只需把未命中的音频交给model.generate，命中的结果直接合并。
+
+缓存目录结构：
+    ASR_CACHE_DIR / <model_tag> / <hash前两位> / <hash>.json
+    ASR_CACHE_DIR / hash_index.json  # 路径 -> [文件大小, 修改时间, 哈希]，避免每次重算未变化文件的哈希
+
+经典的使用案例：
+    model_tag = getAsrModelTag(model, vad_model, punc_model, model_revision)
+    hash_index = loadHashIndex()
+    audio_hash = getAudioHash(audio_path, hash_index)
+    record = readAsrCache(audio_hash, model_tag)
+    if record is None:
+        record = model.generate(input=audio_path)[0]
+        writeAsrCache(audio_hash, model_tag, record)
+    saveHashIndex(hash_index)
+"""
+
+from setting import *
+from util import calFileHash
+import hashlib
+import json
+
+HASH_INDEX_NAME = "hash_index.json"
+
+
+def getAsrModelTag(
+        model: str = ASR_MODEL,
+        vad_model: str = ASR_VAD_MODEL,
+        punc_model: str = ASR_PUNC_MODEL,
+        model_revision: str = ASR_MODEL_REVISION,
+) -> str:
+    """
+    由模型组合生成缓存分区名。任一组件或版本变化都会得到不同的分区，旧结果不会被误用。
+
+    返回：
+    - model_tag (str): 形如"v2.0.4_1a2b3c4d5e"的字符串，前缀为模型版本号便于人工辨认。
+    """
+    model_str = "|".join(str(m) for m in (model, vad_model, punc_model, model_revision))
+    model_tag = model_revision + "_" + hashlib.sha1(model_str.encode("utf-8")).hexdigest()[:10]
+
+    return model_tag
+
+
+def loadHashIndex(cache_dir: Path = ASR_CACHE_DIR) -> dict:
+    """读取路径到内容哈希的索引，结构为{绝对路径: [文件大小, 修改时间ns, 哈希]}，不存在时返回空字典。"""
+    index_path = cache_dir / HASH_INDEX_NAME
+    if not index_path.exists():
+        return {}
+    with open(index_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def saveHashIndex(hash_index: dict, cache_dir: Path = ASR_CACHE_DIR):
+    """将路径到内容哈希的索引写回缓存目录。先写临时文件再替换，避免中断时留下损坏的索引。"""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    index_path = cache_dir / HASH_INDEX_NAME
+    tmp_path = cache_dir / (HASH_INDEX_NAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(hash_index, f, ensure_ascii=False)
+    os.replace(tmp_path, index_path)
+
+
+def getAudioHash(audio_path, hash_index: dict = None) -> str:
+    """
+    获取音频文件的内容哈希。若hash_index中记录的文件大小与修改时间未变，直接返回记录的哈希，否则重新计算并更新索引。
+
+    参数：
+    - audio_path (Path 或 str): 音频文件路径。
+    - hash_index (dict, 可选): loadHashIndex返回的索引，会被原地更新。
+
+    返回：
+    - audio_hash (str): 音频文件内容的sha1。
+    """
+    abs_path = os.path.abspath(audio_path)
+    stat = os.stat(abs_path)
+    if hash_index is not None:
+        cached = hash_index.get(abs_path)
+        if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+    audio_hash = calFileHash(abs_path)
+    if hash_index is not None:
+        hash_index[abs_path] = [stat.st_size, stat.st_mtime_ns, audio_hash]
+
+    return audio_hash
+
+
+def _getCachePath(audio_hash: str, model_tag: str, cache_dir: Path) -> Path:
+    return cache_dir / model_tag / audio_hash[:2] / (audio_hash + ".json")
+
+
+def readAsrCache(audio_hash: str, model_tag: str, cache_dir: Path = ASR_CACHE_DIR):
+    """
+    读取单条缓存的识别结果。
+
+    返回：
+    - record (dict 或 None): {"text": str, "timestamp": list}，未命中时返回None。记录中不含key，由调用方按scp填充。
+    """
+    cache_path = _getCachePath(audio_hash, model_tag, cache_dir)
+    if not cache_path.exists():
+        return None
+    with open(cache_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def writeAsrCache(audio_hash: str, model_tag: str, record: dict, cache_dir: Path = ASR_CACHE_DIR):
+    """
+    写入单条识别结果。record中的key与音频文件名相关，不写入缓存，其余字段原样保存。
+    """
+    cache_path = _getCachePath(audio_hash, model_tag, cache_dir)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    cache_record = {k: v for k, v in record.items() if k != "key"}
+    tmp_path = cache_path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache_record, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+
+
+def readScpFile(scp_path) -> list:
+    """读取scp文件，返回[(key, 音频路径), ...]，格式与prep_extract.getScpFile写入的一致。"""
+    item_list = []
+    with open(scp_path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            key, audio_path = line.split(maxsplit=1)
+            item_list.append((key, audio_path))
+
+    return item_list
+
+
+def writeScpFile(item_list: list, scp_path):
+    """将[(key, 音频路径), ...]写成scp文件。"""
+    with open(scp_path, "w") as f:
+        for key, audio_path in item_list:
+            f.write(f"{key} {str(audio_path).replace(os.sep, '/')}\n")
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+
+"""常驻本地的funASR识别守护进程及其客户端。
+
+每次运行dsme.py或run_v2.main都要经历解释器启动、funasr导入、模型加载，之后才能识别第一条音频。
+守护进程在本地端口上常驻并保持模型预热，funasrRun通过AsrDaemonClient把识别任务发给守护进程，
+返回与model.generate相同的{"key", "text", "timestamp"}记录；守护进程未运行时funasrRun退回进程内识别。
+守护进程在本机时只发送文件路径与区间，由守护进程自己读取PCM存储中的.npy或解码原始音频，音频数据不经TCP传输；
+只有连接其它主机上的守护进程时才把数组编码为base64发送。
+
+通信协议为每行一个JSON的请求/响应：
+    请求：{"op": "ping"}
+          {"op": "generate", "model_config": [model, vad_model, punc_model, model_revision],
+           "batch_size_s": 300, "items": [识别条目, ...]}
+    识别条目：{"key": str, "path": str}                                   # 整条音频，经scp交给funASR
+              {"key": str, "npy": PCM存储中的.npy路径, "sr": int, "start": 秒, "end": 秒或null}
+              {"key": str, "audio": 原始音频路径, "sr": int, "start": 秒, "end": 秒或null}
+              {"key": str, "pcm": base64的float32, "sr": int}
+    响应：{"ok": true, "rs": [记录, ...]} 或 {"ok": false, "error": str}
+
+经典的使用案例：
+    1) 启动守护进程（阻塞运行，另开终端执行）
+    python -m preprocess.asr_daemon --port 10096
+
+    2) 在识别代码中优先使用守护进程，模型组合须与守护进程预热的一致（默认都不加载标点模型）
+    model = connectAsrDaemon()
+    if model is None:
+        model = loadAsrModel(punc_model=None)
+    rs_list = model.generate(input="data/scp/qilai.scp", batch_size_s=300)
+"""
+
+from setting import *
+from preprocess.asr_cache import readScpFile, writeScpFile
+import base64
+import tempfile
+import json
+import socket
+import socketserver
+import threading
+import numpy as np
+
+# 视为本机的守护进程地址，只有本机守护进程才能直接读取客户端给出的文件路径
+LOCAL_HOST_LIST = ["127.0.0.1", "localhost", "::1"]
+
+
+def _sendMessage(sock_file, message: dict):
+    sock_file.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+    sock_file.flush()
+
+
+def _recvMessage(sock_file):
+    line = sock_file.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+class AsrDaemonClient(object):
+    """守护进程的客户端，提供与AutoModel.generate相同的调用方式，可直接替换进程内模型使用。
+
+    属性：
+        model_config(tuple): (model, vad_model, punc_model, model_revision)，守护进程按此组合取用预热模型。
+            默认不加载标点模型，与runAsrDaemon预热的组合及流水线中各funasrRun调用方一致。
+        host(str): 守护进程地址。
+        port(int): 守护进程端口。
+        timeout(float): 单次请求的超时秒数，None表示不超时。
+    """
+
+    def __init__(
+        self,
+        model: str = ASR_MODEL,
+        vad_model: str = ASR_VAD_MODEL,
+        punc_model: str = None,
+        model_revision: str = ASR_MODEL_REVISION,
+        host: str = ASR_DAEMON_HOST,
+        port: int = ASR_DAEMON_PORT,
+        timeout: float = None,
+    ):
+        self.model_config = (model, vad_model, punc_model, model_revision)
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def request(self, message: dict, connect_timeout: float = None) -> dict:
+        """发送一条请求并等待响应，连接失败时抛出OSError。"""
+        with socket.create_connection((self.host, self.port), timeout=connect_timeout) as sock:
+            sock.settimeout(self.timeout)
+            with sock.makefile("rwb") as sock_file:
+                _sendMessage(sock_file, message)
+                response = _recvMessage(sock_file)
+        if response is None:
+            raise ConnectionError("ASR daemon closed the connection")
+        if not response["ok"]:
+            raise RuntimeError(f"ASR daemon error: {response['error']}")
+
+        return response
+
+    def isLocal(self) -> bool:
+        """守护进程是否在本机，本机时可以只发送文件路径，由守护进程自己读取音频。"""
+        return self.host in LOCAL_HOST_LIST
+
+    def ping(self, connect_timeout: float = 0.5) -> bool:
+        """检查守护进程是否在运行。"""
+        try:
+            self.request({"op": "ping"}, connect_timeout=connect_timeout)
+        except OSError:
+            return False
+        return True
+
+    def generate(self, input=None, batch_size_s: float = 300, sr: int = ASR_SAMPLE_RATE, key: list = None) -> list:
+        """
+        把识别任务发给守护进程。
+
+        参数：
+            input: scp文件路径、单个音频路径，由16k单声道float32数组组成的列表，
+                或由音频引用（见asr_batch.getAsrInputRef，{"npy"或"audio": 路径, "sr", "start", "end"}）组成的列表。
+                引用只能发给本机的守护进程。
+            batch_size_s (float): 透传给守护进程中model.generate的batch_size_s。
+            sr (int): input为数组时的采样率。
+            key (list, 可选): input为列表时每条对应的key，缺省为"pcm_<序号>"。
+
+        返回：
+            与AutoModel.generate相同结构的记录列表。
+        """
+        if isinstance(input, (list, tuple)):
+            if key is None:
+                key = [f"pcm_{i}" for i in range(len(input))]
+            item_list = [
+                {"key": k, **pcm} if isinstance(pcm, dict) else {
+                    "key": k,
+                    "pcm": base64.b64encode(np.asarray(pcm, dtype=np.float32).tobytes()).decode("ascii"),
+                    "sr": sr,
+                }
+                for k, pcm in zip(key, input)
+            ]
+        elif str(input).endswith(".scp"):
+            item_list = [
+                {"key": k, "path": os.path.abspath(p)} for k, p in readScpFile(input)
+            ]
+        else:
+            item_list = [{"key": re.sub(r"\..*", "", os.path.basename(input)), "path": os.path.abspath(input)}]
+
+        response = self.request(
+            {
+                "op": "generate",
+                "model_config": list(self.model_config),
+                "batch_size_s": batch_size_s,
+                "items": item_list,
+            }
+        )
+
+        return response["rs"]
+
+
+def connectAsrDaemon(
+    model: str = ASR_MODEL,
+    vad_model: str = ASR_VAD_MODEL,
+    punc_model: str = None,
+    model_revision: str = ASR_MODEL_REVISION,
+    host: str = ASR_DAEMON_HOST,
+    port: int = ASR_DAEMON_PORT,
+):
+    """守护进程在运行时返回AsrDaemonClient，否则返回None，由调用方退回进程内识别。"""
+    client = AsrDaemonClient(model, vad_model, punc_model, model_revision, host=host, port=port)
+    if client.ping():
+        return client
+    return None
+
+
+def _loadItemPcm(item: dict) -> np.ndarray:
+    """读取一条数组形式的识别条目：base64数组直接解码，.npy按mmap读取区间并还原为float32，原始音频解码区间。"""
+    if "pcm" in item:
+        return np.frombuffer(base64.b64decode(item["pcm"]), dtype=np.float32)
+
+    sr, start, end = item["sr"], item.get("start", 0.0), item.get("end")
+    if "npy" in item:
+        from preprocess.pcm_store import pcmToFloat
+
+        y = np.load(item["npy"], mmap_mode="r")
+        return pcmToFloat(y[int(round(start * sr)): None if end is None else int(round(end * sr))])
+
+    from preprocess.prep_audio import decodeAudio
+
+    return decodeAudio(item["audio"], sr=sr, mono=True, start=start, end=end)[0]
+
+
+class _AsrDaemonHandler(socketserver.StreamRequestHandler):
+    """处理单个连接上的请求，同一时刻只允许一个识别任务占用模型。"""
+
+    def handle(self):
+        while True:
+            try:
+                message = _recvMessage(self.rfile)
+            except ValueError as e:
+                _sendMessage(self.wfile, {"ok": False, "error": f"bad request: {e}"})
+                return
+            if message is None:
+                return
+            try:
+                response = self.server.dispatch(message)
+            except Exception as e:
+                response = {"ok": False, "error": repr(e)}
+            _sendMessage(self.wfile, response)
+
+
+class AsrDaemonServer(socketserver.ThreadingTCPServer):
+    """持有预热模型的守护进程服务端，模型通过funasr_go.loadAsrModel按组合缓存。"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = ASR_DAEMON_HOST, port: int = ASR_DAEMON_PORT):
+        super().__init__((host, port), _AsrDaemonHandler)
+        self.generate_lock = threading.Lock()
+
+    def dispatch(self, message: dict) -> dict:
+        from preprocess.funasr_go import loadAsrModel
+
+        if message["op"] == "ping":
+            return {"ok": True}
+        if message["op"] != "generate":
+            return {"ok": False, "error": f"unknown op {message['op']}"}
+
+        model_name, vad_model, punc_model, model_revision = message["model_config"]
+        item_list = message["items"]
+        batch_size_s = message.get("batch_size_s", 300)
+        path_item_list = [item for item in item_list if "path" in item]
+        pcm_item_list = [item for item in item_list if "path" not in item]
+
+        rs_dict = {}
+        with self.generate_lock:
+            model = loadAsrModel(model_name, vad_model, punc_model, model_revision)
+            if path_item_list:
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    scp_path = Path(tmp_dir) / "daemon.scp"
+                    writeScpFile([(item["key"], item["path"]) for item in path_item_list], scp_path)
+                    for record in model.generate(input=str(scp_path), batch_size_s=batch_size_s):
+                        rs_dict[record["key"]] = record
+            if pcm_item_list:
+                pcm_list = [_loadItemPcm(item) for item in pcm_item_list]
+                rs_list = model.generate(
+                    input=pcm_list, fs=pcm_item_list[0]["sr"], batch_size_s=batch_size_s
+                )
+                # 数组输入没有文件名，结果按输入顺序返回，逐条回填key
+                for item, record in zip(pcm_item_list, rs_list):
+                    rs_dict[item["key"]] = {**record, "key": item["key"]}
+
+        return {"ok": True, "rs": [rs_dict[item["key"]] for item in item_list]}
+
+
+def runAsrDaemon(
+    host: str = ASR_DAEMON_HOST,
+    port: int = ASR_DAEMON_PORT,
+    preload: bool = True,
+    punc_model: str = None,
+):
+    """
+    启动守护进程并阻塞运行。preload为True时先加载默认模型组合，第一条请求无需等待模型加载。
+
+    流水线中的funasrRun调用方（batch_funasr_run、batch_audio_catog、batch_audio_seg）都不加载标点模型，
+    因此默认预热不带标点模型的组合；需要带标点的结果时以punc_model=ASR_PUNC_MODEL启动。
+    """
+    from preprocess.funasr_go import loadAsrModel
+
+    if preload:
+        loadAsrModel(punc_model=punc_model)
+    with AsrDaemonServer(host, port) as server:
+        print(f"runAsrDaemon: ASR daemon is listening on {host}:{port}")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="funASR常驻识别守护进程")
+    parser.add_argument("--host", default=ASR_DAEMON_HOST)
+    parser.add_argument("--port", type=int, default=ASR_DAEMON_PORT)
+    parser.add_argument("--no-preload", action="store_true")
+    parser.add_argument("--punc-model", default=None, help="预热的标点模型，缺省不加载")
+    args = parser.parse_args()
+    runAsrDaemon(host=args.host, port=args.port, preload=not args.no_preload, punc_model=args.punc_model)
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+"""funASR批量识别结果的流式JSONL存储。
+
+每条识别结果{"key", "text", "timestamp"}在产生后立即追加为JSONL中的一行，同时在旁路索引文件中追加
+"偏移量\\tkey"一行。索引行写入即视为该条记录已提交，因此：
+- 识别过程中内存只需保存当前批次的结果；
+- 中断后重新运行时，已提交的key会被跳过，未写完的半行会被截断；
+- 读取方可以逐条流式遍历，也可以通过索引按key在O(1)时间内定位单条记录。
+
+文件结构：
+    resultJson/<scp_name>.jsonl      # 每行一条识别结果，utf-8编码
+    resultJson/<scp_name>.jsonl.idx  # 每行"偏移量\\tkey"
+
+经典的使用案例：
+    store = AsrResultStore(DOWNLOAD_DIR / "qilai.jsonl")
+    if "qilai_1" not in store:
+        store.append({"key": "qilai_1", "text": "起来", "timestamp": [[0, 100], [100, 300]]})
+    record = store["qilai_1"]
+    for record in store:
+        print(record["key"])
+    store.close()
+"""
+
+from setting import *
+import json
+import threading
+
+
+class AsrResultStore(object):
+    """追加写入、按key随机读取的JSONL识别结果存储。
+
+    属性：
+        store_path(Path): JSONL文件路径。
+        index_path(Path): 旁路索引文件路径，为store_path追加".idx"后缀。
+        offset_dict(dict): key到记录起始字节偏移量的映射，按提交顺序排列。
+    """
+
+    def __init__(self, store_path: Path):
+        """打开（或新建）store_path处的存储，并从上次最后一条已提交的记录处恢复。"""
+        self.store_path = Path(store_path)
+        self.index_path = Path(str(store_path) + ".idx")
+        self.offset_dict = {}
+        self._append_file = None
+        self._index_file = None
+        self._read_file = None
+        self._read_lock = threading.Lock()
+
+        self.store_path.parent.mkdir(parents=True, exist_ok=True)
+        self._recover()
+
+    def _recover(self):
+        """读取索引，补齐索引缺失但已完整写入的记录，并截断末尾未写完的半行。"""
+        if self.index_path.exists():
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break
+                    offset, key = line.rstrip("\n").split("\t", 1)
+                    self.offset_dict[key] = int(offset)
+
+        if not self.store_path.exists():
+            open(self.store_path, "wb").close()
+
+        # 从最后一条完整的已索引记录之后开始扫描JSONL，指向不完整数据的索引项直接丢弃
+        scan_offset = 0
+        with open(self.store_path, "rb") as f:
+            for key, offset in sorted(self.offset_dict.items(), key=lambda x: x[1], reverse=True):
+                f.seek(offset)
+                line = f.readline()
+                if line.endswith(b"\n"):
+                    scan_offset = f.tell()
+                    break
+                del self.offset_dict[key]
+            recovered_list = []
+            for line in iter(f.readline, b""):
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                recovered_list.append((scan_offset, record["key"]))
+                scan_offset += len(line)
+
+        # 截断未提交的半行，并重写索引，保证索引与数据一致
+        with open(self.store_path, "r+b") as f:
+            f.truncate(scan_offset)
+        for offset, key in recovered_list:
+            self.offset_dict[key] = offset
+        with open(self.index_path, "w", encoding="utf-8") as f:
+            for key, offset in self.offset_dict.items():
+                f.write(f"{offset}\t{key}\n")
+
+    def append(self, record: dict):
+        """追加一条识别结果并立即提交。同一key重复追加时，按key读取返回最后一次写入的记录。"""
+        if self._append_file is None:
+            self._append_file = open(self.store_path, "ab")
+            self._index_file = open(self.index_path, "a", encoding="utf-8")
+
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        offset = self._append_file.tell()
+        self._append_file.write(line)
+        self._append_file.flush()
+        # 数据行落盘后再写索引行，索引行即提交标记
+        self._index_file.write(f"{offset}\t{record['key']}\n")
+        self._index_file.flush()
+        self.offset_dict[record["key"]] = offset
+
+    def get(self, key: str, default=None):
+        """按key通过偏移量索引直接定位并读取一条记录，不存在时返回default。"""
+        offset = self.offset_dict.get(key)
+        if offset is None:
+            return default
+        with self._read_lock:
+            if self._read_file is None:
+                self._read_file = open(self.store_path, "rb")
+            self._read_file.seek(offset)
+            line = self._read_file.readline()
+
+        return json.loads(line)
+
+    def __getitem__(self, key: str) -> dict:
+        record = self.get(key)
+        if record is None:
+            raise KeyError(key)
+        return record
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.offset_dict
+
+    def __len__(self) -> int:
+        return len(self.offset_dict)
+
+    def __iter__(self):
+        """按文件顺序流式遍历已提交的记录，每次只解析一行。"""
+        committed_offset_set = set(self.offset_dict.values())
+        with open(self.store_path, "rb") as f:
+            offset = 0
+            for line in f:
+                if offset in committed_offset_set:
+                    record = json.loads(line)
+                    # 同一key被重复写入时只返回最后一次提交的记录
+                    if self.offset_dict[record["key"]] == offset:
+                        yield record
+                offset += len(line)
+
+    def keys(self) -> list:
+        return list(self.offset_dict.keys())
+
+    def close(self):
+        """关闭打开的文件句柄，已提交的数据不受影响。"""
+        for f in (self._append_file, self._index_file, self._read_file):
+            if f is not None:
+                f.close()
+        self._append_file = self._index_file = self._read_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __getstate__(self):
+        """跨进程传递时只传路径和索引，文件句柄在子进程中按需重新打开。"""
+        return {"store_path": self.store_path, "index_path": self.index_path, "offset_dict": self.offset_dict}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._append_file = self._index_file = self._read_file = None
+        self._read_lock = threading.Lock()
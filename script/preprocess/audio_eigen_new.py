@@ -3,27 +3,277 @@
 """
 
 此模块主要用于处理音频信号并提取每个单词的基频特征。主要包括两个核心函数：
-1. `calAudioFreq`：利用Librosa库中的Pyin算法估算音频中的基频及其对应时间戳。
+1. `calAudioFreq`：估算音频中的基频及其对应时间戳，基频估计算法（backend）可按运行选择：
+   - "pyin"：librosa.pyin，带Viterbi解码的概率YIN，最准确也最慢，用于最终评分；
+   - "yin"：librosa.yin，向量化YIN，配合RMS能量门限判断清浊音；
+   - "acf"：纯NumPy的归一化自相关基频跟踪，以自相关峰值与能量作为简单的清浊音判断，最快。
+   后两者以少量精度换取数倍到数十倍的吞吐，适合批量初筛。各算法帧长、帧移一致，返回结构相同。
 2. `getPerWordFeat`：结合单词起止时间和全局基频信息，计算每个字在有效发音区间内的基频特征。
+   各字的帧范围通过在有序时间戳上searchsorted得到，全部字的中位数基频在一次向量化运算中算出。
 
 pyin算法相关资料：
 https://librosa.org/doc/latest/generated/librosa.pyin.html#librosa.pyin
 """
 
 from setting import *
+from util import lazyImport, getAnalysisConfig
+from preprocess.word_timeline import WordTimeline, asWordTimeline
 import numpy as np
-import librosa
+
+librosa = lazyImport("librosa")
+
+
+def _pyinBackend(y, sr, fmin, fmax, frame_length, hop_length, **kwargs) -> tuple:
+    """librosa.pyin，返回(基频, 发声概率)，未发声帧基频为nan。"""
+    freq_array, voiced_flag, voiced_probs = librosa.pyin(
+        y=y, sr=sr, fmin=fmin, fmax=fmax, frame_length=frame_length, hop_length=hop_length
+    )
+    return freq_array, voiced_probs
+
+
+def _rmsBackend(y, sr, fmin, fmax, frame_length, hop_length, **kwargs) -> np.ndarray:
+    """逐帧RMS能量，分帧与基频估计算法一致，用于分段计算时求整条音频的最大帧能量。"""
+    return librosa.feature.rms(y=y, frame_length=frame_length, hop_length=hop_length)[0]
+
+
+def _rmsVoicedMask(y, frame_length, hop_length, top_db, rms_ref: float = None) -> np.ndarray:
+    """
+    按帧RMS能量判断发声帧：比参考能量rms_ref低top_db分贝以上的帧视为静音。帧划分与pyin一致（center=True）。
+    rms_ref缺省时以本段最响帧为参考；分段计算时传入整条音频的最大帧能量，保证各段门限一致。
+    """
+    rms = _rmsBackend(y, None, None, None, frame_length, hop_length)
+    return librosa.amplitude_to_db(rms, ref=np.max if rms_ref is None else rms_ref) > -top_db
+
+
+def _yinBackend(
+    y, sr, fmin, fmax, frame_length, hop_length, top_db: float = 40.0, rms_ref: float = None, **kwargs
+) -> tuple:
+    """
+    librosa.yin不区分清浊音，对每帧都给出基频，这里用RMS能量门限把静音帧置为nan。
+    yin没有发声概率，返回的发声概率为能量门限的判断结果（0或1）。
+    """
+    freq_array = librosa.yin(
+        y, fmin=fmin, fmax=fmax, sr=sr, frame_length=frame_length, hop_length=hop_length
+    )
+    is_voiced = _rmsVoicedMask(y, frame_length, hop_length, top_db, rms_ref)
+    freq_array[~is_voiced] = np.nan
+    return freq_array, is_voiced.astype(np.float64)
+
+
+def _acfBackend(
+    y,
+    sr,
+    fmin,
+    fmax,
+    frame_length,
+    hop_length,
+    top_db: float = 40.0,
+    voicing_threshold: float = 0.5,
+    octave_ratio: float = 0.9,
+    rms_ref: float = None,
+    block_size: int = 512,
+    **kwargs,
+) -> np.ndarray:
+    """
+    归一化自相关基频跟踪，全部用NumPy实现。
+
+    每帧用FFT计算自相关并做无偏归一化，在[sr/fmax, sr/fmin]的时延范围内、越过第一个过零点之后，
+    取峰值不低于最大峰octave_ratio倍的最小时延局部峰，再用抛物线插值得到亚采样精度的周期。峰值低于voicing_threshold或能量低于门限的帧视为未发声（nan）。
+    返回(基频, 发声概率)，发声概率取归一化自相关峰值（截断到[0, 1]），能量低于门限的帧为0。
+    帧按block_size分块计算，内存占用与音频长度无关。
+    """
+    y = np.asarray(y, dtype=np.float64)
+    # 与pyin相同的center=True分帧：两端各补frame_length//2个0，帧数为1 + len(y)//hop_length
+    y_pad = np.pad(y, frame_length // 2)
+    frame_num = 1 + len(y) // hop_length
+    frame_matrix = np.lib.stride_tricks.sliding_window_view(y_pad, frame_length)[::hop_length][:frame_num]
+
+    lag_min = max(int(np.floor(sr / fmax)), 1)
+    lag_max = min(int(np.ceil(sr / fmin)), frame_length - 2)
+    lag_array = np.arange(lag_max + 2)
+    unbias_array = frame_length / (frame_length - lag_array)
+
+    freq_array = np.full(frame_num, np.nan)
+    prob_array = np.zeros(frame_num)
+    for block_start in range(0, frame_num, block_size):
+        frames = frame_matrix[block_start:block_start + block_size]
+        frames = frames - frames.mean(axis=1, keepdims=True)
+        spec = np.fft.rfft(frames, n=2 * frame_length, axis=1)
+        acf = np.fft.irfft(spec.real ** 2 + spec.imag ** 2, axis=1)[:, :lag_max + 2]
+        energy = acf[:, :1]
+        acf = acf * unbias_array / np.where(energy > 0, energy, 1.0)
+
+        # 第一个过零点之前的小时延区间由主瓣主导，不是周期峰
+        first_neg = np.argmax(acf < 0, axis=1)
+        first_neg[~(acf < 0).any(axis=1)] = lag_max + 2
+        search = acf.copy()
+        search[:, (lag_array < lag_min) | (lag_array > lag_max)] = -np.inf
+        search[lag_array < first_neg[:, None]] = -np.inf
+        # 无偏归一化后周期的整数倍处峰值几乎相同，取不低于最大峰octave_ratio倍的最小时延局部峰，避免低八度错误
+        is_peak = np.zeros_like(search, dtype=bool)
+        is_peak[:, 1:-1] = (search[:, 1:-1] >= search[:, :-2]) & (search[:, 1:-1] > search[:, 2:])
+        max_peak = np.max(np.where(is_peak, search, -np.inf), axis=1, keepdims=True)
+        peak_lag = np.argmax(is_peak & (search >= octave_ratio * max_peak), axis=1)
+        row = np.arange(len(acf))
+        peak = search[row, peak_lag]
+
+        # 抛物线插值修正峰值位置
+        left = acf[row, np.maximum(peak_lag - 1, 0)]
+        right = acf[row, peak_lag + 1]
+        denom = left - 2 * acf[row, peak_lag] + right
+        shift = np.where(denom < 0, 0.5 * (left - right) / np.where(denom < 0, denom, -1.0), 0.0)
+        # 没有候选峰的帧peak_lag为0，随后按未发声处理，这里只避免除零
+        block_freq = sr / np.maximum(peak_lag + np.clip(shift, -0.5, 0.5), 1.0)
+
+        voiced = np.isfinite(peak) & (peak >= voicing_threshold) & (energy[:, 0] > 0)
+        freq_array[block_start:block_start + len(acf)] = np.where(voiced, block_freq, np.nan)
+        prob_array[block_start:block_start + len(acf)] = np.clip(np.where(np.isfinite(peak), peak, 0.0), 0.0, 1.0)
+
+    is_silent = ~_rmsVoicedMask(y, frame_length, hop_length, top_db, rms_ref)
+    freq_array[is_silent] = np.nan
+    prob_array[is_silent] = 0.0
+    freq_array[(freq_array < fmin) | (freq_array > fmax)] = np.nan
+    return freq_array, prob_array
+
+
+def mergeWordSpan(span_list, pad_s: float = PITCH_SPAN_PAD_S) -> list:
+    """
+    将字的起止时间两侧各扩展pad_s秒后合并为互不重叠的发声区间。
+
+    参数：
+        span_list: WordTimeline、含"eigen_list"的字典，或[(起始秒, 结束秒), ...]。
+        pad_s(float): 每个字两侧扩展的秒数，默认值见setting.PITCH_SPAN_PAD_S。
+    返回：
+        按时间升序、互不重叠的[(起始秒, 结束秒), ...]，起始时间不小于0。
+    """
+    if isinstance(span_list, (WordTimeline, dict)):
+        start_array, end_array = asWordTimeline(span_list).getBoundary()
+        span_list = zip(start_array.tolist(), end_array.tolist())
+
+    merged_list = []
+    for start, end in sorted(span_list):
+        start, end = max(start - pad_s, 0.0), end + pad_s
+        if merged_list and start <= merged_list[-1][1]:
+            merged_list[-1][1] = max(merged_list[-1][1], end)
+        else:
+            merged_list.append([start, end])
+
+    return [tuple(span) for span in merged_list]
+
+
+def _iterFrameRange(
+    backend_func,
+    y,
+    sr,
+    fmin,
+    fmax,
+    frame_length,
+    hop_length,
+    first: int,
+    last: int,
+    chunk_frames: int = None,
+    overlap_frames: int = 0,
+    **kwargs
+):
+    """
+    分块计算全局第first到第last帧（含）的逐帧结果，每次产出(块起始帧, 该块结果)。
+    backend_func返回多个逐帧数组组成的元组时，块结果为按相同帧范围截取的元组。
+
+    每块截取音频时在两侧各多取context个帧移：覆盖半个帧长所需的帧移数，加上overlap_frames个重叠帧。
+    截取起点是帧移的整数倍，块内第j帧与全局第(起点帧+j)帧的中心和窗口完全重合，逐帧独立的算法结果与整段计算一致；
+    pyin的Viterbi解码在每块内单独进行，重叠帧为解码提供两侧上下文，只保留块中间的结果，使块边缘的清浊音与基频状态连续。
+    每次只有一块（chunk_frames + 2 * context帧）音频参与计算，y可以是np.memmap，内存占用与音频总长无关。
+    """
+    context = -(-(frame_length // 2) // hop_length) + overlap_frames
+    if chunk_frames is None:
+        chunk_frames = last - first + 1
+    for block_first in range(first, last + 1, chunk_frames):
+        block_last = min(block_first + chunk_frames - 1, last)
+        seg_first = max(block_first - context, 0)
+        seg_y = np.asarray(y[seg_first * hop_length:(block_last + context) * hop_length + 1])
+        seg_rs = backend_func(seg_y, sr, fmin, fmax, frame_length, hop_length, **kwargs)
+        block_slice = slice(block_first - seg_first, block_last - seg_first + 1)
+        if isinstance(seg_rs, tuple):
+            yield block_first, tuple(rs[block_slice] for rs in seg_rs)
+        else:
+            yield block_first, seg_rs[block_slice]
+
+
+def _calRmsRef(y, frame_length, hop_length, chunk_frames: int = None) -> float:
+    """分块求整条音频的最大帧RMS能量，作为分段计算时统一的能量门限参考。"""
+    frame_num = 1 + len(y) // hop_length
+    return max(
+        block.max()
+        for _, block in _iterFrameRange(
+            _rmsBackend, y, None, None, None, frame_length, hop_length, 0, frame_num - 1, chunk_frames
+        )
+    )
+
+
+def _calSpanFreq(
+    backend_func,
+    y,
+    sr,
+    fmin,
+    fmax,
+    frame_length,
+    hop_length,
+    span_list,
+    chunk_frames: int = None,
+    overlap_frames: int = 0,
+    **kwargs
+) -> tuple:
+    """
+    只在span_list给出的区间上调用基频估计算法（区间过长时再按chunk_frames分块），
+    结果拼接回整条音频的帧时间轴，返回(基频, 发声概率)，区间外的帧基频为nan、发声概率为0。
+    分块与对齐方式见_iterFrameRange。
+    """
+    frame_num = 1 + len(y) // hop_length
+    freq_array = np.full(frame_num, np.nan)
+    prob_array = np.zeros(frame_num)
+    for start_s, end_s in span_list:
+        first = max(int(np.floor(start_s * sr / hop_length)), 0)
+        last = min(int(np.ceil(end_s * sr / hop_length)), frame_num - 1)
+        if last < first:
+            continue
+        for block_first, (block_freq, block_prob) in _iterFrameRange(
+            backend_func, y, sr, fmin, fmax, frame_length, hop_length, first, last, chunk_frames, overlap_frames, **kwargs
+        ):
+            freq_array[block_first:block_first + len(block_freq)] = block_freq
+            prob_array[block_first:block_first + len(block_prob)] = block_prob
+
+    return freq_array, prob_array
+
+
+# 基频估计算法注册表，键为calAudioFreq的backend参数取值。
+# 新算法只需实现(y, sr, fmin, fmax, frame_length, hop_length, **kwargs) -> (每帧基频（未发声为nan）, 每帧发声概率)并在此登记
+PITCH_BACKEND_DICT = {
+    "pyin": _pyinBackend,
+    "yin": _yinBackend,
+    "acf": _acfBackend,
+}
 
 
 def calAudioFreq(
     reduced_noise: np.ndarray,  # 输入参数：经过降噪处理后的音频信号数组
     sr: int,  # 输入参数：音频的采样率
     fmax: float = 2093.0,  # 输入参数：最大估计基音频率，默认值为2093.0Hz
-    fmin: float = 65.0  # 输入参数：最小估计基音频率，默认值为65.0Hz
+    fmin: float = 65.0,  # 输入参数：最小估计基音频率，默认值为65.0Hz
+    to_list: bool = True,  # 输入参数：是否将结果转换为Python列表，False时直接返回NumPy数组
+    backend: str = PITCH_BACKEND,  # 输入参数：基频估计算法，取值见PITCH_BACKEND_DICT
+    frame_length: int = None,  # 输入参数：分析帧长（采样点数），默认取自分析配置
+    hop_length: int = None,  # 输入参数：帧移（采样点数），默认取自分析配置，只给出frame_length时为frame_length // 4
+    analysis_mode: str = None,  # 输入参数：分析配置名，见setting.ANALYSIS_CONFIG_DICT
+    span_list=None,  # 输入参数：只估计这些区间内的基频，可传入字时间轴，见mergeWordSpan
+    span_pad_s: float = PITCH_SPAN_PAD_S,  # 输入参数：span_list中每个字两侧扩展的秒数
+    chunk_s: float = None,  # 输入参数：分块计算时每块的秒数，None表示整段一次计算
+    chunk_overlap_s: float = PITCH_CHUNK_OVERLAP_S,  # 输入参数：分块计算时每块两侧的重叠秒数
+    return_prob: bool = False,  # 输入参数：是否同时返回每帧的发声概率
+    **backend_kwargs  # 输入参数：透传给基频估计算法的其它参数，如top_db、voicing_threshold
 ) -> tuple:  # 函数返回类型：一个包含两个元素（基频列表和时间戳列表）的元组
 
     """
-    使用Librosa库中的Pyin算法来估计音频各时刻的基音频率，并生成一个元组，
+    使用指定的基频估计算法估计音频各时刻的基音频率，并生成一个元组，
     元组中包括基于这些估计得到的基频列表以及每个基频所对应的时间戳列表。
 
     参数：
@@ -35,111 +285,360 @@ def calAudioFreq(
         搜索基音频率的上限，默认为2093.0赫兹。
     fmin:
         搜索基音频率的下限，默认为65.0赫兹。
+    to_list:
+        为True时返回Python列表；getPerWordFeat可以直接使用NumPy数组，传False可省去转换。
+    backend:
+        基频估计算法，"pyin"（默认，最准）、"yin"或"acf"（更快，适合批量初筛），默认值见setting.PITCH_BACKEND。
+    frame_length、hop_length、analysis_mode:
+        分析帧长与帧移，所有算法使用相同的分帧方式，帧数与时间戳一一对应。缺省时取自analysis_mode对应的
+        分析配置（见setting.ANALYSIS_CONFIG_DICT），此时reduced_noise应已按该配置的采样率重采样（见xfrVocalTract）。
+    span_list:
+        为None时估计整条音频；传入getWordInfoList得到的字时间轴（或[(起始秒, 结束秒), ...]）时，
+        各字两侧扩展span_pad_s秒并合并后，只在这些发声区间内估计基频，区间外的帧为nan。
+        帧数与时间戳与整条估计相同，getPerWordFeat可直接使用；前奏、停顿、说话等区间不再参与计算。
+    chunk_s、chunk_overlap_s:
+        chunk_s不为None时按块计算（见iterAudioFreq），峰值内存只与块长有关，适合很长的录音；
+        逐帧独立的算法（yin、acf）结果与整段计算完全一致，pyin在容差内一致。
+    return_prob:
+        为True时返回(Freq_list, times_list, prob_list)，prob_list为每帧的发声概率（yin为能量门限的0/1判断）。
 
     返回：
         Freq_list：
-            计算得出的按时间排序的基音频率列表，以赫兹为单位。
+            计算得出的按时间排序的基音频率列表，以赫兹为单位，未发声帧为nan。
         times_list：
             对应于基频列表中各个频率出现的具体时间戳列表。
     """
+    if backend not in PITCH_BACKEND_DICT:
+        raise ValueError(f"unknown pitch backend {backend!r}, expected one of {list(PITCH_BACKEND_DICT)}")
+    frame_length, hop_length = _getFrameConfig(frame_length, hop_length, analysis_mode)
 
-    # 使用librosa的pyin方法从音频数据中提取基频频率、语音帧标记（是否发声）以及语音概率
-    # 返回三个变量：基频频率列表、语音帧标记列表和语音概率列表
-    Freq_list, voiced_flag, voiced_probs = librosa.pyin(
-        y=reduced_noise, sr=sr, fmin=fmin, fmax=fmax
-    )
+    # 按所选算法逐帧估计基频，未发声帧为nan
+    backend_func = PITCH_BACKEND_DICT[backend]
+    if span_list is None and chunk_s is None:
+        Freq_list, prob_list = backend_func(reduced_noise, sr, fmin, fmax, frame_length, hop_length, **backend_kwargs)
+    else:
+        chunk_frames, overlap_frames = _getChunkFrames(sr, hop_length, chunk_s, chunk_overlap_s)
+        if "rms_ref" not in backend_kwargs:
+            backend_kwargs["rms_ref"] = _calRmsRef(reduced_noise, frame_length, hop_length, chunk_frames)
+        Freq_list, prob_list = _calSpanFreq(
+            backend_func,
+            reduced_noise,
+            sr,
+            fmin,
+            fmax,
+            frame_length,
+            hop_length,
+            [(0.0, len(reduced_noise) / sr)] if span_list is None else mergeWordSpan(span_list, pad_s=span_pad_s),
+            chunk_frames,
+            overlap_frames,
+            **backend_kwargs,
+        )
 
-    # 使用librosa的times_like函数创建与基频频率列表长度相同的时间戳列表
-    times_list = librosa.times_like(Freq_list)
+    # 使用librosa的times_like函数按采样率和帧移创建与基频频率列表长度相同的时间戳列表
+    times_list = librosa.times_like(Freq_list, sr=sr, hop_length=hop_length)
 
     # 将numpy数组类型的基频频率和时间戳列表转换为Python原生的list类型，以便更通用的数据处理
-    Freq_list = Freq_list.tolist()
-    times_list = times_list.tolist()
+    if to_list:
+        Freq_list = Freq_list.tolist()
+        times_list = times_list.tolist()
+        prob_list = prob_list.tolist()
 
+    if return_prob:
+        return Freq_list, times_list, prob_list
     return Freq_list, times_list
 
 
+def _getFrameConfig(frame_length: int, hop_length: int, analysis_mode: str) -> tuple:
+    """补齐帧长与帧移：都未给出时取自分析配置，只给出帧长时帧移为帧长的1/4。"""
+    if frame_length is None:
+        analysis_config = getAnalysisConfig(analysis_mode)
+        frame_length = analysis_config["frame_length"]
+        if hop_length is None:
+            hop_length = analysis_config["hop_length"]
+    if hop_length is None:
+        hop_length = frame_length // 4
+
+    return frame_length, hop_length
+
+
+def _getChunkFrames(sr, hop_length, chunk_s, chunk_overlap_s) -> tuple:
+    """将块长、重叠秒数换算为帧数，chunk_s为None时返回(None, 0)，即整段一次计算。"""
+    if chunk_s is None:
+        return None, 0
+    return max(int(round(chunk_s * sr / hop_length)), 1), int(np.ceil(chunk_overlap_s * sr / hop_length))
+
+
+def iterAudioFreq(
+    reduced_noise: np.ndarray,
+    sr: int,
+    chunk_s: float = PITCH_CHUNK_S,
+    chunk_overlap_s: float = PITCH_CHUNK_OVERLAP_S,
+    fmax: float = 2093.0,
+    fmin: float = 65.0,
+    backend: str = PITCH_BACKEND,
+    frame_length: int = None,
+    hop_length: int = None,
+    analysis_mode: str = None,
+    **backend_kwargs
+):
+    """
+    calAudioFreq的流式版本：按块估计基频，逐块产出(freq_block, times_block)两个NumPy数组。
+
+    每块为chunk_s秒，两侧各带chunk_overlap_s秒的重叠上下文，只保留块中间的结果（见_iterFrameRange），
+    pyin的清浊音与基频状态在块边缘保持连续；各块首尾相接，拼接后与calAudioFreq的帧与时间戳一一对应。
+    reduced_noise可以是np.memmap（如np.load(..., mmap_mode="r")），每次只读取一块，峰值内存与录音时长无关。
+    yin、acf的能量门限参考值会先分块扫描一遍整条音频得到，与整段计算一致。
+
+    经典的使用案例：
+        for freq_block, times_block in iterAudioFreq(y, sr, chunk_s=60):
+            ...
+
+    参数：
+        chunk_s(float): 每块的秒数，默认值见setting.PITCH_CHUNK_S。
+        chunk_overlap_s(float): 每块两侧的重叠秒数，默认值见setting.PITCH_CHUNK_OVERLAP_S。
+        其它参数与calAudioFreq相同。
+    产出：
+        freq_block: 该块各帧的基频（Hz），未发声帧为nan。
+        times_block: 对应的时间戳（秒）。
+    """
+    if backend not in PITCH_BACKEND_DICT:
+        raise ValueError(f"unknown pitch backend {backend!r}, expected one of {list(PITCH_BACKEND_DICT)}")
+    frame_length, hop_length = _getFrameConfig(frame_length, hop_length, analysis_mode)
+
+    chunk_frames, overlap_frames = _getChunkFrames(sr, hop_length, chunk_s, chunk_overlap_s)
+    if "rms_ref" not in backend_kwargs:
+        backend_kwargs["rms_ref"] = _calRmsRef(reduced_noise, frame_length, hop_length, chunk_frames)
+    frame_num = 1 + len(reduced_noise) // hop_length
+    for block_first, (freq_block, prob_block) in _iterFrameRange(
+        PITCH_BACKEND_DICT[backend],
+        reduced_noise,
+        sr,
+        fmin,
+        fmax,
+        frame_length,
+        hop_length,
+        0,
+        frame_num - 1,
+        chunk_frames,
+        overlap_frames,
+        **backend_kwargs,
+    ):
+        times_block = librosa.frames_to_time(
+            np.arange(block_first, block_first + len(freq_block)), sr=sr, hop_length=hop_length
+        )
+        yield freq_block, times_block
+
+
+def getPitchSearchRange(
+    note_freq_list,
+    margin_cents: float = PITCH_RANGE_MARGIN_CENTS,
+    fmin: float = 65.0,
+    fmax: float = 2093.0,
+    bins_per_semitone: int = 10,
+) -> tuple:
+    """
+    由乐谱音符频率得到收窄的基频搜索范围，供calAudioFreq的fmin、fmax使用。
+
+    pyin的候选基频网格从fmin开始按每半音bins_per_semitone个格点排列，收窄后的边界对齐到宽范围[fmin, fmax]的网格上，
+    范围内的候选基频与宽范围完全相同，演唱音域在范围内时结果不变。
+
+    参数：
+        note_freq_list: 乐谱各音符频率（Hz），可包含所有候选调号及八度变体，非正数和None会被忽略。
+        margin_cents(float): 在最低、最高音符之外各留出的余量（音分）。
+        fmin、fmax(float): 宽搜索范围，收窄结果不会超出该范围。
+        bins_per_semitone(int): 与librosa.pyin的同名参数一致。
+    返回：
+        (fmin, fmax)元组；没有有效音符时返回宽范围。
+    """
+    note_freq_array = np.array([f for f in note_freq_list if f is not None], dtype=np.float64)
+    note_freq_array = note_freq_array[note_freq_array > 0]
+    if len(note_freq_array) == 0:
+        return fmin, fmax
+
+    bin_cents = 100.0 / bins_per_semitone
+    lo_bin = np.floor((1200 * np.log2(note_freq_array.min() / fmin) - margin_cents) / bin_cents)
+    hi_bin = np.ceil((1200 * np.log2(note_freq_array.max() / fmin) + margin_cents) / bin_cents)
+    narrow_fmin = max(fmin * 2 ** (lo_bin * bin_cents / 1200), fmin)
+    narrow_fmax = min(fmin * 2 ** (hi_bin * bin_cents / 1200), fmax)
+    if narrow_fmin >= narrow_fmax:
+        return fmin, fmax
+
+    return float(narrow_fmin), float(narrow_fmax)
+
+
+def isPitchOutOfRange(
+    freq_list,
+    fmin: float,
+    fmax: float,
+    edge_cents: float = 50.0,
+    edge_ratio: float = 0.2,
+    min_voiced_ratio: float = 0.1,
+) -> bool:
+    """
+    判断收窄范围下的基频估计是否说明演唱音域超出了搜索范围，需要用宽范围重新估计。
+
+    演唱超出范围时，估计结果要么大量贴在边界附近，要么被判为未发声。满足以下任一条件即返回True：
+    - 发声帧中距fmin或fmax不超过edge_cents音分的帧占比大于edge_ratio；
+    - 发声帧占全部帧的比例低于min_voiced_ratio。
+    """
+    freq_array = np.asarray(freq_list, dtype=np.float64)
+    voiced_array = freq_array[~np.isnan(freq_array)]
+    if len(freq_array) == 0 or len(voiced_array) < min_voiced_ratio * len(freq_array):
+        return True
+
+    edge = 2 ** (edge_cents / 1200)
+    is_edge = (voiced_array <= fmin * edge) | (voiced_array >= fmax / edge)
+
+    return bool(is_edge.mean() > edge_ratio)
+
+
+def calAudioFreqInRange(
+    reduced_noise: np.ndarray,
+    sr: int,
+    freq_range: tuple = None,
+    to_list: bool = True,
+    backend: str = PITCH_BACKEND,
+    probe_backend: str = "acf",
+    span_list=None,
+    return_prob: bool = False,
+    **kwargs
+) -> tuple:
+    """
+    在收窄的基频搜索范围freq_range内调用calAudioFreq，演唱音域超出范围时自动退回宽范围重新估计。
+
+    收窄范围后，高于fmax的演唱会被锁定到范围内的分频（如1/2、1/3），仅凭结果本身无法识别，
+    因此先用开销很小的probe_backend在宽范围内粗估一遍，粗估结果已超出范围时直接使用宽范围；
+    否则在收窄范围内估计，结果贴边或发声帧过少（见isPitchOutOfRange）时再用宽范围重算。
+
+    参数：
+        freq_range(tuple): getPitchSearchRange得到的(fmin, fmax)，为None时直接使用宽范围。
+        probe_backend(str): 粗估使用的基频估计算法。
+        span_list: 同calAudioFreq，粗估与正式估计都只在这些区间内进行。
+        其它参数与calAudioFreq相同，kwargs透传给calAudioFreq。
+    返回：
+        与calAudioFreq相同的(Freq_list, times_list)，return_prob为True时追加prob_list。
+    """
+    if freq_range is not None:
+        # 粗估与正式估计使用相同的分帧配置，帧与时间戳一一对应
+        frame_kwargs = {
+            key: kwargs[key] for key in ("frame_length", "hop_length", "analysis_mode", "span_pad_s") if key in kwargs
+        }
+        probe_list, times_list = calAudioFreq(
+            reduced_noise, sr, to_list=False, backend=probe_backend, span_list=span_list, **frame_kwargs
+        )
+        # 只估计了发声区间时，区间外的nan帧不计入发声帧占比
+        is_tracked = np.ones(len(times_list), dtype=bool)
+        if span_list is not None:
+            is_tracked[:] = False
+            for start_s, end_s in mergeWordSpan(span_list, pad_s=kwargs.get("span_pad_s", PITCH_SPAN_PAD_S)):
+                is_tracked |= (times_list >= start_s) & (times_list <= end_s)
+        if not isPitchOutOfRange(probe_list[is_tracked], *freq_range):
+            rs_tuple = calAudioFreq(
+                reduced_noise,
+                sr,
+                fmax=freq_range[1],
+                fmin=freq_range[0],
+                to_list=False,
+                backend=backend,
+                span_list=span_list,
+                return_prob=True,
+                **kwargs,
+            )
+            if not isPitchOutOfRange(rs_tuple[0][is_tracked], *freq_range):
+                if to_list:
+                    rs_tuple = tuple(rs.tolist() for rs in rs_tuple)
+                return rs_tuple if return_prob else rs_tuple[:2]
+
+    return calAudioFreq(
+        reduced_noise, sr, to_list=to_list, backend=backend, span_list=span_list, return_prob=return_prob, **kwargs
+    )
+
+
+def _rangeNanMedian(
+    freq_array: np.ndarray, times_array: np.ndarray, start_array: np.ndarray, end_array: np.ndarray
+) -> np.ndarray:
+    """
+    对每个闭区间[start, end]，一次性计算落在区间内的帧的基频中位数（忽略nan），区间内没有有效值时为nan。
+
+    times_array有序，区间对应的帧下标范围由searchsorted直接得到；各区间的帧按最长区间补齐为二维矩阵，
+    补齐位置填nan，再沿行计算nanmedian。
+    """
+    lo_array = np.searchsorted(times_array, start_array, side="left")
+    hi_array = np.searchsorted(times_array, end_array, side="right")
+    len_array = np.maximum(hi_array - lo_array, 0)
+    if len(len_array) == 0 or len_array.max() == 0:
+        return np.full(len(start_array), np.nan)
+
+    offset = np.arange(len_array.max())
+    index_matrix = lo_array[:, None] + offset
+    freq_matrix = freq_array[np.minimum(index_matrix, len(freq_array) - 1)]
+    freq_matrix[offset >= len_array[:, None]] = np.nan
+
+    median_array = np.full(len(start_array), np.nan)
+    has_value = (~np.isnan(freq_matrix)).any(axis=1)
+    if has_value.any():
+        median_array[has_value] = np.nanmedian(freq_matrix[has_value], axis=1)
+
+    return median_array
+
+
 def getPerWordFeat(
-    eigen_dict: dict, freq_list: list, times_list: list, crop_percent: float = 0.2
-) -> dict:
+    eigen_dict, freq_list: list, times_list: list, crop_percent: float = 0.2
+):
     """
     根据adjustWordTime输出的单词起止时间和calAudioFreq得到的全局基频信息，
     计算每个字在有效发音区间内的基频特征（如中位数基频）。
 
     参数：
-        eigen_dict(dict)：
-            包含单词边界信息的字典，键“eigen_list”内储存每个单词的信息
+        eigen_dict(dict 或 WordTimeline)：
+            包含单词边界信息的字典（键“eigen_list”内储存每个单词的信息），或getWordInfoList(as_timeline=True)
+            返回的WordTimeline
         freq_list(list)：
             表示整个音频片段基频变化的列表
         times_list(list)：
-            对应于基频列表的连续时间戳列表
+            对应于基频列表的时间戳列表，须按升序排列
         crop_percent(float)：
             指定从每个单词完整发音区间两侧裁剪的比例，默认为0.2
     返回：
-        rs_dict(dict)：
-            结构化字典，其中"eigen_list"键下的列表包含每个字的基频特征，结构如下：
+        与输入类型相同。输入为WordTimeline时返回只保留有效字的新WordTimeline，freq与duration列已填充；
+        输入为字典时返回结构化字典，其中"eigen_list"键下的列表包含每个字的基频特征，结构如下：
                 word(str): 单词内容
                 eigen(dict):
                     start_time(float): 单词开始时间
                     end_time(float): 单词结束时间
-                    times(float): 裁剪后有效的发音持续时间
                     freq(float): 计算得到的该单词的代表性基频值
+                    times(float): 裁剪后有效的发音持续时间
     """
 
-    # 获取存储了每个单词信息的列表
-    eigen_list = eigen_dict["eigen_list"]
-
-    # 遍历所有单词
-    for i in range(len(eigen_list)):
+    timeline = asWordTimeline(eigen_dict)
+    freq_array = np.asarray(freq_list, dtype=np.float64)
+    times_array = np.asarray(times_list, dtype=np.float64)
+    start_array, end_array = timeline.getBoundary()
 
-        # 获取当前单词的信息字典
-        item = eigen_list[i]["eigen"]
+    # 计算单词的完整发音持续时间，并根据crop_percent裁剪发音区间；发音时间过短（<=0.1秒）的单词使用完整区间
+    times = end_array - start_array
+    is_long = times > 0.1
+    seg_start_array = np.where(is_long, start_array + times * crop_percent, start_array)
+    seg_end_array = np.where(is_long, end_array - times * crop_percent, end_array)
 
-        # 计算单词的完整发音持续时间
-        times = item["end_time"] - item["start_time"]
-
-        # 根据crop_percent裁剪发音区间
-        if times > 0.1:
-            seg_start_time = item["start_time"] + times * crop_percent
-            seg_end_time = item["end_time"] - times * crop_percent
-        else:
-            # 如果单词发音时间过短，则使用完整的发音区间
-            seg_start_time = item["start_time"]
-            seg_end_time = item["end_time"]
-
-        # 筛选出处于裁剪发音区间内的基频频率索引
-        indices = [
-            index
-            for index, time in enumerate(times_list)
-            if seg_start_time <= time <= seg_end_time
-        ]
-
-        # 获取这些索引对应的非缺失基频值
-        freq_seq = [
-            freq_list[index] for index in indices if not np.isnan(freq_list[index])
-        ]
-
-        # 若未找到匹配的基频值，尝试使用完整发音区间内的基频值
-        if not freq_seq:
-            indices = [
-                index
-                for index, time in enumerate(times_list)
-                if item["start_time"] <= time <= item["end_time"]
-            ]
-            freq_seq = [
-                freq_list[index] for index in indices if not np.isnan(freq_list[index])
-            ]
-
-        # 如果找到了至少一个有效的基频值，计算代表性基频值（这里使用中位数）
-        if freq_seq:
-            item["freq"] = round(np.median(freq_seq), 3)  # 添加中位数基频到单词信息中
-            item["times"] = round(times, 4)  # 添加有效发音持续时间到单词信息中
-        else:
-            # 如果没有找到任何有效基频值，移除该单词条目
-            eigen_list[i] = 0
+    # 裁剪区间内的中位数基频，若区间内没有有效基频值，则使用完整发音区间内的基频值
+    freq_out = _rangeNanMedian(freq_array, times_array, seg_start_array, seg_end_array)
+    is_empty = np.isnan(freq_out)
+    if is_empty.any():
+        freq_out[is_empty] = _rangeNanMedian(
+            freq_array, times_array, start_array[is_empty], end_array[is_empty]
+        )
 
-    # 过滤出仍包含有效信息的字典条目
-    eigen_dict["eigen_list"] = [item for item in eigen_list if isinstance(item, dict)]
+    # 如果没有找到任何有效基频值，移除该单词条目
+    is_valid = ~np.isnan(freq_out)
+    timeline = WordTimeline(
+        timeline.words,
+        timeline.start,
+        timeline.end,
+        np.round(freq_out, 3),
+        np.where(is_valid, np.round(times, 4), np.nan),
+    ).select(is_valid)
 
-    # 返回更新后的字典
-    return eigen_dict
+    if isinstance(eigen_dict, WordTimeline):
+        return timeline
+    return timeline.toEigenDict()
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+
+"""简谱的编译表示CompiledScore。
+
+getSheetMusicFeatDict原先对12个调号各读一次简谱JSON、重新计算音长，再deepcopy整份字典生成降八度变体；
+calDtwFreqAndTempo又对每条录音、每个调号逐字重算np.average(note, weights=time)与np.sum(time)。
+CompiledScore把一首歌全部24个(调号, 八度)变体的音符频率与逐字特征编译为NumPy数组：
+    key_list    # ["A", "A/2", "A#", "A#/2", ...]，与getSheetMusicFeatDict的键顺序相同
+    note_freq   # (24, 音符数)，每个变体下每个音符的频率
+    note_time   # (音符数,)，每个音符的音长（秒）
+    freq        # (24, 字数)，每个变体下每个字按音长加权的平均频率
+    duration    # (字数,)，每个字的总音长（秒）
+每首歌每个进程只编译一次；可持久化为COMPILED_SCORE_DIR下的.npz，简谱JSON或调号音符频率表修改后自动重新编译。
+对象只含几个小数组，传给子进程的序列化开销可以忽略。
+
+经典的使用案例：
+    score = getCompiledScore("guoge")
+    freq_seq, duration_seq = score.freq[score.getKeyIndex("G")], score.duration
+    notation_feat_dict = score.toFeatDict()  # 转换回getSheetMusicFeatDict原来的字典格式
+"""
+
+from setting import *
+from preprocess.prep_notation import extractJson, calNoteTime, calNoteFreqArray, getNoteFreqTable
+import numpy as np
+import hashlib
+import copy
+import json
+
+# getSheetMusicFeatDict使用的12个调号，每个调号之后紧跟其降八度变体"<调号>/2"
+KEY_SIG_LIST = ["A", "A#", "B", "C", "C#", "D", "D#", "E", "F", "F#", "G", "G#"]
+# 编译方式变化导致旧的.npz不再可用时递增
+COMPILED_SCORE_VERSION = 1
+
+# 进程内已编译的乐谱，键为(简谱JSON路径, 频率表路径)，值为(源文件修改时间, CompiledScore)
+_compiled_score_dict = {}
+
+
+class CompiledScore(object):
+    """一首歌全部调号、八度变体的音符频率与逐字特征。
+
+    属性：
+        key_list(list): 变体名，顺序与getSheetMusicFeatDict的键顺序相同。
+        words(np.ndarray): 每个字。
+        note_freq(np.ndarray): (变体数, 音符数)的音符频率，查不到的音符为nan。
+        note_time(np.ndarray): (音符数,)的音符音长（秒）。
+        word_offset(np.ndarray): (字数+1,)，第i个字的音符为[word_offset[i], word_offset[i+1])。
+        freq(np.ndarray): (变体数, 字数)，每个字按音长加权的平均频率。
+        duration(np.ndarray): (字数,)，每个字的总音长。
+        meta(dict): 简谱JSON中eigen_list以外的字段，如bpm、key_signature。
+    """
+
+    __slots__ = ("key_list", "words", "note_freq", "note_time", "word_offset", "freq", "duration", "meta")
+
+    def __init__(self, key_list, words, note_freq, note_time, word_offset, meta: dict = None):
+        self.key_list = list(key_list)
+        self.words = np.asarray(words, dtype=str)
+        self.note_freq = np.asarray(note_freq, dtype=np.float64)
+        self.note_time = np.asarray(note_time, dtype=np.float64)
+        self.word_offset = np.asarray(word_offset, dtype=np.int64)
+        self.meta = dict(meta or {})
+
+        # 逐字计算，求和顺序与原先对每个字调用np.average、np.sum相同，结果逐位一致
+        word_num = len(self.words)
+        self.freq = np.empty((len(self.key_list), word_num))
+        self.duration = np.empty(word_num)
+        for i in range(word_num):
+            start, end = self.word_offset[i], self.word_offset[i + 1]
+            time_array = self.note_time[start:end]
+            self.freq[:, i] = np.average(self.note_freq[:, start:end], weights=time_array, axis=1)
+            self.duration[i] = np.sum(time_array)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __repr__(self):
+        return f"CompiledScore({len(self)} words, {len(self.key_list)} keys)"
+
+    def __getstate__(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __setstate__(self, state):
+        for field in self.__slots__:
+            setattr(self, field, state[field])
+
+    def getKeyIndex(self, key: str) -> int:
+        """返回变体名（如"G"、"G/2"）在key_list中的下标。"""
+        return self.key_list.index(key)
+
+    @classmethod
+    def fromEigenDict(
+        cls,
+        eigen_dict_t: dict,
+        key_sig_list: list = KEY_SIG_LIST,
+        data_dir: Path = RAW_DATA_DIR,
+        data_name: str = FREQ_CSV,
+    ) -> "CompiledScore":
+        """
+        由calNoteTime处理后的简谱字典编译，所有调号的音符频率一次批量查表（见calNoteFreqArray），降八度变体为原频率除以2。
+        """
+        eigen_list = eigen_dict_t["eigen_list"]
+        note_list = [note for item in eigen_list for note in item["eigen"]["note"]]
+        key_freq = calNoteFreqArray(note_list, key_sig_list, data_dir, data_name)
+
+        note_freq = np.empty((2 * len(key_sig_list), len(note_list)))
+        note_freq[0::2] = key_freq
+        note_freq[1::2] = key_freq / 2
+        key_list = [key for key_sig in key_sig_list for key in (key_sig, key_sig + "/2")]
+
+        return cls(
+            key_list,
+            [item["word"] for item in eigen_list],
+            note_freq,
+            [t for item in eigen_list for t in item["eigen"]["time"]],
+            np.cumsum([0] + [len(item["eigen"]["note"]) for item in eigen_list]),
+            {key: value for key, value in eigen_dict_t.items() if key != "eigen_list"},
+        )
+
+    @classmethod
+    def fromFeatDict(cls, notation_feat_dict: dict) -> "CompiledScore":
+        """由getSheetMusicFeatDict原来的字典格式{变体名: 简谱字典}构造。"""
+        feat_dict_list = list(notation_feat_dict.values())
+        eigen_list = feat_dict_list[0]["eigen_list"]
+        note_freq = [
+            [np.nan if note is None else note for item in feat_dict["eigen_list"] for note in item["eigen"]["note"]]
+            for feat_dict in feat_dict_list
+        ]
+
+        return cls(
+            list(notation_feat_dict),
+            [item["word"] for item in eigen_list],
+            note_freq,
+            [t for item in eigen_list for t in item["eigen"]["time"]],
+            np.cumsum([0] + [len(item["eigen"]["note"]) for item in eigen_list]),
+            {key: value for key, value in feat_dict_list[0].items() if key != "eigen_list"},
+        )
+
+    def toFeatDict(self) -> dict:
+        """转换回getSheetMusicFeatDict原来的字典格式{变体名: {..., "eigen_list": [{"word", "eigen": {"note", "time"}}]}}。"""
+        time_list = self.note_time.tolist()
+        notation_feat_dict = {}
+        for key, note_freq in zip(self.key_list, self.note_freq.tolist()):
+            eigen_list = []
+            for i, word in enumerate(self.words.tolist()):
+                start, end = int(self.word_offset[i]), int(self.word_offset[i + 1])
+                note_list = [None if np.isnan(note) else note for note in note_freq[start:end]]
+                eigen_list.append({"word": word, "eigen": {"note": note_list, "time": time_list[start:end]}})
+            notation_feat_dict[key] = {**copy.deepcopy(self.meta), "eigen_list": eigen_list}
+
+        return notation_feat_dict
+
+    def save(self, npz_path: Path, src_mtime: list = None):
+        """保存为.npz，src_mtime为编译所依据的源文件修改时间，load时据此判断是否过期。先写临时文件再替换。"""
+        npz_path = Path(npz_path)
+        npz_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = npz_path.with_name(f"{npz_path.name}.tmp{os.getpid()}")
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                version=COMPILED_SCORE_VERSION,
+                src_mtime=np.asarray(src_mtime or [], dtype=np.int64),
+                key_list=np.asarray(self.key_list, dtype=str),
+                words=self.words,
+                note_freq=self.note_freq,
+                note_time=self.note_time,
+                word_offset=self.word_offset,
+                meta=json.dumps(self.meta, ensure_ascii=False),
+            )
+        os.replace(tmp_path, npz_path)
+
+    @classmethod
+    def load(cls, npz_path: Path, src_mtime: list = None):
+        """读取.npz，文件不存在、版本不符或源文件修改时间与保存时不同时返回None。"""
+        try:
+            with np.load(npz_path) as data:
+                if int(data["version"]) != COMPILED_SCORE_VERSION:
+                    return None
+                if src_mtime is not None and data["src_mtime"].tolist() != list(src_mtime):
+                    return None
+                return cls(
+                    data["key_list"].tolist(),
+                    data["words"],
+                    data["note_freq"],
+                    data["note_time"],
+                    data["word_offset"],
+                    json.loads(str(data["meta"])),
+                )
+        except (FileNotFoundError, KeyError, ValueError):
+            return None
+
+
+def getCompiledScore(
+    json_name: str = "guoge",
+    json_dir: Path = EIGEN_DIR,
+    data_dir: Path = RAW_DATA_DIR,
+    data_name: str = FREQ_CSV,
+    cache_dir: Path = COMPILED_SCORE_DIR,
+) -> CompiledScore:
+    """
+    获取一首歌的CompiledScore：先查进程内缓存，再查cache_dir下的.npz，都未命中或已过期时重新编译。
+
+    简谱JSON或调号音符频率表的修改时间变化即视为过期。cache_dir为None时不读写.npz，只在进程内缓存。
+    .npz文件名带有频率表路径的摘要，同名简谱配合不同的频率表时各存一份，互不覆盖。
+    """
+    json_name = json_name[:-5] if json_name.endswith(".json") else json_name
+    json_path = Path(json_dir) / (json_name + ".json")
+    csv_path = Path(data_dir) / data_name
+    src_mtime = [os.stat(json_path).st_mtime_ns, os.stat(csv_path).st_mtime_ns if csv_path.exists() else 0]
+
+    cache_key = (str(json_path), str(csv_path))
+    cached = _compiled_score_dict.get(cache_key)
+    if cached is not None and cached[0] == src_mtime:
+        return cached[1]
+
+    csv_digest = hashlib.sha1(str(csv_path).encode("utf-8")).hexdigest()[:8]
+    npz_path = None if cache_dir is None else Path(cache_dir) / f"{json_name}_{csv_digest}.npz"
+    score = None if npz_path is None else CompiledScore.load(npz_path, src_mtime)
+    if score is None:
+        # getNoteFreqTable按进程缓存，频率表修改后须清空，否则重新编译仍使用旧表，并以新的修改时间存入.npz
+        getNoteFreqTable.cache_clear()
+        eigen_dict_t = calNoteTime(extractJson(json_dir=json_dir, json_name=json_name))
+        score = CompiledScore.fromEigenDict(eigen_dict_t, data_dir=data_dir, data_name=data_name)
+        if npz_path is not None:
+            score.save(npz_path, src_mtime)
+    _compiled_score_dict[cache_key] = (src_mtime, score)
+
+    return score
+
+
+def asCompiledScore(notation_feat) -> CompiledScore:
+    """getSheetMusicFeatDict原来的字典格式转换为CompiledScore，已是CompiledScore时原样返回。"""
+    if isinstance(notation_feat, CompiledScore):
+        return notation_feat
+    return CompiledScore.fromFeatDict(notation_feat)
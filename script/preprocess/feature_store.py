@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+"""帧级基频轨迹的磁盘特征存储，按大小上限做LRU淘汰。
+
+基频轨迹只取决于音频内容和基频估计参数，与DTW、评分参数无关。调整评分参数后重新运行时，
+getSongFeat从本存储直接读取基频轨迹，不再重新解码音频、运行pyin。
+
+每条轨迹以 (音频内容sha1, 基频估计算法, 参数) 生成的键单独存放：
+    FEATURE_STORE_DIR / <键前两位> / <键> / voiced_f0.npy   # float32，只存发声帧的基频
+                                           voiced_run.npy  # int32，发声帧的游程[[起始帧, 帧数], ...]
+                                           prob.npy        # float16，每帧的发声概率
+                                           meta.json       # 帧数、采样率、帧移、参数、占用字节数
+未发声帧以游程编码表示，不占用基频存储；各数组为.npy格式，可按mmap方式读取。
+meta.json的修改时间即最近使用时间，写入新轨迹后若总大小超过上限，按最近使用时间从旧到新淘汰。
+
+经典的使用案例：
+    store = getFeatureStore()  # 每个进程共用一个实例，总大小只统计一次
+    feat_key = PitchFeatureStore.makeKey(calFileHash(audio_path), backend="pyin", fmin=65.0, fmax=2093.0)
+    feat = store.get(feat_key)
+    if feat is None:
+        freq_list, times_list, prob_list = calAudioFreq(y, sr, to_list=False, return_prob=True)
+        store.put(feat_key, freq_list, prob_list, sr=sr, hop_length=hop_length)
+        feat = store.get(feat_key)
+    freq_list, times_list, prob_list = feat
+"""
+
+from setting import *
+from util import lazyImport
+import hashlib
+import json
+import shutil
+import numpy as np
+
+librosa = lazyImport("librosa")
+
+META_NAME = "meta.json"
+# 基频估计算法的实现变化导致旧轨迹不再可用时递增，所有旧条目随之失效并逐渐被LRU淘汰
+FEATURE_VERSION = 1
+
+# 进程内共用的PitchFeatureStore，键为(存储目录, 大小上限)，见getFeatureStore
+_feature_store_dict = {}
+
+
+def _encodeVoicedRun(freq_array: np.ndarray) -> np.ndarray:
+    """将基频数组中非nan帧编码为[[起始帧, 帧数], ...]的游程。"""
+    is_voiced = np.concatenate([[False], ~np.isnan(freq_array), [False]])
+    edge_array = np.flatnonzero(np.diff(is_voiced.astype(np.int8)))
+    start_array, end_array = edge_array[0::2], edge_array[1::2]
+
+    return np.stack([start_array, end_array - start_array], axis=1).astype(np.int32)
+
+
+def _decodeVoicedRun(voiced_run: np.ndarray, frame_num: int) -> np.ndarray:
+    """由游程还原长度为frame_num的发声帧布尔掩码。"""
+    edge_array = np.zeros(frame_num + 1, dtype=np.int32)
+    np.add.at(edge_array, voiced_run[:, 0], 1)
+    np.add.at(edge_array, voiced_run[:, 0] + voiced_run[:, 1], -1)
+
+    return np.cumsum(edge_array[:-1]) > 0
+
+
+class PitchFeatureStore(object):
+    """按内容寻址的基频轨迹存储。
+
+    属性：
+        store_dir(Path): 存储根目录。
+        max_bytes(int): 总大小上限（字节），超过时按最近使用时间淘汰，为None时不限制。
+    """
+
+    def __init__(self, store_dir: Path = FEATURE_STORE_DIR, max_bytes: int = FEATURE_STORE_MAX_BYTES):
+        self.store_dir = Path(store_dir)
+        self.max_bytes = max_bytes
+        self._total_bytes = None
+
+    @staticmethod
+    def makeKey(audio_hash: str, **param_dict) -> str:
+        """
+        由音频内容哈希、FEATURE_VERSION和基频估计参数生成存储键。参数需可JSON序列化，任一参数变化都会得到不同的键。
+        """
+        param_str = json.dumps(param_dict, sort_keys=True, ensure_ascii=False, default=str)
+
+        return hashlib.sha1(f"{FEATURE_VERSION}|{audio_hash}|{param_str}".encode("utf-8")).hexdigest()
+
+    def _getEntryDir(self, key: str) -> Path:
+        return self.store_dir / key[:2] / key
+
+    def __contains__(self, key: str) -> bool:
+        return (self._getEntryDir(key) / META_NAME).exists()
+
+    def get(self, key: str, mmap: bool = True):
+        """
+        读取一条基频轨迹并刷新其最近使用时间，不存在时返回None。
+
+        返回：
+            (freq_array, times_array, prob_array)：float32基频（未发声帧为nan）、float64时间戳、float16发声概率。
+            mmap为True时各.npy文件按mmap方式打开，prob_array直接是只读的内存映射。
+        """
+        entry_dir = self._getEntryDir(key)
+        meta_path = entry_dir / META_NAME
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            mmap_mode = "r" if mmap else None
+            voiced_f0 = np.load(entry_dir / "voiced_f0.npy", mmap_mode=mmap_mode)
+            voiced_run = np.load(entry_dir / "voiced_run.npy")
+            prob_array = np.load(entry_dir / "prob.npy", mmap_mode=mmap_mode)
+            os.utime(meta_path)
+        except FileNotFoundError:
+            # 条目不存在，或刚好被其它进程淘汰
+            return None
+
+        frame_num = meta["frame_num"]
+        freq_array = np.full(frame_num, np.nan, dtype=np.float32)
+        freq_array[_decodeVoicedRun(voiced_run, frame_num)] = voiced_f0
+        times_array = librosa.frames_to_time(np.arange(frame_num), sr=meta["sr"], hop_length=meta["hop_length"])
+
+        return freq_array, times_array, prob_array
+
+    def put(self, key: str, freq_list, prob_list, sr: int, hop_length: int, param_dict: dict = None):
+        """
+        写入一条基频轨迹，随后按大小上限淘汰最久未使用的条目。
+
+        参数：
+            freq_list: 每帧基频，未发声帧为nan。
+            prob_list: 每帧发声概率。
+            sr、hop_length(int): 计算轨迹时的采样率与帧移，读取时据此还原时间戳。
+            param_dict(dict, 可选): 生成键时使用的参数，原样记录在meta.json中便于排查。
+        """
+        freq_array = np.asarray(freq_list, dtype=np.float32)
+        entry_dir = self._getEntryDir(key)
+        tmp_dir = entry_dir.with_name(f"{key}.tmp{os.getpid()}")
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+
+        np.save(tmp_dir / "voiced_f0.npy", freq_array[~np.isnan(freq_array)])
+        np.save(tmp_dir / "voiced_run.npy", _encodeVoicedRun(freq_array))
+        np.save(tmp_dir / "prob.npy", np.asarray(prob_list, dtype=np.float16))
+        nbytes = sum(path.stat().st_size for path in tmp_dir.iterdir())
+        meta = {
+            "frame_num": len(freq_array),
+            "sr": sr,
+            "hop_length": hop_length,
+            "nbytes": nbytes,
+            "param": param_dict,
+        }
+        with open(tmp_dir / META_NAME, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, default=str)
+
+        # 整个目录写完后再改名为正式条目，其它进程不会读到写了一半的数据；同一键已被其它进程写入时丢弃本次结果
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+
+        if self._total_bytes is not None:
+            self._total_bytes += nbytes
+        self.evict()
+
+    def _scanEntry(self) -> list:
+        """返回[(最近使用时间, 占用字节数, 条目目录), ...]。"""
+        entry_list = []
+        if not self.store_dir.exists():
+            return entry_list
+        for prefix_dir in os.scandir(self.store_dir):
+            if not prefix_dir.is_dir():
+                continue
+            for entry in os.scandir(prefix_dir.path):
+                meta_path = os.path.join(entry.path, META_NAME)
+                try:
+                    with open(meta_path, "r", encoding="utf-8") as f:
+                        nbytes = json.load(f)["nbytes"]
+                    entry_list.append((os.stat(meta_path).st_mtime_ns, nbytes, Path(entry.path)))
+                except (FileNotFoundError, NotADirectoryError, ValueError):
+                    continue
+
+        return entry_list
+
+    def evict(self):
+        """总大小超过max_bytes时，按最近使用时间从旧到新删除条目，直到不超过上限。"""
+        if self.max_bytes is None:
+            return
+        # 总大小只在第一次淘汰检查时扫描一次，之后随写入累加，超过上限时再重新扫描确认
+        if self._total_bytes is not None and self._total_bytes <= self.max_bytes:
+            return
+
+        entry_list = sorted(self._scanEntry())
+        self._total_bytes = sum(nbytes for _, nbytes, _ in entry_list)
+        for _, nbytes, entry_dir in entry_list:
+            if self._total_bytes <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            self._total_bytes -= nbytes
+
+    def __getstate__(self):
+        """跨进程传递时只传目录与上限，总大小在子进程中重新统计。"""
+        return {"store_dir": self.store_dir, "max_bytes": self.max_bytes, "_total_bytes": None}
+
+
+def getFeatureStore(
+    store_dir: Path = FEATURE_STORE_DIR, max_bytes: int = FEATURE_STORE_MAX_BYTES
+) -> PitchFeatureStore:
+    """
+    返回进程内共用的PitchFeatureStore，同一(存储目录, 大小上限)只创建一次。
+
+    新建的实例不知道存储的总大小，第一次写入时要读取全部meta.json统计；共用实例后每个进程只统计一次，之后随写入累加。
+    """
+    cache_key = (str(store_dir), max_bytes)
+    feature_store = _feature_store_dict.get(cache_key)
+    if feature_store is None:
+        feature_store = _feature_store_dict[cache_key] = PitchFeatureStore(store_dir, max_bytes)
+
+    return feature_store
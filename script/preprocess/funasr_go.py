@@ -4,11 +4,15 @@
 本模块是基于FunASR库实现的自动语音识别（ASR）功能模块。模块包含的主要功能有：
 
 1. `funasrRun`：支持单个音频文件或SCP文件列表的语音识别，输出每个词语的时间戳信息，并以JSON格式保存识别结果。
+   识别结果按音频内容哈希逐条缓存（见asr_cache模块），scp中只有未命中缓存的音频才会重新识别；
+   结果以JSONL逐条写入（见asr_store模块），支持断点续跑；未命中的音频按时长分桶批量识别（见asr_batch模块）。
+   输入音频先统一转换到规范化PCM存储（见pcm_store模块），funASR直接接收16k单声道数组，后续阶段复用同一份PCM。
 2. `getWordInfoList`：将`funasrRun`的输出结果转换成结构化的数据格式，提供每个词语及其对应的开始和结束时间信息。
 
 模块主要功能：
 - `funasrRun`：模块的主入口，用于执行语音识别操作。
 - `getWordInfoList`：处理`funasrRun`的输出结果，生成详细的词语信息列表。
+- `loadAsrModel`：进程级模型管理器，同一(model, vad, punc, revision)组合在一个进程内只加载一次。
 
 经典使用案例
     rs_dict = funasrRun(input_audio_dataset="qilai", input_audio_name="cst.mp3")
@@ -36,20 +40,85 @@ def suppress_stdout_stderr():
         sys.stdout, sys.stderr = old_stdout, old_stderr
 
 
-# 使用上下文管理器抑制funasr模块导入时的print输出
-with suppress_stdout_stderr():
-    from funasr import AutoModel  # 导入模块时的print语句会被抑制
 import re
 from pathlib import Path
 from setting import *
+from preprocess.asr_cache import *
+from preprocess.asr_store import *
+from preprocess.asr_batch import *
+from preprocess.asr_daemon import AsrDaemonClient, connectAsrDaemon
+from preprocess.word_timeline import WordTimeline
+from preprocess.pcm_store import PcmStore, getPcmStore
+from preprocess.prep_audio import getSegmentWindow, getSegmentHash
 import numpy as np
 import json
 
+# 进程内已加载的AutoModel实例，键为(model, vad_model, punc_model, model_revision)
+_asr_model_dict = {}
+
+
+def loadAsrModel(
+        model: str = ASR_MODEL,
+        vad_model: str = ASR_VAD_MODEL,
+        punc_model: str = ASR_PUNC_MODEL,
+        model_revision: str = ASR_MODEL_REVISION,
+):
+    """
+    进程级的funASR模型管理器，返回已预热的AutoModel实例。
+
+    同一(model, vad_model, punc_model, model_revision)组合在一个进程内只初始化一次，之后的调用直接复用，
+    避免每次识别都重新加载paraformer、fsmn-vad、ct-punc带来的数秒耗时和数百MB内存分配。
+    vad_model或punc_model传入None时不加载对应组件，例如`getWordInfoList`会去掉标点，此时无需加载标点模型。
+
+    参数：
+        model (str): ASR模型路径
+        vad_model (str 或 None): 语音活动检测模型名称，None表示不加载
+        punc_model (str 或 None): 标点插入模型名称，None表示不加载
+        model_revision (str): 各模型统一使用的版本号
+
+    返回：
+        AutoModel实例
+    """
+    model_key = (model, vad_model, punc_model, model_revision)
+    if model_key not in _asr_model_dict:
+        model_kwargs = {"model": model, "model_revision": model_revision}
+        if vad_model is not None:
+            model_kwargs["vad_model"] = vad_model
+            model_kwargs["vad_model_revision"] = model_revision
+        if punc_model is not None:
+            model_kwargs["punc_model"] = punc_model
+            model_kwargs["punc_model_revision"] = model_revision
+
+        # 延迟到第一次加载模型时才导入funasr（连带torch），并抑制其导入和初始化时的print输出
+        with suppress_stdout_stderr():
+            from funasr import AutoModel
+            _asr_model_dict[model_key] = AutoModel(**model_kwargs)
+        print(f"loadAsrModel: {model_key} has been loaded")
+
+    return _asr_model_dict[model_key]
+
+
+def releaseAsrModel(
+        model: str = None,
+        vad_model: str = ASR_VAD_MODEL,
+        punc_model: str = ASR_PUNC_MODEL,
+        model_revision: str = ASR_MODEL_REVISION,
+):
+    """
+    释放模型管理器中缓存的AutoModel实例。
+
+    model为None时释放全部缓存的模型，否则只释放对应组合的模型。
+    """
+    if model is None:
+        _asr_model_dict.clear()
+    else:
+        _asr_model_dict.pop((model, vad_model, punc_model, model_revision), None)
+
 
 def funasrRun(
-        model: str = "iic/speech_paraformer-large-vad-punc_asr_nat-zh-cn-16k-common-vocab8404-pytorch",  # 默认使用的ASR模型路径
-        vad_model: str = "fsmn-vad",  # 默认使用的语音活动检测模型
-        punc_model: str = "ct-punc-c",  # 默认使用的标点插入模型
+        model: str = ASR_MODEL,  # 默认使用的ASR模型路径
+        vad_model: str = ASR_VAD_MODEL,  # 默认使用的语音活动检测模型
+        punc_model: str = ASR_PUNC_MODEL,  # 默认使用的标点插入模型，None表示不加载标点模型
         input_audio_dir: Path = UPLOAD_FILE_DIR,  # 输入音频文件所在的父目录，默认上传文件目录
         input_audio_dataset: str = None,  # 待识别音频所属的数据集名称
         input_audio_name: str = None,  # 待识别的音频文件名（含后缀）
@@ -57,7 +126,16 @@ def funasrRun(
         scp_name: str = None,  # SCP文件名
         input_mode: str = "file",  # 输入数据模式，可选："file"（单个音频文件）或"scp"（SCP文件）
         download_json_dir: Path = DOWNLOAD_DIR,  # 输出结果JSON文件保存的父目录，默认下载目录
-) -> dict:
+        model_revision: str = ASR_MODEL_REVISION,  # 模型版本号
+        cache_dir: Path = ASR_CACHE_DIR,  # 逐条识别结果缓存目录
+        commit_size: int = 100,  # 每批最多交给模型识别并提交的音频数
+        batch_size_s: float = 300.0,  # 每批补齐后的音频总时长预算（秒）
+        max_memory_mb: float = None,  # 每批估算内存上限（MB）
+        use_daemon: bool = True,  # 是否优先使用常驻ASR守护进程
+        return_store: bool = False,  # 为True时返回AsrResultStore而不是完整的结果字典
+        pcm_store: PcmStore = None,  # 规范化PCM存储
+        virtual_segment: bool = True,  # 是否按虚拟剪辑清单只识别保留区间
+):
     """
     使用funasr进行ASR（语音识别），输出识别文字以及每个字的时间戳。
 
@@ -65,19 +143,21 @@ def funasrRun(
     1. 单个音频文件时，需要提供input_audio_dataset和input_audio_name参数。
     2. SCP文件时，需提供scp_name参数并将input_mode设置为"scp"。
 
+    识别结果逐条追加到download_json_dir下的JSONL存储（见asr_store模块），中断后重新运行会从最后一条已提交的记录继续。
     输出结果是一个字典，结构示例：
     {
         "scp_rs": [
-            {"key": file_name, "text": asr_result, "timestamp": [[start,end],[start,end], ...]},
-            {"key": file_name, "text": asr_result, "timestamp": [[start,end],[start,end], ...]},
+            {"key": file_name, "text": asr_result, "timestamp": [[start,end],[start,end], ...], "audio_hash": str},
+            {"key": file_name, "text": asr_result, "timestamp": [[start,end],[start,end], ...], "audio_hash": str},
             ...
         ]
     }
+    结果较多时可设置return_store=True，直接得到可流式遍历、可按key读取的AsrResultStore，避免整体载入内存。
 
     参数：
         model (str): ASR模型路径，更多模型选择参考达摩院Paraformer large
         vad_model (str): 语音活动检测模型名称
-        punc_model (str): 标点插入模型名称
+        punc_model (str): 标点插入模型名称，为None时不加载标点模型，结果文件名追加"_nopunc"以免与带标点的结果混用
         input_audio_dir (Path): 输入音频文件的上级目录
         input_audio_dataset (str): 音频文件所在的数据集名称
         input_audio_name (str): 音频文件名（含扩展名）
@@ -85,9 +165,23 @@ def funasrRun(
         scp_name (str): SCP文件名
         input_mode (str): 输入模式，取值为 'file' 或 'scp'
         download_json_dir (Path): 输出结果JSON文件保存的目录
-
-    返回值：符合上述结构的字典对象
+        model_revision (str): 模型版本号
+        cache_dir (Path): 逐条识别结果的缓存目录，以音频内容哈希+模型组合为键，只有未命中的音频才会交给模型识别
+        commit_size (int): 每批最多交给模型识别的音频数，每批识别完成后立即写入存储
+        batch_size_s (float): 未命中的音频按文件头时长升序分桶，每批补齐后总时长不超过该预算，见asr_batch模块
+        max_memory_mb (float): 每批估算内存上限，None表示只按时长预算分批
+        use_daemon (bool): 为True时若本地ASR守护进程（见asr_daemon模块）在运行则交给它识别，否则在进程内识别
+        return_store (bool): 是否返回AsrResultStore
+        pcm_store (PcmStore): 规范化PCM存储，缺省时在setting.PCM_STORE_ENABLE为True时使用PCM_STORE_DIR下的默认存储（进程内共用，见getPcmStore）。
+            识别前所有输入音频先转换到存储中（已转换的跳过），funASR直接接收数组，不再经scp由funASR重新解码
+        virtual_segment (bool): 为True时虚拟剪辑清单（见prep_audio.getSegmentWindow）中有记录的音频只识别保留区间，
+            时间戳相对于区间起点；确定剪辑区间本身的识别（如batch_audio_seg）需设为False，识别完整音频
+
+    返回值：符合上述结构的字典对象，return_store为True时返回AsrResultStore
     """
+    # 不加载标点模型时识别文本不同，结果文件需要区分
+    json_suffix = ".jsonl" if punc_model is not None else "_nopunc.jsonl"
+
     # 如果输入的是单个音频文件，构建音频文件完整路径
     if input_audio_name is not None:
         path_str = str(input_audio_dir / input_audio_dataset / input_audio_name)
@@ -99,50 +193,101 @@ def funasrRun(
 
         # 提取音频文件名（不含扩展名），并构建JSON结果文件名
         real_audio_name = re.sub(r"\..*", "", input_audio_name)
-        json_name = real_audio_name + ".json"
+        json_name = real_audio_name + json_suffix
         download_path = download_dir / json_name
 
     # 如果输入的是SCP文件，构建JSON结果文件名
     else:
-        json_name = scp_name + ".json"
+        json_name = scp_name + json_suffix
         download_path = download_json_dir / json_name
 
-    # 若结果文件尚未生成，则执行ASR识别过程
-    if not download_path.exists():
-
-        # 初始化AutoModel，加载指定模型
-        model = AutoModel(
-            model=model,
-            model_revision="v2.0.4",
-            vad_model=vad_model,
-            vad_model_revision="v2.0.4",
-            punc_model=punc_model,
-            punc_model_revision="v2.0.4",
-        )
-
-        # 根据输入模式分别调用模型进行识别
-        if input_mode == "file":
-            rs_list = model.generate(input=path_str, batch_size_s=300)
-        elif input_mode == "scp":
-            scp_name = scp_name + ".scp"
-            scp_path = str(input_scp_dir / scp_name)
-            rs_list = model.generate(input=scp_path, batch_size_s=300)
-
-        # 将识别结果封装成字典并写入JSON文件
-        rs_dict = {"scp_rs": rs_list}
-        with open(download_path, "w", encoding="gbk") as json_file:
-            json.dump(rs_dict, json_file, indent=2, ensure_ascii=False)
-        print(f"funasrRun: funASR recognition result has been written in {download_path}")
-    # 如果结果文件已存在，直接读取并返回结果
+    # 统一整理为[(key, 音频路径), ...]，逐条按内容哈希查询缓存
+    if input_mode == "file":
+        audio_item_list = [(real_audio_name, path_str)]
+    elif input_mode == "scp":
+        audio_item_list = readScpFile(input_scp_dir / (scp_name + ".scp"))
+
+    model_tag = getAsrModelTag(model, vad_model, punc_model, model_revision)
+    if pcm_store is None and PCM_STORE_ENABLE:
+        pcm_store = getPcmStore()
+    if pcm_store is not None:
+        # 预处理阶段：每条输入音频只解码、重采样一次，ASR与后续的基频分析、切分共用
+        hash_list = pcm_store.prepare([audio_path for _, audio_path in audio_item_list])
     else:
-        print(f"funasrRun: {download_path} already exists,read ASR recognition results from there")
-        with open(download_path, "r", encoding="gbk") as file:
-            rs_dict = json.load(file)
+        hash_index = loadHashIndex(cache_dir)
+        hash_list = [getAudioHash(audio_path, hash_index) for _, audio_path in audio_item_list]
+        saveHashIndex(hash_index, cache_dir)
+    # 虚拟剪辑的音频只识别保留区间，缓存与结果存储的键带上区间，与完整音频的结果互不混用
+    hash_list = [
+        getSegmentHash(audio_hash, getSegmentWindow(audio_path) if virtual_segment else None)
+        for (_, audio_path), audio_hash in zip(audio_item_list, hash_list)
+    ]
+
+    # 打开结果存储，上次中断前已提交且音频未变化的记录直接跳过
+    rs_store = AsrResultStore(download_path)
+    commit_count = 0
+    miss_dict = {}  # 音频哈希 -> (音频路径, [key, ...])，改名或重复的音频只识别一次
+    for (key, audio_path), audio_hash in zip(audio_item_list, hash_list):
+        committed = rs_store.get(key)
+        if committed is not None and committed.get("audio_hash") == audio_hash:
+            continue
+        if audio_hash in miss_dict:
+            miss_dict[audio_hash][1].append(key)
+            continue
+        record = readAsrCache(audio_hash, model_tag, cache_dir)
+        if record is None:
+            miss_dict[audio_hash] = (audio_path, [key])
+        else:
+            rs_store.append({"key": key, **record, "audio_hash": audio_hash})
+            commit_count += 1
+    print(f"funasrRun: {len(audio_item_list) - commit_count - sum(len(v[1]) for v in miss_dict.values())} "
+          f"results resumed, {commit_count} cache hits, {len(miss_dict)} audio files to recognize")
+
+    if miss_dict:
+        # 优先交给常驻守护进程识别；守护进程未运行时从模型管理器获取已预热的AutoModel，同一进程内不重复加载
+        model_kwargs = dict(model=model, vad_model=vad_model, punc_model=punc_model, model_revision=model_revision)
+        model = connectAsrDaemon(**model_kwargs) if use_daemon else None
+        if model is None:
+            model = loadAsrModel(**model_kwargs)
+        else:
+            print("funasrRun: send recognition jobs to the ASR daemon")
+
+        # 未命中的音频按时长分桶，逐批写入临时scp交给模型识别，以哈希作为key便于回填，每批识别完立即提交
+        miss_scp_path = download_path.parent / (download_path.stem + "_miss.scp")
+        miss_item_list = [(audio_hash, v[0]) for audio_hash, v in miss_dict.items()]
+        throughput_dict = {}
+        for miss_rs_list in generateByBucket(
+            model,
+            miss_item_list,
+            miss_scp_path,
+            batch_size_s=batch_size_s,
+            max_memory_mb=max_memory_mb,
+            max_batch_num=commit_size,
+            throughput_dict=throughput_dict,
+            pcm_store=pcm_store,
+            virtual_segment=virtual_segment,
+        ):
+            for record in miss_rs_list:
+                audio_hash = record["key"]
+                writeAsrCache(audio_hash, model_tag, record, cache_dir)
+                record = {k: v for k, v in record.items() if k != "key"}
+                for key in miss_dict[audio_hash][1]:
+                    rs_store.append({"key": key, **record, "audio_hash": audio_hash})
+        print(f"funasrRun: {formatThroughput(throughput_dict)}")
+    print(f"funasrRun: funASR recognition result has been written in {download_path}")
+
+    if return_store:
+        return rs_store
+
+    # 按输入顺序读出结果，兼容原有的{"scp_rs": [...]}结构
+    key_list = list(dict.fromkeys(key for key, _ in audio_item_list))
+    rs_dict = {"scp_rs": [rs_store[key] for key in key_list]}
+    rs_store.close()
 
     return rs_dict
 
 
-def getWordInfoList(funasr_dict: dict) -> dict:
+def getWordInfoList(funasr_dict: dict, as_timeline: bool = False):
     """
     根据funasr_run输出的结果生成一个名为'eigen_list'的字典列表，其中包含了每个字及其对应的开始时间和结束时间。
 
@@ -151,6 +296,8 @@ def getWordInfoList(funasr_dict: dict) -> dict:
     参数：
         funasr_dict(dict)：
             包含ASR识别结果及其时间戳信息的字典，由funasr_run函数生成
+        as_timeline(bool)：
+            为True时返回列式存储的WordTimeline（见word_timeline模块），供getPerWordFeat等热路径直接使用
 
     返回：
         eigen_dict(dict)：
@@ -221,6 +368,9 @@ def getWordInfoList(funasr_dict: dict) -> dict:
         # 将当前字的时间戳信息添加到返回结果中
         eigen_dict["eigen_list"].append(eigen_dict_item)
 
+    if as_timeline:
+        return WordTimeline.fromEigenDict(eigen_dict)
+
     return eigen_dict
 
 
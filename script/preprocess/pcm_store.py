@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+
+"""规范化PCM存储：每条输入音频只解码、重采样一次。
+
+funASR（经scp读文件）、getSongFeat（xfrVocalTract）、cutAudio原先各自解码同一条录音并各自重采样。
+本模块在预处理阶段把每条输入音频转换为PCM_STORE_SR（16k）单声道int16的.npy，以音频内容sha1为键存放，
+之后各阶段都按mmap方式读取区间并还原为float32：funASR直接接收数组，16k分析配置下的基频估计不再解码，
+切分只按采样点取区间。int16的量化误差（1/32768）远小于录音本身的噪声，磁盘占用只有float32的一半。
+
+目录结构：
+    PCM_STORE_DIR / <hash前两位> / <hash>.npy   # int16（旧版本写入的float32也可读取），采样率为PCM_STORE_SR
+    PCM_STORE_DIR / hash_index.json             # 路径 -> [文件大小, 修改时间ns, 哈希]，格式与asr_cache相同
+.npy的修改时间即最近使用时间，转换新音频后若总大小超过上限，按最近使用时间从旧到新淘汰，被淘汰的音频下次使用时重新转换。
+
+经典的使用案例：
+    pcm_store = getPcmStore()  # 每个进程共用一个实例，路径到哈希的索引只读取一次
+    hash_list = pcm_store.prepare([audio_path for _, audio_path in readScpFile(scp_path)])
+    y, sr = pcm_store.load(audio_path, start=1.5, end=3.0)
+"""
+
+from setting import *
+from util import multipuleProcess
+from preprocess.asr_cache import loadHashIndex, saveHashIndex, getAudioHash
+from preprocess.prep_audio import decodeAudio
+import numpy as np
+
+# int16满量程，存储时乘以该值，读取时除以该值还原
+PCM_SCALE = 32768.0
+
+# 进程内共用的PcmStore，键为(存储目录, 采样率, 大小上限)，见getPcmStore
+_pcm_store_dict = {}
+
+
+def pcmToFloat(y: np.ndarray) -> np.ndarray:
+    """将从存储读出的int16采样还原为float32，旧版本写入的float32原样返回。"""
+    if y.dtype == np.int16:
+        return y.astype(np.float32) * np.float32(1 / PCM_SCALE)
+
+    return y
+
+
+def _convertAudio(arg: tuple) -> str:
+    """
+    将一条音频解码为sr采样率的单声道int16并保存为pcm_path。先写临时文件再改名，多个进程同时转换同一音频时互不影响。
+
+    参数：
+        arg(tuple): (音频路径, pcm_path, sr)，打包为一个元组以便交给multipuleProcess。
+    """
+    audio_path, pcm_path, sr = arg
+    y, _ = decodeAudio(audio_path, sr=sr, mono=True)
+    pcm_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = pcm_path.with_name(f"{pcm_path.name}.tmp{os.getpid()}")
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.clip(np.round(np.asarray(y) * PCM_SCALE), -PCM_SCALE, PCM_SCALE - 1).astype(np.int16))
+    os.replace(tmp_path, pcm_path)
+
+    return str(pcm_path)
+
+
+class PcmStore(object):
+    """按内容寻址的规范化PCM存储。
+
+    属性：
+        store_dir(Path): 存储根目录。
+        sr(int): 存储的采样率。
+        hash_index(dict): 路径到内容哈希的索引，见asr_cache.loadHashIndex，由saveIndex写回。
+        max_bytes(int): 总大小上限（字节），超过时按最近使用时间淘汰，为None时不限制。
+    """
+
+    def __init__(self, store_dir: Path = PCM_STORE_DIR, sr: int = PCM_STORE_SR, max_bytes: int = PCM_STORE_MAX_BYTES):
+        self.store_dir = Path(store_dir)
+        self.sr = sr
+        self.max_bytes = max_bytes
+        self.hash_index = loadHashIndex(self.store_dir)
+        self._total_bytes = None
+
+    def _getPcmPath(self, audio_hash: str) -> Path:
+        return self.store_dir / audio_hash[:2] / (audio_hash + ".npy")
+
+    def getPcmPath(self, audio_path) -> Path:
+        """返回音频对应的规范化PCM文件路径，尚未转换时立即转换。"""
+        return self._getPcmPath(self.ensure(audio_path))
+
+    def getHash(self, audio_path) -> str:
+        """返回音频文件的内容哈希，文件大小与修改时间未变时直接使用索引中的记录。"""
+        return getAudioHash(audio_path, self.hash_index)
+
+    def saveIndex(self):
+        """将路径到内容哈希的索引写回存储目录。"""
+        saveHashIndex(self.hash_index, self.store_dir)
+
+    def ensure(self, audio_path) -> str:
+        """音频尚未转换时立即转换，返回其内容哈希。"""
+        audio_hash = self.getHash(audio_path)
+        pcm_path = self._getPcmPath(audio_hash)
+        if not pcm_path.exists():
+            _convertAudio((audio_path, pcm_path, self.sr))
+            self._addEntry([pcm_path])
+
+        return audio_hash
+
+    def prepare(self, audio_path_list: list, max_workers: int = None) -> list:
+        """
+        预处理阶段批量转换：内容相同的音频只转换一次，已转换的直接跳过，多于一条时用多进程并行解码。
+
+        参数：
+            audio_path_list(list): 音频路径列表。
+            max_workers(int, 可选): 并行进程数，缺省时使用multipuleProcess的默认值，为1时在当前进程内转换。
+
+        返回：
+            hash_list(list): 与audio_path_list一一对应的内容哈希。
+        """
+        hash_list = [self.getHash(audio_path) for audio_path in audio_path_list]
+        self.saveIndex()
+
+        todo_dict = {}  # 内容哈希 -> 待转换的参数
+        for audio_path, audio_hash in zip(audio_path_list, hash_list):
+            pcm_path = self._getPcmPath(audio_hash)
+            if audio_hash in todo_dict:
+                continue
+            # 已转换的音频刷新最近使用时间，随后的淘汰不会删除本批要用的PCM
+            if not self._touch(pcm_path):
+                todo_dict[audio_hash] = (audio_path, pcm_path, self.sr)
+        if len(todo_dict) > 1 and max_workers != 1:
+            kwargs = {} if max_workers is None else {"max_workers": max_workers}
+            multipuleProcess(_convertAudio, list(todo_dict.values()), **kwargs)
+        else:
+            for arg in todo_dict.values():
+                _convertAudio(arg)
+        self._addEntry([arg[1] for arg in todo_dict.values()])
+        print(f"PcmStore: {len(audio_path_list)} audio files, {len(todo_dict)} converted to {self.store_dir}")
+
+        return hash_list
+
+    def load(self, audio_path=None, audio_hash: str = None, start: float = 0.0, end: float = None, mmap: bool = True):
+        """
+        读取规范化PCM的[start, end)区间，未转换时先转换。
+
+        参数：
+            audio_path(Path 或 str, 可选): 原始音频路径。
+            audio_hash(str, 可选): 已知的内容哈希，给出时不再查询索引。
+            start、end(float): 区间起止时间（秒），end为None时读到末尾。
+            mmap(bool): 是否按mmap方式打开，为True时只从磁盘读取区间内的采样。
+
+        返回：
+            (y, sr)：一维float32数组与存储采样率，与decodeAudio的约定一致。
+        """
+        if audio_hash is None:
+            audio_hash = self.ensure(audio_path)
+        elif audio_path is not None and not self._getPcmPath(audio_hash).exists():
+            _convertAudio((audio_path, self._getPcmPath(audio_hash), self.sr))
+            self._addEntry([self._getPcmPath(audio_hash)])
+        pcm_path = self._getPcmPath(audio_hash)
+        y = np.load(pcm_path, mmap_mode="r" if mmap else None)
+        self._touch(pcm_path)
+        start_sample = int(round(start * self.sr))
+        end_sample = None if end is None else int(round(end * self.sr))
+
+        return pcmToFloat(y[start_sample:end_sample]), self.sr
+
+    def getDuration(self, audio_path) -> float:
+        """返回规范化PCM的时长（秒），只读取.npy文件头。"""
+        return len(np.load(self.getPcmPath(audio_path), mmap_mode="r")) / self.sr
+
+    @staticmethod
+    def _touch(pcm_path: Path) -> bool:
+        """刷新最近使用时间，文件不存在（未转换或刚被其它进程淘汰）时返回False。"""
+        try:
+            os.utime(pcm_path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _addEntry(self, pcm_path_list: list):
+        """累计新转换的PCM占用的字节数，随后按大小上限淘汰最久未使用的PCM。"""
+        if self._total_bytes is not None:
+            self._total_bytes += sum(os.stat(pcm_path).st_size for pcm_path in pcm_path_list)
+        self.evict()
+
+    def _scanEntry(self) -> list:
+        """返回[(最近使用时间, 占用字节数, .npy路径), ...]。"""
+        entry_list = []
+        if not self.store_dir.exists():
+            return entry_list
+        for prefix_dir in os.scandir(self.store_dir):
+            if not prefix_dir.is_dir():
+                continue
+            for entry in os.scandir(prefix_dir.path):
+                if not entry.name.endswith(".npy"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entry_list.append((stat.st_mtime_ns, stat.st_size, Path(entry.path)))
+
+        return entry_list
+
+    def evict(self):
+        """总大小超过max_bytes时，按最近使用时间从旧到新删除PCM，直到不超过上限。"""
+        if self.max_bytes is None:
+            return
+        # 总大小只在第一次淘汰检查时扫描一次，之后随转换累加，超过上限时再重新扫描确认
+        if self._total_bytes is not None and self._total_bytes <= self.max_bytes:
+            return
+
+        entry_list = sorted(self._scanEntry())
+        self._total_bytes = sum(nbytes for _, nbytes, _ in entry_list)
+        for _, nbytes, pcm_path in entry_list:
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(pcm_path)
+            except FileNotFoundError:
+                pass
+            self._total_bytes -= nbytes
+
+    def __getstate__(self):
+        """跨进程传递时总大小在子进程中重新统计。"""
+        return {**self.__dict__, "_total_bytes": None}
+
+
+def getPcmStore(
+    store_dir: Path = PCM_STORE_DIR, sr: int = PCM_STORE_SR, max_bytes: int = PCM_STORE_MAX_BYTES
+) -> PcmStore:
+    """
+    返回进程内共用的PcmStore，同一(存储目录, 采样率, 大小上限)只创建一次。
+
+    每次新建PcmStore都要读取完整的hash_index.json，第一次淘汰检查时还要扫描全部.npy统计总大小，
+    逐条处理音频时应使用本函数而不是直接构造。
+    """
+    cache_key = (str(store_dir), sr, max_bytes)
+    pcm_store = _pcm_store_dict.get(cache_key)
+    if pcm_store is None:
+        pcm_store = _pcm_store_dict[cache_key] = PcmStore(store_dir, sr, max_bytes)
+
+    return pcm_store
@@ -1,22 +1,266 @@
-"""音频文件的预处理，包括重采样、转为单声道、降噪。
+"""音频文件的预处理，包括解码、重采样、转为单声道、降噪。
 
-xfrVocalTract方法使用librosa库对音乐重采样为统一的16000并转为单声道的音频，noiseReduce方法使用noisereduce库对音乐进行降噪。
+项目中所有音频解码都经过decodeAudio：
+- WAV/FLAC等soundfile原生支持的格式直接由soundfile读取，可按[start, end)只读取所需区间；
+- mp3、m4a等压缩格式在安装了ffmpeg时通过管道调用ffmpeg，直接输出目标采样率的单声道float32；
+- 以上都不可用时退回librosa.load（audioread）。
+各路径都先混合为单声道再重采样，只对一个声道做一次重采样。getAudioInfo只读文件头获取采样率、声道数与时长。
+exportSegments把一个源文件的多个区间一次导出为WAV/FLAC（或ffmpeg流复制），batchExportSegments按源文件分发到进程池。
+不需要实际文件时，saveSegmentManifest只把保留区间记入虚拟剪辑清单，xfrVocalTract等读取时按getSegmentWindow截取。
+
+xfrVocalTract方法将音乐解码为分析配置（setting.ANALYSIS_CONFIG_DICT）中统一采样率的单声道音频，noiseReduce方法使用noisereduce库对音乐进行降噪：
+按估计的信噪比跳过已足够干净的录音或改用平稳降噪，可复用由首字前静音估计的会话噪声样本，batchNoiseReduce用进程池批量处理。
 
 经典的使用案例：
 
+y, sr = decodeAudio("data/qilai_1.mp3", sr=16000, start=12.5, end=20.0)
+record_list = exportSegments("data/qilai_1.wav", [(0.0, 12.5), (12.5, 20.0)], output_dir=AUDIO_DIR)
 y_resampled, target_sr = xfrVocalTract(dataset_name="qilai", audio_name="qilai_1.mp3")
-reduced_noise = noiseReduce(y=y_resampled, sr=target_sr)
+reduced_noise, _ = noiseReduce(y=y_resampled, sr=target_sr, speech_start=1.2, session="device_a")
 """
 
 # -*- coding: utf-8 -*-
 from setting import *
-import noisereduce as nr
-import librosa
-import soundfile as sf
+from util import lazyImport, getAnalysisConfig, multipuleProcess
 from glob import glob
 import numpy as np
 from pathlib import Path
-from pydub import AudioSegment
+import shutil
+import subprocess
+import json
+
+nr = lazyImport("noisereduce")
+librosa = lazyImport("librosa")
+sf = lazyImport("soundfile")
+
+
+# soundfile（libsndfile）原生读取、可按采样点精确定位的格式，其余格式优先交给ffmpeg
+SOUNDFILE_FORMAT_SET = {".wav", ".flac", ".ogg", ".aif", ".aiff"}
+# 压缩格式区间读取时的预读采样点数（两个MPEG帧）
+DECODE_PREROLL = 2304
+
+
+def _hasFfmpeg() -> bool:
+    return AUDIO_DECODE_FFMPEG and shutil.which(FFMPEG_BIN) is not None and shutil.which(FFPROBE_BIN) is not None
+
+
+def _probeAudio(audio_path) -> dict:
+    """用ffprobe读取第一条音频流的采样率、声道数与时长。"""
+    proc = subprocess.run(
+        [
+            FFPROBE_BIN,
+            "-v", "error",
+            "-select_streams", "a:0",
+            "-show_entries", "stream=sample_rate,channels:format=duration",
+            "-of", "json",
+            str(audio_path),
+        ],
+        capture_output=True,
+        check=True,
+    )
+    probe = json.loads(proc.stdout)
+    stream = probe["streams"][0]
+    sr = int(stream["sample_rate"])
+    duration = float(probe["format"]["duration"])
+
+    return {"sr": sr, "channels": int(stream["channels"]), "frames": int(round(duration * sr)), "duration": duration}
+
+
+def getAudioInfo(audio_path) -> dict:
+    """
+    只读取文件头，返回{"sr": 采样率, "channels": 声道数, "frames": 每声道采样点数, "duration": 时长（秒）}。
+    依次尝试soundfile、ffprobe，都不可用时退回librosa（需要完整解码一遍）。
+    """
+    try:
+        info = sf.info(str(audio_path))
+        return {"sr": info.samplerate, "channels": info.channels, "frames": info.frames, "duration": info.duration}
+    except RuntimeError:
+        pass
+    if _hasFfmpeg():
+        try:
+            return _probeAudio(audio_path)
+        except (subprocess.CalledProcessError, KeyError, IndexError, ValueError):
+            pass
+    y, sr = librosa.load(str(audio_path), sr=None, mono=False)
+    y = np.atleast_2d(y)
+
+    return {"sr": sr, "channels": y.shape[0], "frames": y.shape[1], "duration": y.shape[1] / sr}
+
+
+def _decodeBySoundfile(audio_path, mono, start, end, dtype) -> tuple:
+    """soundfile读取[start, end)区间，单声道文件直接返回读出的数组，不再复制。"""
+    # mp3等压缩格式定位后解码器需要前一帧的数据才能还原，先多读DECODE_PREROLL个采样点再丢弃，使区间读取与完整解码后切片一致
+    preroll = 0 if Path(audio_path).suffix.lower() in SOUNDFILE_FORMAT_SET else DECODE_PREROLL
+    with sf.SoundFile(str(audio_path)) as f:
+        native_sr = f.samplerate
+        start_frame = min(int(round(start * native_sr)), f.frames)
+        end_frame = f.frames if end is None else min(int(round(end * native_sr)), f.frames)
+        seek_frame = max(start_frame - preroll, 0)
+        if seek_frame > 0:
+            f.seek(seek_frame)
+        data = f.read(max(end_frame - seek_frame, 0), dtype=dtype, always_2d=True)[start_frame - seek_frame:]
+
+    if data.shape[1] == 1:
+        y = data[:, 0]
+    elif mono:
+        y = data.mean(axis=1, dtype=dtype)
+    else:
+        y = data.T
+
+    return y, native_sr
+
+
+def _decodeByFfmpeg(audio_path, sr, mono, start, end) -> tuple:
+    """通过管道调用ffmpeg解码[start, end)区间，由ffmpeg完成混合声道与重采样，直接输出float32。"""
+    if sr is None or not mono:
+        info = _probeAudio(audio_path)
+        sr = info["sr"] if sr is None else sr
+        channels = 1 if mono else info["channels"]
+    else:
+        channels = 1
+
+    cmd = [FFMPEG_BIN, "-nostdin", "-v", "error"]
+    if start > 0:
+        cmd += ["-ss", f"{start:.6f}"]
+    if end is not None:
+        cmd += ["-t", f"{max(end - start, 0):.6f}"]
+    cmd += ["-i", str(audio_path), "-f", "f32le", "-acodec", "pcm_f32le", "-ac", str(channels), "-ar", str(sr), "-"]
+    proc = subprocess.run(cmd, capture_output=True, check=True)
+
+    y = np.frombuffer(proc.stdout, dtype=np.float32)
+    if channels > 1:
+        y = y.reshape(-1, channels).T
+
+    return y, sr
+
+
+def decodeAudio(
+    audio_path,
+    sr: int = None,
+    mono: bool = True,
+    start: float = 0.0,
+    end: float = None,
+    dtype=np.float32,
+) -> tuple:
+    """
+    解码音频文件（或其中的[start, end)区间），可选混合为单声道并重采样。
+
+    参数：
+        audio_path(Path 或 str): 音频文件路径。
+        sr(int): 目标采样率，为None时保持原始采样率。
+        mono(bool): 是否混合为单声道。
+        start(float): 起始时间（秒）。
+        end(float): 结束时间（秒，不含），为None时读到文件末尾。
+        dtype: soundfile路径的输出类型，ffmpeg路径固定为float32。
+
+    返回：
+        (y, sr)：y为一维数组（单声道）或(声道数, 采样点数)的二维数组，与librosa.load的约定一致；sr为y的采样率。
+    """
+    is_native = Path(audio_path).suffix.lower() in SOUNDFILE_FORMAT_SET
+    if not is_native and _hasFfmpeg():
+        try:
+            return _decodeByFfmpeg(audio_path, sr, mono, start, end)
+        except subprocess.CalledProcessError:
+            pass
+
+    try:
+        y, native_sr = _decodeBySoundfile(audio_path, mono, start, end, dtype)
+    except RuntimeError:
+        duration = None if end is None else max(end - start, 0)
+        return librosa.load(str(audio_path), sr=sr, mono=mono, offset=start, duration=duration, dtype=dtype)
+
+    # 先混合为单声道再重采样，只需对一个声道重采样
+    if sr is not None and sr != native_sr:
+        y = librosa.resample(y, orig_sr=native_sr, target_sr=sr)
+        native_sr = sr
+
+    return y, native_sr
+
+
+# 进程内缓存的虚拟剪辑清单，路径 -> (修改时间ns, 清单)，清单文件变化时重新读取
+_segment_manifest_cache = {}
+
+
+def loadSegmentManifest(manifest_path: Path = SEGMENT_MANIFEST_PATH) -> dict:
+    """
+    读取虚拟剪辑清单，结构为{源文件绝对路径: {"start_sample": int, "end_sample": int 或 None, "sr": int}}，
+    不存在时返回空字典。
+    """
+    manifest_path = Path(manifest_path)
+    try:
+        mtime_ns = os.stat(manifest_path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    cached = _segment_manifest_cache.get(str(manifest_path))
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        segment_dict = json.load(f)
+    _segment_manifest_cache[str(manifest_path)] = (mtime_ns, segment_dict)
+
+    return segment_dict
+
+
+def makeSegmentRecord(input_audio, start: float = 0.0, end: float = None) -> dict:
+    """
+    不写出音频，只按源文件采样率把区间[start, end)（秒）换算为采样点，记录格式与exportSegments返回的记录相同。
+    """
+    sr = getAudioInfo(input_audio)["sr"]
+
+    return {
+        "source": str(input_audio),
+        "start_sample": int(round(start * sr)),
+        "end_sample": None if end is None else int(round(end * sr)),
+        "sr": sr,
+    }
+
+
+def saveSegmentManifest(record_list: list, manifest_path: Path = SEGMENT_MANIFEST_PATH) -> dict:
+    """
+    把[{"source", "start_sample", "end_sample", "sr"}, ...]（如exportSegments返回的记录）合并写入清单，
+    同一源文件以新记录为准。先写临时文件再替换，避免中断时留下损坏的清单。
+    """
+    manifest_path = Path(manifest_path)
+    segment_dict = dict(loadSegmentManifest(manifest_path))
+    for record in record_list:
+        segment_dict[os.path.abspath(record["source"])] = {
+            field: record[field] for field in ("start_sample", "end_sample", "sr")
+        }
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(segment_dict, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+    return segment_dict
+
+
+def getSegmentWindow(audio_path, manifest_path: Path = SEGMENT_MANIFEST_PATH):
+    """
+    返回清单中该音频保留区间的(起始时间, 结束时间)（秒，结束时间为None表示到文件末尾），未记录或未开启虚拟剪辑时返回None。
+    以秒表示可直接交给decodeAudio、PcmStore.load等按任意采样率读取，按源采样率换算回的采样点与清单一致。
+    """
+    if not SEGMENT_VIRTUAL:
+        return None
+    record = loadSegmentManifest(manifest_path).get(os.path.abspath(audio_path))
+    if record is None:
+        return None
+    end_sample = record["end_sample"]
+
+    return record["start_sample"] / record["sr"], None if end_sample is None else end_sample / record["sr"]
+
+
+def getSegmentHash(audio_hash: str, window) -> str:
+    """
+    由音频内容哈希与getSegmentWindow返回的区间生成缓存键，未剪辑时原样返回内容哈希。
+
+    >>> getSegmentHash("abc", (1.5, None))
+    'abc@1.5-'
+    """
+    if window is None:
+        return audio_hash
+
+    return f"{audio_hash}@{window[0]!r}-{'' if window[1] is None else repr(window[1])}"
 
 
 # 音频数据由于设备不同，采样率也会不同，为方便研究，需统一采样率；
@@ -25,7 +269,9 @@ def xfrVocalTract(
     audio_dir: Path = UPLOAD_FILE_DIR,
     dataset_name: str = None,
     audio_name: str = None,
-    target_sr: int = 16000,
+    target_sr: int = None,
+    analysis_mode: str = None,
+    pcm_store=None,
 ) -> tuple:
     """按照target_sr进行重采样后，将声道数转化为指定数（一般项目需求为单声道）
 
@@ -39,7 +285,12 @@ def xfrVocalTract(
         audio_name:
             音频名,eg:xxx.mp3。
         target_sr：
-            目标的采样率，16000为常用的采用率。
+            目标的采样率，缺省时使用analysis_mode对应分析配置的采样率（"legacy"模式为22050）。
+        analysis_mode:
+            分析配置名，见setting.ANALYSIS_CONFIG_DICT，缺省为setting.ANALYSIS_MODE。
+        pcm_store(PcmStore, 可选):
+            规范化PCM存储，目标采样率与存储采样率相同时直接以mmap方式读取已转换的PCM，不再解码。
+            虚拟剪辑清单中记录了该音频的保留区间时，只读取该区间（见getSegmentWindow）。
         vt_num:
             需要设置的声道数。
 
@@ -55,85 +306,404 @@ def xfrVocalTract(
 
     audio_path = os.path.join(audio_dir, dataset_name, audio_name)  # 使用 / 拼接路径
 
-    # 读取音频文件
-    y, sr = librosa.load(audio_path, sr=None)
+    if target_sr is None:
+        target_sr = getAnalysisConfig(analysis_mode)["sr"]
 
-    # 重采样
-    y_resampled = librosa.resample(y, orig_sr=sr, target_sr=target_sr)
+    start, end = getSegmentWindow(audio_path) or (0.0, None)
+    if pcm_store is not None and target_sr == pcm_store.sr:
+        return pcm_store.load(audio_path, start=start, end=end)[0], target_sr
 
-    # 将音频信号转换为单声道
-    y_resampled = librosa.to_mono(y_resampled)
+    # 读取音频文件，先混合为单声道再重采样到target_sr，只需一次重采样
+    y_resampled, _ = decodeAudio(audio_path, sr=target_sr, mono=True, start=start, end=end)
 
     return y_resampled, target_sr
 
 
+# 进程内按录音设备/会话缓存的噪声样本，同一会话的录音只估计一次
+_noise_profile_dict = {}
+
+
+def _calFrameDb(y: np.ndarray, frame_length: int = 2048, hop_length: int = 512) -> np.ndarray:
+    """逐帧RMS（dB），不足一帧的信号按一帧计算。"""
+    y = np.asarray(y, dtype=np.float32)
+    if len(y) < frame_length:
+        y = np.pad(y, (0, frame_length - len(y)))
+    frame_array = np.lib.stride_tricks.sliding_window_view(y, frame_length)[::hop_length]
+    rms_array = np.sqrt(np.mean(np.square(frame_array), axis=1))
+
+    return 20 * np.log10(np.maximum(rms_array, 1e-10))
+
+
+def estimateSnr(y: np.ndarray, y_noise: np.ndarray = None, noise_quantile: float = 10, signal_quantile: float = 95) -> float:
+    """
+    由逐帧RMS估计信噪比（dB）：信号电平取帧能量的signal_quantile分位数，
+    噪声电平在给出噪声样本y_noise时取其帧能量的中位数，否则取整段信号帧能量的noise_quantile分位数（噪声底）。
+
+    >>> y = np.concatenate([np.zeros(16000), np.ones(16000)]).astype(np.float32)
+    >>> estimateSnr(y) > 100
+    True
+    """
+    frame_db = _calFrameDb(y)
+    signal_db = np.percentile(frame_db, signal_quantile)
+    if y_noise is not None:
+        noise_db = np.median(_calFrameDb(y_noise))
+    else:
+        noise_db = np.percentile(frame_db, noise_quantile)
+
+    return float(signal_db - noise_db)
+
+
+def chooseNoiseMode(snr_db: float) -> str:
+    """
+    按信噪比选择降噪方式："skip"（已足够干净）、"stationary"（平稳降噪）或"nonstationary"（非平稳降噪）。
+
+    >>> [chooseNoiseMode(snr_db) for snr_db in (40.0, 25.0, 10.0)]
+    ['skip', 'stationary', 'nonstationary']
+    """
+    if snr_db >= NOISE_SKIP_SNR_DB:
+        return "skip"
+    if snr_db >= NOISE_STATIONARY_SNR_DB:
+        return "stationary"
+    return "nonstationary"
+
+
+def getNoiseProfile(
+    y: np.ndarray = None,
+    sr: int = None,
+    speech_start: float = None,
+    session: str = None,
+    min_s: float = NOISE_PROFILE_MIN_S,
+    guard_s: float = NOISE_PROFILE_GUARD_S,
+):
+    """
+    取首个ASR字之前的静音作为噪声样本。session给出时按会话（录音设备）缓存，同一会话只估计一次、之后直接复用。
+
+    参数：
+        y、sr: 单声道音频与采样率。
+        speech_start(float): 首个字的起始时间（秒），可由getWordInfoList的第一个字得到。
+        session(str, 可选): 录音设备或会话的标识。
+        min_s(float): 可用静音的最短时长（秒），不足时不估计。
+        guard_s(float): 首字前不使用的时长（秒），避免混入字头。
+
+    返回：
+        噪声样本（一维数组），无法估计时返回None。
+    """
+    if session is not None and session in _noise_profile_dict:
+        return _noise_profile_dict[session]
+    if y is None or speech_start is None:
+        return None
+
+    end_sample = int((speech_start - guard_s) * sr)
+    if end_sample < min_s * sr:
+        return None
+    y_noise = np.array(y[:end_sample], dtype=np.float32)
+    if session is not None:
+        _noise_profile_dict[session] = y_noise
+
+    return y_noise
+
+
 def noiseReduce(
     y: np.ndarray = None,
     sr: int = None,
     prop_decrease: float = 0.8,
-    stationary: bool = False,
-) -> np.ndarray:
+    stationary: bool = None,
+    y_noise: np.ndarray = None,
+    speech_start: float = None,
+    session: str = None,
+    chunk_s: float = NOISE_CHUNK_S,
+    return_mode: bool = False,
+) -> tuple:
     """将重采样后的数据y_resampled进行降噪，消除非人声噪音.
 
      noiseReduce库参数：https://github.com/timsainb/noisereduce
 
+     先估计信噪比（见estimateSnr），已足够干净的录音直接返回，较干净的使用平稳降噪，噪声明显时才使用非平稳降噪。
+     有噪声样本时平稳降噪以噪声样本统计噪声谱；长录音按chunk_s秒分块处理，内存占用与录音时长无关。
+
      参数 ：
          y:
              加载的音频文件的时域信号，是一个一维的NumPy数组。
          sr:
              音频的采样率。
-         thresh_n_mult_nonstationary:
-             降噪的幅度，只能用于动态降噪中，数值越大，降噪的幅度越大。
          prop_decrease:
             降噪的比例，数字1表示降噪百分百。
          stationary:
-             布尔值，True表示平稳降噪 ，False表示非平稳降噪。
+             布尔值，True表示平稳降噪 ，False表示非平稳降噪，None（默认）表示按信噪比自动选择或跳过。
+         y_noise:
+             噪声样本，缺省时由speech_start和session通过getNoiseProfile得到。
+         speech_start:
+             首个ASR字的起始时间（秒），其之前的静音用作噪声样本。
+         session:
+             录音设备或会话的标识，同一会话复用第一次估计的噪声样本。
+         chunk_s:
+             分块降噪的块长（秒），块两侧各重叠NOISE_CHUNK_PAD_S秒。
+         return_mode:
+             为True时额外返回所用的降噪方式与估计的信噪比。
 
     返回：
-        降噪后的一维的NumPy数组的音频文件的时域信号。
+        (vt_audio, vt_sr)：降噪后的一维NumPy数组与采样率；return_mode为True时为(vt_audio, vt_sr, mode, snr_db)。
     """
-    reduced_noise = nr.reduce_noise(
-        y=y,
-        sr=sr,
-        prop_decrease=prop_decrease,
-        stationary=stationary,
-    )
-    vt_audio = np.asarray(reduced_noise)
+    if y_noise is None:
+        y_noise = getNoiseProfile(y, sr, speech_start=speech_start, session=session)
+    snr_db = estimateSnr(y, y_noise)
+    if stationary is None:
+        mode = chooseNoiseMode(snr_db)
+    else:
+        mode = "stationary" if stationary else "nonstationary"
+
+    if mode == "skip":
+        vt_audio = np.asarray(y)
+    else:
+        reduced_noise = nr.reduce_noise(
+            y=y,
+            sr=sr,
+            prop_decrease=prop_decrease,
+            stationary=mode == "stationary",
+            y_noise=y_noise if mode == "stationary" else None,
+            chunk_size=int(chunk_s * sr),
+            padding=int(NOISE_CHUNK_PAD_S * sr),
+        )
+        vt_audio = np.asarray(reduced_noise)
     vt_sr = sr
 
+    if return_mode:
+        return vt_audio, vt_sr, mode, snr_db
     return vt_audio, vt_sr
 
 
+def _noiseReduceFile(arg: tuple) -> dict:
+    """解码一个文件、降噪并写为WAV，供batchNoiseReduce在子进程中执行。"""
+    audio_path, output_path, sr, y_noise, speech_start, noise_kwargs = arg
+    y, sr = decodeAudio(audio_path, sr=sr, mono=True)
+    vt_audio, vt_sr, mode, snr_db = noiseReduce(
+        y=y, sr=sr, y_noise=y_noise, speech_start=speech_start, return_mode=True, **noise_kwargs
+    )
+    sf.write(output_path, vt_audio, vt_sr)
+
+    return {"audio_path": str(audio_path), "output_path": str(output_path), "mode": mode, "snr_db": round(snr_db, 2)}
+
+
+def batchNoiseReduce(
+    audio_path_list: list,
+    output_dir: Path,
+    sr: int = None,
+    speech_start_list: list = None,
+    session_list: list = None,
+    max_workers: int = None,
+    **noise_kwargs,
+) -> list:
+    """
+    用进程池批量降噪，结果以WAV写入output_dir（文件名为原文件名加.wav）。
+
+    同一会话的噪声样本在主进程中由该会话第一条可用的录音估计一次，再随任务分发，子进程之间不必重复估计。
+
+    参数：
+        audio_path_list(list): 音频路径列表。
+        output_dir(Path): 输出目录。
+        sr(int, 可选): 解码采样率，缺省时使用分析配置的采样率。
+        speech_start_list(list, 可选): 每条录音首个ASR字的起始时间（秒），无时长静音可用时为None。
+        session_list(list, 可选): 每条录音所属的设备/会话标识。
+        max_workers(int, 可选): 进程数，缺省时使用multipuleProcess的默认值。
+        noise_kwargs: 透传给noiseReduce的其余参数，如prop_decrease、stationary、chunk_s。
+
+    返回：
+        每条录音一个{"audio_path", "output_path", "mode", "snr_db"}字典，顺序与audio_path_list一致。
+    """
+    if sr is None:
+        sr = getAnalysisConfig()["sr"]
+    item_num = len(audio_path_list)
+    speech_start_list = speech_start_list or [None] * item_num
+    session_list = session_list or [None] * item_num
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # 每个会话只解码开头的静音，估计一次噪声样本
+    profile_dict = {}
+    for audio_path, speech_start, session in zip(audio_path_list, speech_start_list, session_list):
+        if session is None or speech_start is None or profile_dict.get(session) is not None:
+            continue
+        y_head, _ = decodeAudio(audio_path, sr=sr, mono=True, end=speech_start)
+        profile_dict[session] = getNoiseProfile(y_head, sr, speech_start=speech_start)
+
+    arg_list = [
+        (
+            audio_path,
+            output_dir / (Path(audio_path).stem + ".wav"),
+            sr,
+            profile_dict.get(session),
+            speech_start,
+            noise_kwargs,
+        )
+        for audio_path, speech_start, session in zip(audio_path_list, speech_start_list, session_list)
+    ]
+    if max_workers == 1 or item_num <= 1:
+        return [_noiseReduceFile(arg) for arg in arg_list]
+    kwargs = {} if max_workers is None else {"max_workers": max_workers}
+
+    return multipuleProcess(_noiseReduceFile, arg_list, **kwargs)
+
+
+def _getSegmentFormat(output_path: Path) -> str:
+    """由输出文件后缀得到soundfile的格式名，soundfile无法写出的格式（如m4a）改用FLAC。"""
+    audio_format = output_path.suffix.lstrip(".").upper()
+
+    return audio_format if audio_format in sf.available_formats() else "FLAC"
+
+
+def _copySegment(input_audio, output_path: Path, start: float, end: float):
+    """ffmpeg流复制：不解码、不重新编码，切点落在编码帧边界上。"""
+    cmd = [FFMPEG_BIN, "-nostdin", "-v", "error", "-y"]
+    if start > 0:
+        cmd += ["-ss", f"{start:.6f}"]
+    if end is not None:
+        cmd += ["-t", f"{max(end - start, 0):.6f}"]
+    cmd += ["-i", str(input_audio), "-map", "0:a", "-c", "copy", str(output_path)]
+    subprocess.run(cmd, capture_output=True, check=True)
+
+
+def exportSegments(
+    input_audio,
+    segment_list: list,
+    output_dir: Path,
+    output_name_list: list = None,
+    audio_format: str = SEGMENT_FORMAT,
+    sr: int = None,
+    mono: bool = False,
+    pcm_store=None,
+) -> list:
+    """
+    将一个音频文件中的多个[start, end)区间导出为独立的音频文件，源文件只解码一次（或按区间定位读取）。
+
+    - WAV/FLAC等可精确定位的源文件按区间读取，不解码区间以外的部分；压缩格式的源文件整体解码一次后逐段截取；
+      给出pcm_store时直接从规范化PCM存储（16k单声道）截取，不再解码。
+    - audio_format为"wav"、"flac"等时由soundfile写出，不经过pydub/ffmpeg；为"copy"时用ffmpeg流复制，不重新编码，
+      未安装ffmpeg时退回按源文件格式重新编码；为None时按输出文件名的后缀确定格式。
+
+    参数：
+        input_audio(Path 或 str): 源音频路径。
+        segment_list(list): [(start, end), ...]，单位为秒，end为None表示到文件末尾。
+        output_dir(Path): 输出目录，不存在时创建。
+        output_name_list(list, 可选): 每段的输出文件名，缺省为"<源文件名>_<序号>.<格式后缀>"。
+        audio_format(str): 输出格式，默认值见setting.SEGMENT_FORMAT。
+        sr(int, 可选): 输出采样率，缺省时保持源采样率（使用pcm_store时固定为存储采样率）。
+        mono(bool): 是否混合为单声道。
+        pcm_store(PcmStore, 可选): 规范化PCM存储。
+
+    返回：
+        每段一个{"output_path", "source", "start_sample", "end_sample", "sr", "format"}字典，
+        start_sample、end_sample为该段在源信号（按输出采样率计）中的精确采样点区间[start_sample, end_sample)。
+        流复制时为请求区间对应的采样点，实际切点在编码帧边界上。
+    """
+    input_audio = Path(input_audio)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    is_copy = audio_format == "copy"
+    if is_copy and not _hasFfmpeg():
+        # 无法流复制时按源文件格式重新编码，输出文件名保持不变
+        is_copy = False
+        audio_format = input_audio.suffix.lstrip(".").lower()
+    if output_name_list is None:
+        suffix = input_audio.suffix if audio_format in (None, "copy") else "." + audio_format
+        output_name_list = [f"{input_audio.stem}_{i:03d}{suffix}" for i in range(len(segment_list))]
+
+    # 决定读取方式：PCM存储 > 整体解码一次（压缩格式） > 按区间定位读取（可精确定位的格式）
+    y = None
+    if pcm_store is not None:
+        y, out_sr = pcm_store.load(input_audio)
+    elif is_copy:
+        out_sr = getAudioInfo(input_audio)["sr"]
+    elif input_audio.suffix.lower() not in SOUNDFILE_FORMAT_SET:
+        y, out_sr = decodeAudio(input_audio, sr=sr, mono=mono)
+    else:
+        out_sr = sr or getAudioInfo(input_audio)["sr"]
+
+    record_list = []
+    for (start, end), output_name in zip(segment_list, output_name_list):
+        output_path = output_dir / output_name
+        start_sample = int(round(start * out_sr))
+        if is_copy:
+            _copySegment(input_audio, output_path, start, end)
+            end_sample = None if end is None else int(round(end * out_sr))
+            if end_sample is None:
+                end_sample = getAudioInfo(input_audio)["frames"]
+        else:
+            if y is not None:
+                end_sample = y.shape[-1] if end is None else min(int(round(end * out_sr)), y.shape[-1])
+                segment = y[..., start_sample:end_sample]
+            else:
+                segment, _ = decodeAudio(input_audio, sr=sr, mono=mono, start=start, end=end)
+                end_sample = start_sample + segment.shape[-1]
+            sf.write(output_path, np.asarray(segment).T, out_sr, format=_getSegmentFormat(output_path))
+        record_list.append(
+            {
+                "output_path": str(output_path),
+                "source": str(input_audio),
+                "start_sample": start_sample,
+                "end_sample": end_sample,
+                "sr": out_sr,
+                "format": "copy" if is_copy else _getSegmentFormat(output_path).lower(),
+            }
+        )
+
+    return record_list
+
+
+def _exportJob(job: dict) -> list:
+    return exportSegments(**job)
+
+
+def batchExportSegments(job_list: list, max_workers: int = None) -> list:
+    """
+    用进程池批量导出，每个任务是一组exportSegments的关键字参数（一个源文件及其全部区间），
+    同一源文件只在一个子进程中解码一次，编码不受GIL限制。
+
+    返回：
+        与job_list一一对应的exportSegments返回值。
+    """
+    if max_workers == 1 or len(job_list) <= 1:
+        return [_exportJob(job) for job in job_list]
+    kwargs = {} if max_workers is None else {"max_workers": max_workers}
+
+    return multipuleProcess(_exportJob, job_list, **kwargs)
+
+
 def cutAudio(
-    start_time=0.0, end_time=None, output_dir=None, input_audio=None
+    start_time=0.0, end_time=None, output_dir=None, input_audio=None, pcm_store=None, audio_format="copy"
 ):
-    """给定时间戳对音频进行切割
+    """给定时间戳对音频进行切割，基于exportSegments实现
 
     参数：
         start_time(float):
-            切割的起始时间戳。
+            切割的起始时间戳（毫秒）。
         end_time(float):
-            切割的终点时间戳。
+            切割的终点时间戳（毫秒）。
         output_dir(Path):
             音频文件输出目录的绝对路径。
-        output_audio(str):
-            音频文件输出名。
         input_audio(Path):
-            待切割音频的绝对路径。
+            待切割音频的绝对路径，输出文件与其同名。
+        pcm_store(PcmStore, 可选):
+            给出时从规范化PCM存储按采样点截取区间（16k单声道），不再解码原始音频。
+        audio_format(str):
+            输出格式，默认"copy"即ffmpeg流复制，未安装ffmpeg时按源文件格式重新编码，见exportSegments。
 
     返回：
-        已切割的音频文件。
+        已切割音频的记录，含输出路径与精确的采样点区间，见exportSegments。
 
     """
     file_name = os.path.basename(input_audio)
-    output_path = output_dir / file_name
-    # print(f"Start download '{output_path}' ...")
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    audio = AudioSegment.from_file(input_audio)
-    duration_s = len(audio)
-    if end_time is None:
-        end_time = duration_s
-    segment = audio[start_time: end_time]
-    segment.export(output_path, format="mp3")
+    # print(f"Start download '{output_dir / file_name}' ...")
+
+    # 时间戳单位为毫秒
+    start_s, end_s = start_time / 1000, None if end_time is None else end_time / 1000
+    if pcm_store is not None and audio_format == "copy":
+        audio_format = None
+
+    return exportSegments(
+        input_audio,
+        [(start_s, end_s)],
+        output_dir,
+        output_name_list=[file_name],
+        audio_format=audio_format,
+        pcm_store=pcm_store,
+    )[0]
@@ -11,12 +11,14 @@
     sample_dict = audioSampling(song_names=["guoge", "molihua"], max_samples=1000)
 """
 
-import pandas as pd
 from pathlib import Path
 import logging
 from itertools import groupby
 import random
 from setting import *
+from util import lazyImport
+
+pd = lazyImport("pandas")
 
 # 配置日志记录器
 logging.basicConfig(level=logging.INFO, format="%(message)s")
@@ -15,8 +15,11 @@ eigen_dict_rs = calNoteFreq(eigen_dict_t, note_sig='G')
 """
 
 from setting import *
+from functools import lru_cache
+from types import MappingProxyType
 import json
-import pandas as pd
+import csv
+import numpy as np
 
 
 def extractJson(json_dir: Path = EIGEN_DIR, json_name: str = None):
@@ -79,12 +82,111 @@ def calNoteTime(eigen_dict: dict) -> dict:
     return eigen_dict_t
 
 
+# 简谱唱名在大调音阶中相对主音的半音数，"#"再升半音
+SOLFEGE_SEMITONE_DICT = {"1": 0, "2": 2, "3": 4, "4": 5, "5": 7, "6": 9, "7": 11}
+# 调号主音相对C的半音数，同音异名的调号共用同一主音
+KEY_SEMITONE_DICT = {
+    "C": 0, "B#": 0, "C#": 1, "Db": 1, "D": 2, "D#": 3, "Eb": 3, "E": 4, "Fb": 4, "F": 5, "E#": 5,
+    "F#": 6, "Gb": 6, "G": 7, "G#": 8, "Ab": 8, "A": 9, "A#": 10, "Bb": 10, "B": 11, "Cb": 11,
+}
+
+
+def _calEqualTemperamentTable() -> MappingProxyType:
+    """
+    按十二平均律（A4=440Hz）计算调号音符频率表，主音位于C4～B4之间，频率保留2位小数。
+    调号音符频率表不存在时使用，表中个别音符与平均律略有出入，有表时以表为准。
+    """
+    freq_table = {}
+    for key_sig, key_semitone in KEY_SEMITONE_DICT.items():
+        name_dict = {}
+        for name, semitone in SOLFEGE_SEMITONE_DICT.items():
+            for sharp in ("", "#"):
+                midi = 60 + key_semitone + semitone + len(sharp)
+                name_dict[name + sharp] = round(440 * 2 ** ((midi - 69) / 12), 2)
+        freq_table[key_sig] = MappingProxyType(name_dict)
+
+    return MappingProxyType(freq_table)
+
+
+@lru_cache(maxsize=None)
+def getNoteFreqTable(data_dir: Path = RAW_DATA_DIR, data_name: str = FREQ_CSV) -> MappingProxyType:
+    """
+    读取调号音符频率表，每个进程只读取一次，返回只读的{调号: {唱名: 频率}}。
+
+    音名1、音名2两列的调号都可用于查询，同一调号、唱名出现多次时以表中第一行为准，与按行筛选取第一个匹配值的结果一致。
+    表文件不存在时按十二平均律计算，见_calEqualTemperamentTable。
+    """
+    csv_filename = os.path.join(str(data_dir), data_name)
+    if not os.path.exists(csv_filename):
+        return _calEqualTemperamentTable()
+
+    freq_table = {}
+    with open(csv_filename, "r", encoding="gbk", newline="") as f:
+        for row in csv.DictReader(f):
+            for key_sig in (row["音名1"], row["音名2"]):
+                if key_sig:
+                    freq_table.setdefault(key_sig, {}).setdefault(row["唱名"], float(row["频率"]))
+
+    return MappingProxyType({key_sig: MappingProxyType(name_dict) for key_sig, name_dict in freq_table.items()})
+
+
+@lru_cache(maxsize=None)
+def parseNote(note: str) -> tuple:
+    """
+    解析简谱音符，返回(唱名, 八度偏移)。"+"表示升八度，"-"表示降八度，个数即八度数，"+"与"-"同时出现时不偏移。
+
+    >>> parseNote("+1"), parseNote("--6"), parseNote("5#")
+    (('1', 1), ('6', -2), ('5#', 0))
+    """
+    negative_count = note.count("-")
+    positive_count = note.count("+")
+    name = note.replace("-", "").replace("+", "")
+    if negative_count > 0 and positive_count == 0:
+        return name, -negative_count
+    if positive_count > 0 and negative_count == 0:
+        return name, positive_count
+
+    return name, 0
+
+
+def calNoteFreqArray(
+        note_list: list, note_sig, data_dir: Path = RAW_DATA_DIR, data_name: str = FREQ_CSV
+) -> np.ndarray:
+    """
+    批量计算音符频率：整首乐谱中不同的音符只解析一次，再按调号一次查表、乘以八度倍数。
+
+    参数：
+    - note_list: list，简谱音符字符串，如["1", "+2", "-6"]。
+    - note_sig: str 或 list，调号；为调号列表时一次计算所有调号。
+    - data_dir、data_name: 调号音符频率表的位置，见getNoteFreqTable。
+
+    返回：
+    - freq_array: np.ndarray，float64，note_sig为str时形状为(音符数,)，为list时为(调号数, 音符数)，查不到的音符为nan。
+      升降八度是乘以2的整数次幂，结果与逐个查表后再乘以2或0.5完全相同。
+    """
+    is_single = isinstance(note_sig, str)
+    key_sig_list = [note_sig] if is_single else list(note_sig)
+    freq_table = getNoteFreqTable(data_dir, data_name)
+
+    unique_note_array, inverse_array = np.unique(np.asarray(note_list, dtype=str), return_inverse=True)
+    name_list, shift_list = zip(*map(parseNote, unique_note_array.tolist())) if len(unique_note_array) else ((), ())
+    base_array = np.array(
+        [[freq_table.get(key_sig, {}).get(name, np.nan) for name in name_list] for key_sig in key_sig_list],
+        dtype=np.float64,
+    ).reshape(len(key_sig_list), len(name_list))
+    freq_array = (base_array * np.exp2(np.array(shift_list, dtype=np.float64)))[:, inverse_array.reshape(-1)]
+
+    return freq_array[0] if is_single else freq_array
+
+
 def calNoteFreq(
         eigen_dict_t: dict, data_dir: Path = RAW_DATA_DIR, data_name: str = FREQ_CSV, note_sig: str = None
 ) -> dict:
     """
    根据调号音符频率表以及给定的调号，计算调号对应的简谱里所有音符的频率，并将计算出来的频率值替换掉以前的JSON文件中的note值。
 
+   频率表每个进程只读取一次（见getNoteFreqTable），整首乐谱的音符一次批量换算（见calNoteFreqArray）。
+
    参数：
    - eigen_dict_t: dict，calNoteTime处理后的JSON文件，其中包含简谱信息。
    - data_dir: Path，调号音符频率表所在目录的绝对路径，默认为RAW_DATA_DIR。
@@ -92,55 +194,20 @@ def calNoteFreq(
    - note_sig: str，调号，乐理中的概念。取值范围为调号频率表的音名1列和音名2列取值范围。
 
    返回：
-   - eigen_dict_rs: dict，将calNoteTime处理后JSON中note键所对应的value值替换为频率。
+   - eigen_dict_rs: dict，将calNoteTime处理后JSON中note键所对应的value值替换为频率，查不到的音符为None。
    """
-
-    csv_filename = os.path.join(str(data_dir), data_name)  # 注意：Path对象需要转换为字符串
-    df = pd.read_csv(csv_filename, encoding="gbk")
-
-    # 筛选出与给定调号匹配的音符频率信息
-    matched_rows = df[(df["音名1"] == note_sig) | (df["音名2"] == note_sig)]
     eigen_list = eigen_dict_t["eigen_list"]
+    note_list = [note for eigen in eigen_list for note in eigen["eigen"]["note"]]
+    freq_list = [
+        None if np.isnan(freq) else freq for freq in calNoteFreqArray(note_list, note_sig, data_dir, data_name).tolist()
+    ]
 
-    # 提取简谱列表中所有音符的名称
-    notes = []
+    # 按原来的嵌套结构原地回填每个字的音符频率
+    start = 0
     for eigen in eigen_list:
-        note = eigen["eigen"]["note"]
-        notes.append(note)
-
-    # 遍历音符列表，计算每个音符的频率
-    for sublist in notes:
-        for i in range(len(sublist)):
-            item = sublist[i]
-            negative_count = 0  # 用于统计'-'的个数
-            positive_count = 0  # 用于统计'+'的个数
-            numbers = []  # 用于存储除去符号后的数字
-
-            # 计算音符名称中的'+'和'-'符号数量
-            for char in item:
-                if char == "-":
-                    negative_count += char.count("-")
-                elif char == "+":
-                    positive_count += char.count("+")
-
-            # 提取音符名称中的数字部分
-            number = item.replace("-", "").replace("+", "")
-            numbers.append(number)
-
-            # 根据音符名称从频率表查找对应的频率
-            matched_freq = matched_rows[matched_rows["唱名"] == number]["频率"].values
-
-            # 如果找到频率，则处理符号对频率的影响,+号相当于升八度，减号相当于降八度
-            if len(matched_freq) > 0:
-                matched_freq = matched_freq[0]
-                if negative_count > 0 and positive_count == 0:
-                    matched_freq = matched_freq * 0.5 ** negative_count
-                elif positive_count > 0 and negative_count == 0:
-                    matched_freq = matched_freq * 2 ** positive_count
-            else:
-                matched_freq = None
-
-            sublist[i] = matched_freq
+        sublist = eigen["eigen"]["note"]
+        sublist[:] = freq_list[start: start + len(sublist)]
+        start += len(sublist)
 
     eigen_dict_rs = eigen_dict_t
     return eigen_dict_rs
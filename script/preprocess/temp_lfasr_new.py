@@ -19,8 +19,8 @@ import sys
 import re
 import doctest
 from pathlib import Path
-from pydub import AudioSegment
 from pypinyin import pinyin, lazy_pinyin, Style
+from preprocess.prep_audio import exportSegments
 
 lfasr_host = "https://raasr.xfyun.cn/v2/api"
 # 请求的接口名
@@ -554,22 +554,18 @@ def cutAudio(
             待切割音频的绝对路径。
 
     返回：
-        已切割的音频文件。
+        已切割音频的记录，含输出路径与精确的采样点区间，见prep_audio.exportSegments。
 
     """
     file_name = os.path.basename(input_audio)
     output_name = file_name + "_" + output_audio
     output_path = output_dir / output_name
     print(f"Start download '{output_path}' ...")
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    audio = AudioSegment.from_file(input_audio)
-    duration_s = len(audio) / 1000
-    if end_time is None:
-        end_time = duration_s
-    segment = audio[start_time * 1000 : end_time * 1000]
-    segment.export(output_path, format="mp3")
+
+    # 只解码需要保留的区间，按输出文件名的后缀写出
+    return exportSegments(
+        input_audio, [(start_time, end_time)], output_dir, output_name_list=[output_name], audio_format=None
+    )[0]
 
 
 def getWordInfoList(transfer_json: list) -> dict:
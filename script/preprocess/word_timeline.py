@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+"""逐字特征的紧凑列式存储结构WordTimeline。
+
+getWordInfoList、getPerWordFeat、calDtwFreqAndTempo原先传递{"eigen_list": [{"word": ..., "eigen": {...}}]}
+形式的嵌套字典，每个字都要一个字典加若干浮点对象，子进程回传时逐个pickle，取freq、times时又要逐项遍历。
+WordTimeline把同一录音的所有字按列存放：一个字数组加start/end/freq/duration四列float32，
+跨进程回传只需序列化5个数组，取某一列特征直接得到NumPy数组。
+
+与原字典格式可以互相转换：
+    timeline = WordTimeline.fromEigenDict(eigen_dict)
+    eigen_dict = timeline.toEigenDict()
+
+经典的使用案例：
+    timeline = getWordInfoList(funasr_dict=rs_dict, as_timeline=True)
+    timeline = getPerWordFeat(eigen_dict=timeline, freq_list=freq_list, times_list=times_list)
+    freq_seq, duration_seq = timeline.freq, timeline.duration
+"""
+
+import numpy as np
+
+
+class WordTimeline(object):
+    """一条录音按字组织的时间轴与特征，列式存储。
+
+    属性：
+        words(np.ndarray): 字（或英文单词）组成的定长unicode数组。
+        start(np.ndarray): 每个字的起始时间（秒），float32。
+        end(np.ndarray): 每个字的结束时间（秒），float32。
+        freq(np.ndarray): 每个字的代表性基频（Hz），float32，未计算时为nan。
+        duration(np.ndarray): 每个字的发音时长（秒），float32，未计算时为nan。
+    """
+
+    __slots__ = ("words", "start", "end", "freq", "duration")
+
+    def __init__(self, words=(), start=(), end=(), freq=None, duration=None):
+        """由等长的列构造WordTimeline，freq与duration缺省时填充nan。"""
+        self.words = np.asarray(words, dtype=str)
+        self.start = np.asarray(start, dtype=np.float32)
+        self.end = np.asarray(end, dtype=np.float32)
+        word_num = len(self.words)
+        self.freq = (
+            np.full(word_num, np.nan, dtype=np.float32)
+            if freq is None
+            else np.asarray(freq, dtype=np.float32)
+        )
+        self.duration = (
+            np.full(word_num, np.nan, dtype=np.float32)
+            if duration is None
+            else np.asarray(duration, dtype=np.float32)
+        )
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __repr__(self):
+        return f"WordTimeline({len(self)} words)"
+
+    def __getstate__(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __setstate__(self, state):
+        for field in self.__slots__:
+            setattr(self, field, state[field])
+
+    def getBoundary(self) -> tuple:
+        """
+        返回float64的(起始时间, 结束时间)数组。
+
+        ASR时间戳精确到毫秒，float32存储后按3位小数取整即可还原为与原字典格式完全相同的float64值，
+        保证按时间筛选帧时边界判断与原实现一致。
+        """
+        return (
+            np.round(self.start.astype(np.float64), 3),
+            np.round(self.end.astype(np.float64), 3),
+        )
+
+    def getFeat(self) -> tuple:
+        """
+        返回float64的(基频, 时长)数组，按原实现的位数（3位、4位小数）取整，与原字典格式中的freq、times数值一致。
+        """
+        return (
+            np.round(self.freq.astype(np.float64), 3),
+            np.round(self.duration.astype(np.float64), 4),
+        )
+
+    def select(self, index) -> "WordTimeline":
+        """按布尔掩码或下标数组选出部分字，返回新的WordTimeline。"""
+        return WordTimeline(
+            self.words[index],
+            self.start[index],
+            self.end[index],
+            self.freq[index],
+            self.duration[index],
+        )
+
+    @classmethod
+    def fromEigenDict(cls, eigen_dict: dict) -> "WordTimeline":
+        """
+        由原字典格式{"eigen_list": [{"word": str, "eigen": {"start_time", "end_time", ["freq", "times"]}}]}构造。
+        """
+        eigen_list = eigen_dict["eigen_list"]
+
+        return cls(
+            [item["word"] for item in eigen_list],
+            [item["eigen"]["start_time"] for item in eigen_list],
+            [item["eigen"]["end_time"] for item in eigen_list],
+            [item["eigen"].get("freq", np.nan) for item in eigen_list],
+            [item["eigen"].get("times", np.nan) for item in eigen_list],
+        )
+
+    def toEigenDict(self) -> dict:
+        """
+        转换回原字典格式，freq与duration为nan的字不输出对应字段。数值按原实现的位数取整：
+        起止时间与基频保留3位小数，时长（times）保留4位小数。
+        """
+        start_array, end_array = self.getBoundary()
+        eigen_list = []
+        for i in range(len(self)):
+            eigen = {"start_time": float(start_array[i]), "end_time": float(end_array[i])}
+            if not np.isnan(self.freq[i]):
+                eigen["freq"] = round(float(self.freq[i]), 3)
+            if not np.isnan(self.duration[i]):
+                eigen["times"] = round(float(self.duration[i]), 4)
+            eigen_list.append({"word": str(self.words[i]), "eigen": eigen})
+
+        return {"eigen_list": eigen_list}
+
+
+def asWordTimeline(eigen_dict) -> WordTimeline:
+    """字典格式转换为WordTimeline，已是WordTimeline时原样返回。"""
+    if isinstance(eigen_dict, WordTimeline):
+        return eigen_dict
+    return WordTimeline.fromEigenDict(eigen_dict)
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+"""
+分析配置（采样率、帧长、帧移）与基频估计算法的速度/精度基准
+
+对同一批已识别的录音，分别按setting.ANALYSIS_CONFIG_DICT中的各分析配置和各基频估计算法提取逐字基频，统计：
+- 解码耗时、基频估计耗时，以及实时倍率（音频秒数/总耗时）；
+- 与参考组合（默认为"legacy"配置下的pyin，即原先的分析方式）相比的逐字基频一致性：
+  两边都有结果的字所占比例、音分差的中位数、音分差在50音分（半个半音）以内的字所占比例。
+
+经典的使用案例：
+    python -m run.benchmark_analysis --dataset qilai --scp qilai
+"""
+
+from setting import *
+from util import *
+from preprocess.funasr_go import *
+from preprocess.audio_eigen_new import *
+from preprocess.prep_audio import xfrVocalTract
+
+import time
+import numpy as np
+
+
+def _getWordFreqDict(timeline) -> dict:
+    """以字的(起始时间, 结束时间)为键，返回逐字基频，用于不同配置之间按字对齐。"""
+    start_array, end_array = timeline.getBoundary()
+    freq_array, _ = timeline.getFeat()
+
+    return dict(zip(zip(start_array.tolist(), end_array.tolist()), freq_array.tolist()))
+
+
+def benchmarkAnalysisMode(
+    rs_dict_list: list,
+    input_audio_dir=UPLOAD_FILE_DIR,
+    input_audio_dataset: str = "qilai",
+    mode_list: list = None,
+    backend_list: list = None,
+    reference: tuple = ("legacy", "pyin"),
+) -> list:
+    """
+    逐条录音、逐个(分析配置, 基频估计算法)组合提取逐字基频，汇总速度与一致性。
+
+    参数：
+    - rs_dict_list (list): funasrRun返回的"scp_rs"识别结果列表。
+    - input_audio_dir、input_audio_dataset: 录音所在目录，与getSongFeat相同。
+    - mode_list (list, 可选): 参与比较的分析配置名，缺省为setting.ANALYSIS_CONFIG_DICT的全部配置。
+    - backend_list (list, 可选): 参与比较的基频估计算法，缺省为PITCH_BACKEND_DICT的全部算法。
+    - reference (tuple): 作为一致性基准的(分析配置, 基频估计算法)。
+
+    返回：
+    - bench_list (list of dict): 每个组合一条记录，字段见模块文档。
+    """
+    if mode_list is None:
+        mode_list = list(ANALYSIS_CONFIG_DICT)
+    if backend_list is None:
+        backend_list = list(PITCH_BACKEND_DICT)
+    combo_list = [(mode, backend) for mode in mode_list for backend in backend_list]
+    if reference not in combo_list:
+        combo_list.insert(0, reference)
+
+    stat_dict = {combo: {"decode_s": 0.0, "pitch_s": 0.0, "audio_s": 0.0, "word_freq_list": []} for combo in combo_list}
+    for rs_dict in rs_dict_list:
+        eigen_dict = getWordInfoList(funasr_dict=rs_dict, as_timeline=True)
+        audio_name = rs_dict["key"] + ".wav"
+        for mode in dict.fromkeys(combo[0] for combo in combo_list):
+            start = time.perf_counter()
+            y, sr = xfrVocalTract(
+                audio_dir=input_audio_dir, dataset_name=input_audio_dataset, audio_name=audio_name, analysis_mode=mode
+            )
+            decode_s = time.perf_counter() - start
+            for combo in [combo for combo in combo_list if combo[0] == mode]:
+                start = time.perf_counter()
+                freq_list, times_list = calAudioFreq(
+                    reduced_noise=y, sr=sr, to_list=False, backend=combo[1], analysis_mode=mode
+                )
+                timeline = getPerWordFeat(eigen_dict=eigen_dict, freq_list=freq_list, times_list=times_list)
+                stat_dict[combo]["pitch_s"] += time.perf_counter() - start
+                stat_dict[combo]["decode_s"] += decode_s
+                stat_dict[combo]["audio_s"] += len(y) / sr
+                stat_dict[combo]["word_freq_list"].append(_getWordFreqDict(timeline))
+
+    bench_list = []
+    for combo in combo_list:
+        stat = stat_dict[combo]
+        cents_list = []
+        word_num = 0
+        for word_freq_dict, ref_word_freq_dict in zip(stat["word_freq_list"], stat_dict[reference]["word_freq_list"]):
+            word_num += len(ref_word_freq_dict)
+            # 未发声的字基频为nan，只统计两边都有有效基频的字
+            cents_list += [
+                abs(1200 * np.log2(word_freq_dict[key] / freq))
+                for key, freq in ref_word_freq_dict.items()
+                if np.isfinite(freq) and np.isfinite(word_freq_dict.get(key, np.nan))
+            ]
+        total_s = stat["decode_s"] + stat["pitch_s"]
+        bench_list.append(
+            {
+                "分析配置": combo[0],
+                "基频算法": combo[1],
+                "解码耗时": round(stat["decode_s"], 3),
+                "基频耗时": round(stat["pitch_s"], 3),
+                "实时倍率": round(stat["audio_s"] / total_s, 2) if total_s > 0 else float("nan"),
+                "字覆盖率": round(len(cents_list) / word_num, 4) if word_num else float("nan"),
+                "音分差中位数": round(float(np.median(cents_list)), 2) if cents_list else float("nan"),
+                "50音分内比例": round(float(np.mean(np.array(cents_list) <= 50)), 4) if cents_list else float("nan"),
+            }
+        )
+
+    return bench_list
+
+
+def main(input_audio_dataset: str = "qilai", scp_name: str = "qilai"):
+    """
+    识别scp_name中的录音（已识别的直接从结果存储读取），然后对全部分析配置与基频估计算法运行基准并打印结果。
+    """
+    rs_dict_list = funasrRun(
+        input_audio_dataset=input_audio_dataset, scp_name=scp_name, input_mode="scp", punc_model=None
+    )["scp_rs"]
+    bench_list = benchmarkAnalysisMode(rs_dict_list, input_audio_dataset=input_audio_dataset)
+    for bench in bench_list:
+        print(", ".join(f"{field}: {value}" for field, value in bench.items()))
+
+    return bench_list
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="分析配置与基频估计算法的速度/精度基准")
+    parser.add_argument("--dataset", default="qilai")
+    parser.add_argument("--scp", default="qilai")
+    args = parser.parse_args()
+    main(input_audio_dataset=args.dataset, scp_name=args.scp)
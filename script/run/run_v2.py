@@ -20,14 +20,16 @@ from setting import *
 from util import *
 from preprocess.prep_extract import *
 from preprocess.audio_eigen_new import *
+from preprocess.prep_audio import xfrVocalTract, getSegmentWindow
+from preprocess.feature_store import PitchFeatureStore, getFeatureStore
+from preprocess.pcm_store import PcmStore, getPcmStore
 from preprocess.funasr_go import *
 from preprocess.prep_notation import *
+from preprocess.compiled_score import getCompiledScore, asCompiledScore
 from score.audio_score import *
 
 from functools import partial
 import numpy as np
-import librosa
-import copy
 
 
 def batch_funasr_run(
@@ -35,13 +37,20 @@ def batch_funasr_run(
     input_audio_name: str = None,
     scp_name: str = None,
     input_mode: str = "file",
+    punc_model: str = None,
 ):
-    """详细说明见funasrRun文档字符串"""
+    """
+    详细说明见funasrRun文档字符串
+
+    getWordInfoList会去掉识别文本中的标点，因此默认不加载标点模型（punc_model=None），
+    模型由funasr_go的模型管理器在进程内复用。
+    """
     rs_dict = funasrRun(
         input_audio_dataset=input_audio_dataset,
         input_audio_name=input_audio_name,
         scp_name=scp_name,
         input_mode=input_mode,
+        punc_model=punc_model,
     )
     rs_dict_list = rs_dict["scp_rs"]
 
@@ -53,6 +62,12 @@ def getSongFeat(
     input_audio_dir=UPLOAD_FILE_DIR,
     input_audio_dataset: str = "qilai",
     input_audio_name: str = None,
+    pitch_backend: str = PITCH_BACKEND,
+    freq_range: tuple = None,
+    voiced_span: bool = PITCH_VOICED_SPAN,
+    analysis_mode: str = ANALYSIS_MODE,
+    feature_store: PitchFeatureStore = None,
+    pcm_store: PcmStore = None,
 ):
     """
     获取单首歌曲的音频特征信息,颗粒度为字，特征维度暂时包括 字、音长、基频。
@@ -65,15 +80,29 @@ def getSongFeat(
     - input_audio_dir (str): 音频文件目录，默认指向UPLOAD_FILE_DIR。
     - input_audio_dataset (str): 音频数据集子目录名称，默认为"qilai"。
     - input_audio_name (str, 可选): 指定要处理的音频文件名，若未提供则从rs_dict中获取。
+    - pitch_backend (str): 基频估计算法，批量初筛可用"yin"或"acf"，最终评分使用"pyin"，默认值见setting.PITCH_BACKEND。
+    - freq_range (tuple, 可选): 由getNotationFreqRange得到的(fmin, fmax)收窄搜索范围。演唱音域超出该范围
+      （见calAudioFreqInRange）时自动退回默认的宽范围重新估计；为None时直接使用宽范围。
+    - voiced_span (bool): 为True时只在ASR字时间戳合并出的发声区间内估计基频（见calAudioFreq的span_list），
+      默认值见setting.PITCH_VOICED_SPAN。
+    - analysis_mode (str): 分析配置名（采样率、帧长、帧移），见setting.ANALYSIS_CONFIG_DICT。音频按该配置的采样率
+      一次解码为单声道，基频估计使用同一配置的帧长与帧移，时间戳与funASR的字时间戳在同一时间轴上。
+    - feature_store (PitchFeatureStore, 可选): 基频轨迹存储。缺省时在setting.FEATURE_STORE_ENABLE为True时使用
+      FEATURE_STORE_DIR下的默认存储（进程内共用一个实例，见getFeatureStore）。音频内容与基频估计参数都未变化时直接读取已存的轨迹，不再解码音频和估计基频；
+      为保证首次计算与再次读取的结果一致，新计算的轨迹也会先写入存储再读出使用。
+    - pcm_store (PcmStore, 可选): 规范化PCM存储，缺省时在setting.PCM_STORE_ENABLE为True时使用进程内共用的默认存储。
+      分析采样率与存储一致时直接读取funasrRun预处理阶段已转换的PCM，音频内容哈希也从存储的索引中读取。
+      虚拟剪辑清单中有记录的音频只分析保留区间，与funASR识别的区间一致，字时间戳与基频时间戳在同一时间轴上。
 
     返回：
-    - pwf_dict (dict): 包含单首歌曲音频特征信息的字典，键为音频文件名，值为按照词语粒度计算的音频特征列表。
+    - pwf_dict (dict): 包含单首歌曲音频特征信息的字典，键为音频文件名，值为按照词语粒度计算的音频特征WordTimeline，
+      从子进程回传时只需序列化几个数组，可用toEigenDict转换为原字典格式。
 
     """
     pwf_dict = {}  # 初始化存储音频特征的字典
 
     # 从ASR识别结果中获取词汇信息
-    eigen_dict = getWordInfoList(funasr_dict=rs_dict)
+    eigen_dict = getWordInfoList(funasr_dict=rs_dict, as_timeline=True)
 
     # TODO:临时解决音频预处理问题，直接从指定路径加载音频
     if input_audio_name is None:
@@ -81,11 +110,57 @@ def getSongFeat(
     else:
         audio_name = input_audio_name
 
-    # 加载音频文件
-    y, sr = librosa.load(input_audio_dir / input_audio_dataset / audio_name)
+    span_list = mergeWordSpan(eigen_dict) if voiced_span else None
+    analysis_config = getAnalysisConfig(analysis_mode)
+    audio_path = input_audio_dir / input_audio_dataset / audio_name
+    if pcm_store is None and PCM_STORE_ENABLE:
+        pcm_store = getPcmStore()
+
+    # 基频轨迹只取决于音频内容与基频估计参数，命中存储时跳过解码与基频估计
+    if feature_store is None and FEATURE_STORE_ENABLE:
+        feature_store = getFeatureStore()
+    if feature_store is not None:
+        param_dict = {
+            "backend": pitch_backend,
+            "freq_range": freq_range,
+            "span_list": span_list,
+            "analysis": analysis_config,
+            "segment": getSegmentWindow(audio_path),
+        }
+        audio_hash = calFileHash(audio_path) if pcm_store is None else pcm_store.getHash(audio_path)
+        feat_key = PitchFeatureStore.makeKey(audio_hash, **param_dict)
+        feat = feature_store.get(feat_key)
+    else:
+        feat = None
+
+    if feat is None:
+        # 按分析配置的采样率加载音频文件
+        y, sr = xfrVocalTract(
+            audio_dir=input_audio_dir,
+            dataset_name=input_audio_dataset,
+            audio_name=audio_name,
+            analysis_mode=analysis_mode,
+            pcm_store=pcm_store,
+        )
 
-    # 计算音频的频率和时间信息
-    freq_list, times_list = calAudioFreq(reduced_noise=y, sr=int(sr))
+        # 计算音频的频率和时间信息，优先在乐谱给出的收窄范围内搜索基频
+        feat = calAudioFreqInRange(
+            reduced_noise=y,
+            sr=int(sr),
+            freq_range=freq_range,
+            to_list=False,
+            backend=pitch_backend,
+            span_list=span_list,
+            span_pad_s=0.0,
+            analysis_mode=analysis_mode,
+            return_prob=True,
+        )
+        if feature_store is not None:
+            feature_store.put(
+                feat_key, feat[0], feat[2], sr=int(sr), hop_length=analysis_config["hop_length"], param_dict=param_dict
+            )
+            feat = feature_store.get(feat_key) or feat
+    freq_list, times_list = feat[0], feat[1]
 
     # 计算按词语粒度的音频特征，并存入pwf_dict
     pwf_dict[audio_name] = getPerWordFeat(
@@ -97,54 +172,49 @@ def getSongFeat(
 
 def getSheetMusicFeatDict(json_name: str = "guoge"):
     """
-    提取乐谱特征字典
+    提取乐谱特征
 
-    该函数用于从指定的JSON文件中提取乐谱特征信息，并根据不同音调进行处理，形成一个包含不同音调下乐谱特征的字典。
+    该函数用于从指定的JSON文件中提取乐谱特征信息，并编译出12个调号及其降八度版本下的逐字频率与音长，见compiled_score模块。
+    同一首歌在每个进程内只编译一次，并持久化到COMPILED_SCORE_DIR，简谱JSON修改后自动重新编译。
 
     参数：
     - json_name (str, 默认值="guoge"): 指定要处理的JSON文件名，该文件应包含乐谱信息。
 
     返回：
-    - notation_feat_dict (dict): 一个字典，键为不同的音调（包括原音调及其降半音版本），值为对应的乐谱特征字典。
+    - notation_feat (CompiledScore): 键为不同的音调（包括原音调及其降八度版本）的乐谱特征，需要原字典格式时调用toFeatDict()。
 
     """
-    key_sig_list = ["A", "A#", "B", "C", "C#", "D", "D#", "E", "F", "F#", "G", "G#"]
-
-    notation_feat_dict = {}  # 初始化乐谱特征字典
-
-    # 遍历所有音调
-    for i in range(len(key_sig_list)):
-        eigen_dict = extractJson(json_name=json_name)
-        eigen_dict_t = calNoteTime(eigen_dict)
-        eigen_dict_rs = calNoteFreq(eigen_dict_t, note_sig=key_sig_list[i])
-        eigen_dict_rs_copy = copy.deepcopy(eigen_dict_rs)
+    return getCompiledScore(
+        json_name=json_name, cache_dir=COMPILED_SCORE_DIR if COMPILED_SCORE_PERSIST else None
+    )
 
-        # 将原始处理结果添加到notation_feat_dict中，键为当前音调
-        notation_feat_dict[key_sig_list[i]] = eigen_dict_rs
 
-        # 创建新键（当前音调降八度）
-        new_key_name = key_sig_list[i] + "/2"
+def getNotationFreqRange(notation_feat, margin_cents: float = PITCH_RANGE_MARGIN_CENTS) -> tuple:
+    """
+    由getSheetMusicFeatDict返回的全部调号及八度变体的音符频率，得到演唱的基频搜索范围。
 
-        # 遍历特征字典，将音符频率信息除以2（降八度）
-        for item in eigen_dict_rs_copy["eigen_list"]:
-            item["eigen"]["note"] = [x / 2 for x in item["eigen"]["note"]]
+    参数：
+    - notation_feat (CompiledScore 或 dict): getSheetMusicFeatDict的返回值，也可以是原字典格式。
+    - margin_cents (float): 在最低、最高音符之外各留出的余量（音分），默认值见setting.PITCH_RANGE_MARGIN_CENTS。
 
-        # 将处理过的特征字典添加至notation_feat_dict中，键为新的音调名称（降八度的调号）
-        notation_feat_dict[new_key_name] = eigen_dict_rs_copy
+    返回：
+    - (fmin, fmax) (tuple): 可作为getSongFeat的freq_range参数。
+    """
+    note_freq_array = asCompiledScore(notation_feat).note_freq.ravel()
 
-    return notation_feat_dict
+    return getPitchSearchRange(note_freq_array[~np.isnan(note_freq_array)], margin_cents=margin_cents)
 
 
-def calDtwFreqAndTempo(notation_feat_dict: dict, batch_pwf_dict: dict):
+def calDtwFreqAndTempo(notation_feat, batch_pwf_dict: dict):
     """
     计算音频与简谱的频率维度与节奏维度的DTW距离，并将结果整理成列表，作为写入CSV的准备数据
 
-    该函数遍历batch_pwf_dict中的每一首歌曲，针对每首歌曲提取其频率和时间特征，并与notation_feat_dict中的乐谱特征进行比较，
+    该函数遍历batch_pwf_dict中的每一首歌曲，针对每首歌曲提取其频率和时间特征，并与notation_feat中的乐谱特征进行比较，
     通过计算DTW距离得出每首歌曲在各个音调下的音准和节拍节奏匹配度，最后将这些结果整合为一个字典列表返回。
 
     参数：
-    - notation_feat_dict (dict): 包含不同调号下乐谱特征信息的字典。
-    - batch_pwf_dict (dict): 包含多首歌曲按词语粒度的音频特征信息的字典。
+    - notation_feat (CompiledScore 或 dict): getSheetMusicFeatDict的返回值，也可以是原字典格式。
+    - batch_pwf_dict (list): getSongFeat返回结果组成的列表，特征可以是WordTimeline或原字典格式。
 
     返回：
     - dtw_rs_list (list of dict): 包含每首歌曲在不同音调下，依据音准（频率）和节拍节奏计算的DTW距离结果的字典列表。
@@ -153,43 +223,31 @@ def calDtwFreqAndTempo(notation_feat_dict: dict, batch_pwf_dict: dict):
     """
     dtw_rs_dict = {}  # 初始化DTW距离结果字典
     dtw_rs_list = []  # 初始化存储最终结果的列表
+    notation_score = asCompiledScore(notation_feat)  # 各调号的逐字频率与音长已预先计算
 
-    # 遍历batch_pwf_dict中的每首歌曲
+    # 提取每首歌曲的频率特征列表和时间特征列表
+    pwd_key_list, freq_list_list, times_list_list = [], [], []
     for pwf_dict_init in batch_pwf_dict:
         pwd_key = next(iter(pwf_dict_init.keys()))  # 获取歌曲文件名
-        pwf_dict = pwf_dict_init[pwd_key]  # 获取歌曲特征字典
-
-        # 提取歌曲的频率特征列表和时间特征列表
-        freq_list = [item["eigen"]["freq"] for item in pwf_dict["eigen_list"]]
-        times_list = [item["eigen"]["times"] for item in pwf_dict["eigen_list"]]
-
-        dtw_rs_dict[pwd_key] = {}  # 初始化存储该歌曲DTW距离结果的子字典
-
-        # 遍历notation_feat_dict中的每一个调号对应的特征字典
-        for nfd_key in notation_feat_dict.keys():
-            # 提取当前调号调号下的频率特征列表和音长特征列表
-            orignal_freq_list = [
-                np.average(item["eigen"]["note"], weights=item["eigen"]["time"])
-                for item in notation_feat_dict[nfd_key]["eigen_list"]
-            ]
-            orignal_times_list = [
-                np.sum(item["eigen"]["time"])
-                for item in notation_feat_dict[nfd_key]["eigen_list"]
-            ]
-
-            # 计算并存储该歌曲在当前调号下的频率和时间特征与乐谱特征的DTW距离
-            dtw_rs_dict[pwd_key][nfd_key] = {}
-            dtw_rs_dict[pwd_key][nfd_key]["freq_dist"] = useDtw(
-                freq_list, orignal_freq_list
-            )
-            dtw_rs_dict[pwd_key][nfd_key]["tempo_dist"] = useDtw(
-                times_list, orignal_times_list
-            )
-
-        # 找出该歌曲DTW频率距离最小的调号及相关信息
-        min_dtw_tuple = min(
-            dtw_rs_dict[pwd_key].items(), key=lambda x: x[1]["freq_dist"]
-        )
+        freq_list, times_list = asWordTimeline(pwf_dict_init[pwd_key]).getFeat()
+        pwd_key_list.append(pwd_key)
+        freq_list_list.append(freq_list)
+        times_list_list.append(times_list)
+
+    # 全部歌曲与所有调号的频率DTW距离一次批量计算，只需找出每首歌曲距离最小的调号（距离相同时取靠前的调号）；
+    # 音长与调号无关，节拍节奏距离每首歌曲只需计算一次
+    freq_dist_matrix, key_index_array = batchDtw(freq_list_list, notation_score.freq, prune=True)
+    tempo_dist_matrix, _ = batchDtw(times_list_list, [notation_score.duration])
+
+    for i, pwd_key in enumerate(pwd_key_list):
+        key_index = key_index_array[i]
+        dtw_rs_dict[pwd_key] = {
+            notation_score.key_list[key_index]: {
+                "freq_dist": freq_dist_matrix[i, key_index],
+                "tempo_dist": tempo_dist_matrix[i, 0],
+            }
+        }
+        min_dtw_tuple = next(iter(dtw_rs_dict[pwd_key].items()))
 
         # 将每首歌曲在不同调号下的最小DTW距离结果整理为字典，并添加至dtw_rs_list
         for score_field in min_dtw_tuple[1].keys():
@@ -210,16 +268,133 @@ def calDtwFreqAndTempo(notation_feat_dict: dict, batch_pwf_dict: dict):
     return dtw_rs_list
 
 
-# TODO
-def calDtwFreqAndTempo_V2():
+def calDtwFreqAndTempo_V2(notation_feat, batch_pwf_dict: dict, pitch_mode: str = "interval"):
     """
-    考虑半音之间的等比数列关系，考虑计算相邻歌词的频率比例作为一个序列来计算DTW
+    与调号无关的音准与节拍节奏DTW距离，在calDtwFreqAndTempo的输出格式上多一列"调号"，音准距离的单位为音分
+
+    考虑半音之间的等比数列关系，计算相邻歌词的频率比例（音程）或相对主音的音分作为一个序列来计算DTW，见audio_score.usePitchDtw。
+    整体升降调、移八度不改变该序列，每条录音的音准、节拍节奏各只需一次DTW，不再遍历24个调号、八度变体；
+    音长与调号无关，原先各调号下的节拍节奏距离本就相同。演唱调号由estimateKey按log频率中位数估计，作为副产品一并输出。
     局限性：只衡量了音准水平，没有衡量音高稳定性
     详见幕布笔记https://mubu.com/app/edit/home/7k-eZzNDgw0#o-72giuusrjB
+
+    参数：
+    - notation_feat (CompiledScore 或 dict): getSheetMusicFeatDict的返回值，也可以是原字典格式。
+    - batch_pwf_dict (list): getSongFeat返回结果组成的列表，特征可以是WordTimeline或原字典格式。
+    - pitch_mode (str, 默认="interval"): "interval"或"relative"，见audio_score.usePitchDtw。
+
+    返回：
+    - dtw_rs_list (list of dict): 每首歌曲的音准、节拍节奏DTW距离及估计的调号。
     """
+    dtw_rs_list = []
+    notation_score = asCompiledScore(notation_feat)
+    pitch_func = PITCH_SCORE_FUNC_DICT[pitch_mode]
 
+    pwd_key_list, freq_list_list, times_list_list = [], [], []
+    for pwf_dict_init in batch_pwf_dict:
+        pwd_key = next(iter(pwf_dict_init.keys()))
+        freq_list, times_list = asWordTimeline(pwf_dict_init[pwd_key]).getFeat()
+        pwd_key_list.append(pwd_key)
+        freq_list_list.append(freq_list)
+        times_list_list.append(times_list)
+
+    # 全部录音一次批量计算DTW；音程、相对音分与调号无关，任取一个变体作为参考序列，结果与逐条调用usePitchDtw相同
+    freq_dist_matrix, _ = batchDtw(
+        [pitch_func(freq_list) for freq_list in freq_list_list], [pitch_func(notation_score.freq[0])], is_n=False
+    )
+    tempo_dist_matrix, _ = batchDtw(times_list_list, [notation_score.duration])
+
+    for i, pwd_key in enumerate(pwd_key_list):
+        key_index, _ = estimateKey(freq_list_list[i], notation_score.freq)
+        dist_dict = {"音准": freq_dist_matrix[i, 0], "节拍节奏": tempo_dist_matrix[i, 0]}
+        for score_field, dist in dist_dict.items():
+            dtw_rs_list.append(
+                {
+                    "wav文件名": pwd_key,
+                    "调号": notation_score.key_list[key_index],
+                    "评分维度": score_field,
+                    "dtw特征值": dist,
+                }
+            )
 
-def main(input_audio_dataset="guoge", scp_name="guoge", song_name="guoge", input_mode="scp"):
+    # ↓ 临时代码，演示批量写入CSV文件
+    writeCsv(dtw_rs_list, RAW_DATA_DIR, RESULT_CSV)
+    # ↑ 临时代码，演示批量写入CSV文件
+
+    return dtw_rs_list
+
+
+def calDtwJointFreqAndTempo(notation_feat, batch_pwf_dict: dict, return_alignment: bool = False):
+    """
+    音准与节拍节奏共用一次对齐的DTW距离，输出格式与calDtwFreqAndTempo_V2相同
+
+    calDtwFreqAndTempo分别按频率、音长对齐同一串歌词，两条规整路径可能不一致。这里每条录音只做一次二维特征的DTW，
+    音准、节拍节奏距离沿同一条路径计算（见audio_score.useJointDtw），DTW计算量减半，对齐结果也可供之后的评分维度复用。
+    演唱调号同样由estimateKey估计。未发声（基频为nan）的字不参与对齐，也不出现在逐字对齐结果中；
+    有效的字太少而无法对齐的录音距离为nan，不影响其它录音。
+
+    参数：
+    - notation_feat (CompiledScore 或 dict): getSheetMusicFeatDict的返回值，也可以是原字典格式。
+    - batch_pwf_dict (list): getSongFeat返回结果组成的列表，特征可以是WordTimeline或原字典格式。
+    - return_alignment (bool, 默认=False): 是否同时返回逐字对齐结果，用于排查评分异常。
+
+    返回：
+    - dtw_rs_list (list of dict): 每首歌曲的音准、节拍节奏DTW距离及估计的调号。
+    - align_rs_list (list of dict): return_alignment为True时返回，规整路径上的每一对(录音字, 乐谱字)，
+      键为wav文件名、录音字序号、录音字、乐谱字序号、乐谱字。
+    """
+    dtw_rs_list = []
+    align_rs_list = []
+    notation_score = asCompiledScore(notation_feat)
+
+    for pwf_dict_init in batch_pwf_dict:
+        pwd_key = next(iter(pwf_dict_init.keys()))
+        word_timeline = asWordTimeline(pwf_dict_init[pwd_key])
+        freq_list, times_list = word_timeline.getFeat()
+        freq_dist, tempo_dist, path = useJointDtw(
+            freq_list, times_list, notation_score.freq[0], notation_score.duration, return_path=True
+        )
+
+        key_index, _ = estimateKey(freq_list, notation_score.freq)
+        for score_field, dist in {"音准": freq_dist, "节拍节奏": tempo_dist}.items():
+            dtw_rs_list.append(
+                {
+                    "wav文件名": pwd_key,
+                    "调号": notation_score.key_list[key_index],
+                    "评分维度": score_field,
+                    "dtw特征值": dist,
+                }
+            )
+        if return_alignment:
+            for asr_index, org_index in path.tolist():
+                align_rs_list.append(
+                    {
+                        "wav文件名": pwd_key,
+                        "录音字序号": asr_index,
+                        "录音字": str(word_timeline.words[asr_index]),
+                        "乐谱字序号": org_index,
+                        "乐谱字": str(notation_score.words[org_index]),
+                    }
+                )
+
+    # ↓ 临时代码，演示批量写入CSV文件
+    writeCsv(dtw_rs_list, RAW_DATA_DIR, RESULT_CSV)
+    # ↑ 临时代码，演示批量写入CSV文件
+
+    if return_alignment:
+        return dtw_rs_list, align_rs_list
+    return dtw_rs_list
+
+
+def main(
+    input_audio_dataset="guoge",
+    scp_name="guoge",
+    song_name="guoge",
+    input_mode="scp",
+    pitch_backend=PITCH_BACKEND,
+    analysis_mode=ANALYSIS_MODE,
+    pitch_mode=PITCH_SCORE_MODE,
+):
     """
     主函数：用于执行整个音频处理+绝对度量流程，主要包括音频采样、生成SCP文件、ASR批量识别、提取音频特征、提取乐谱特征以及计算DTW，
     目前计算的维度包括音准与节奏节拍
@@ -229,15 +404,19 @@ def main(input_audio_dataset="guoge", scp_name="guoge", song_name="guoge", input
     - input_audio_dataset (str, 默认="guoge"): 输入音频数据集的名称。
     - scp_name (str, 默认="guoge"): 生成SCP文件的名称，用于ASR识别。
     - input_mode (str, 默认="scp"): 指定输入模式，默认使用SCP文件方式。
+    - pitch_backend (str, 默认=PITCH_BACKEND): 基频估计算法，见calAudioFreq。
+    - analysis_mode (str, 默认=ANALYSIS_MODE): 分析配置名，见getSongFeat。
+    - pitch_mode (str, 默认=PITCH_SCORE_MODE): 音准评分方式，"key"时使用calDtwFreqAndTempo，"joint"时使用calDtwJointFreqAndTempo，
+      否则使用calDtwFreqAndTempo_V2。
 
     功能流程：
     1. 通过extractAllAudio函数从指定的input_audio_dataset中提取所有音频样本，并生成对应的采样字典。
     2. 根据采样字典生成用于ASR识别的SCP文件。
     3. 使用指定的音频数据集、SCP文件名以及输入模式调用batch_funasr_run函数，批量进行ASR识别，返回识别结果字典列表rs_dict_list。
-    4. 定义一个偏函数getSongFeat_new，将input_audio_dataset作为固定参数传递给getSongFeat函数。
-    5. 利用multipuleProcess函数并行处理getSongFeat_new函数，将rs_dict_list作为输入，从而批量提取音频特征，得到song_feat_list。
-    6. 调用getSheetMusicFeatDict函数，提取乐谱特征并返回notation_feat_dict。
-    7. 计算notation_feat_dict与song_feat_list之间的DTW频率与节奏距离，并打印结果。
+    4. 调用getSheetMusicFeatDict函数，提取乐谱特征并返回notation_feat，再由getNotationFreqRange得到基频搜索范围。
+    5. 定义一个偏函数getSongFeat_new，将input_audio_dataset、pitch_backend、基频搜索范围和analysis_mode作为固定参数传递给getSongFeat函数。
+    6. 利用multipuleProcess函数并行处理getSongFeat_new函数，将rs_dict_list作为输入，从而批量提取音频特征，得到song_feat_list。
+    7. 计算notation_feat与song_feat_list之间的DTW频率与节奏距离，并打印结果。
 
     返回：
     无，该函数主要通过执行一系列子任务完成整个音乐处理流程，最终计算并打印DTW相关结果。
@@ -249,10 +428,21 @@ def main(input_audio_dataset="guoge", scp_name="guoge", song_name="guoge", input
         scp_name=scp_name,
         input_mode=input_mode,
     )
-    getSongFeat_new = partial(getSongFeat, input_audio_dataset=input_audio_dataset)
+    notation_feat = getSheetMusicFeatDict(json_name=song_name)
+    getSongFeat_new = partial(
+        getSongFeat,
+        input_audio_dataset=input_audio_dataset,
+        pitch_backend=pitch_backend,
+        freq_range=getNotationFreqRange(notation_feat),
+        analysis_mode=analysis_mode,
+    )
     song_feat_list = multipuleProcess(getSongFeat_new, rs_dict_list)
-    notation_feat_dict = getSheetMusicFeatDict(json_name=song_name)
-    calDtwFreqAndTempo(notation_feat_dict, song_feat_list)
+    if pitch_mode == "key":
+        calDtwFreqAndTempo(notation_feat, song_feat_list)
+    elif pitch_mode == "joint":
+        calDtwJointFreqAndTempo(notation_feat, song_feat_list)
+    else:
+        calDtwFreqAndTempo_V2(notation_feat, song_feat_list, pitch_mode=pitch_mode)
 
 
 if __name__ == "__main__":
@@ -138,19 +138,22 @@ def audio_catog(ad_json, lyrics_dict, acceptance_threshold: float = 0.7):
 
 
 # 定义批量处理音频分类函数batch_audio_catog，该函数主要负责通过ASR结果和歌词内容进行音频分类
-def batch_audio_catog(scp_name: str):
+def batch_audio_catog(scp_name: str, punc_model: str = None):
     """
     对音频批量曲目分类，并将分类结果保存到指定CSV文件中
 
     参数:
     scp_name (str): 指定音频文件的scp文件名
+    punc_model (str): 标点模型名称，分类前gbkXfrFstLetter会去掉标点，因此默认不加载标点模型
 
     返回:
     audio_catog_list (list): 包含所有音频文件的分类结果（CSV格式数据）的列表
     """
 
-    # 调用funasrRun函数获取音频ASR识别结果列表
-    rs_dict = funasrRun(scp_name=scp_name, input_mode="scp")
+    # 调用funasrRun函数获取音频ASR识别结果存储，模型由模型管理器在进程内复用
+    rs_store = funasrRun(
+        scp_name=scp_name, input_mode="scp", punc_model=punc_model, return_store=True
+    )
 
     # 提取歌词内容，生成歌词字典
     lyrics_dict = extract_lyrics_contents(EIGEN_DIR)
@@ -158,8 +161,9 @@ def batch_audio_catog(scp_name: str):
     # 封装audio_catog函数，使其具有默认的歌词字典参数
     audio_catog_new = partial(audio_catog, lyrics_dict=lyrics_dict)
 
-    # 并行处理音频分类任务，生成分类结果列表
-    audio_catog_list = multipuleProcess(audio_catog_new, rs_dict["scp_rs"])
+    # 并行处理音频分类任务，识别结果从存储中逐条流式读出，生成分类结果列表
+    audio_catog_list = multipuleProcess(audio_catog_new, rs_store)
+    rs_store.close()
 
     # 过滤掉结果列表中的空值
     audio_catog_list = [d for d in audio_catog_list if d]
@@ -169,24 +173,29 @@ def batch_audio_catog(scp_name: str):
 
 
 # 定义音频剪辑函数audio_seg，该函数基于歌词内容和广告信息对指定音频片段进行剪辑，并允许设置时间偏移量
-def audio_seg(csv_dict, lyrics_dict, ad_dict, time_offset=150, scp_name=None):
+def audio_seg(csv_dict, lyrics_dict, ad_dict, time_offset=150, scp_name=None, export=True, virtual=False):
     """
     音频剪辑函数，对音频文件进行剪辑，保留演唱部分，并保存至指定目录
 
     参数:
     csv_dict (dict): 包含音频文件基本信息的字典
     lyrics_dict (dict): 存储了歌曲名与歌词内容映射关系的字典
-    ad_dict (dict): 存储了识别结果信息的字典，其中键是音频文件名，值包含识别文本等信息
+    ad_dict (AsrResultStore 或 dict): 识别结果，可按音频文件名取得包含识别文本和时间戳的记录
     time_offset (int): 默认为150毫秒的时间偏移量，用于提前或延后剪辑起点
     scp_name (str): 可选参数，指明scp文件名，用于定位上传的原始音频文件路径
+    export (bool): 为True时立即剪辑；为False时只返回exportSegments的参数，由batch_audio_seg统一交给进程池
+    virtual (bool): 虚拟剪辑时不检查resultAudio中是否已有剪辑后的文件
+
+    返回:
+    export为False时返回剪辑任务（exportSegments的关键字参数），已剪辑过的音频返回None
     """
 
     # 获取csv字典中音频文件的完整文件名
     file = csv_dict["文件名"]
     file_name = file + ".mp3"
 
-    # 检查音频文件是否已剪辑并保存，如果不存在则执行剪辑操作
-    if not os.path.exists(AUDIO_DIR / file_name):
+    # 检查音频文件是否已剪辑并保存，如果不存在则执行剪辑操作；虚拟剪辑不写出文件，总是重新生成区间
+    if virtual or not os.path.exists(AUDIO_DIR / file_name):
         # 获取曲目名并在歌词字典中查找对应的歌词文本
         song = csv_dict["曲目"]
         song_text = lyrics_dict[song]
@@ -205,25 +214,40 @@ def audio_seg(csv_dict, lyrics_dict, ad_dict, time_offset=150, scp_name=None):
         # 计算实际剪辑开始时间（减去时间偏移量，开头留白）
         start_time = ad_info["timestamp"][min_index][0] - time_offset
 
-        # 执行音频剪辑操作
-        cutAudio(
-            start_time=start_time,
-            output_dir=AUDIO_DIR,
-            input_audio=UPLOAD_FILE_DIR / scp_name / file_name,  # 组合原始音频文件的完整路径
-        )
+        # 时间戳单位为毫秒，剪辑到文件末尾，流复制不重新编码
+        job = {
+            "input_audio": UPLOAD_FILE_DIR / scp_name / file_name,  # 组合原始音频文件的完整路径
+            "segment_list": [(start_time / 1000, None)],
+            "output_dir": AUDIO_DIR,
+            "output_name_list": [file_name],
+            "audio_format": "copy",
+        }
+        if not export:
+            return job
+        exportSegments(**job)
 
 
 # 定义批量音频剪辑函数batch_audio_seg，该函数基于歌曲CSV文件、歌词文件夹和ASR识别结果批量剪辑音频片段
 def batch_audio_seg(
-    song_csv_dir=RAW_DATA_DIR / SONGNAME_CSV, lyrics_dir=EIGEN_DIR, scp_name=None
+    song_csv_dir=RAW_DATA_DIR / SONGNAME_CSV,
+    lyrics_dir=EIGEN_DIR,
+    scp_name=None,
+    virtual=SEGMENT_VIRTUAL,
+    punc_model: str = None,
 ):
     """
     批量剪辑音频的开头非演唱部分，并将剪辑后的音频保存于指定目录。
 
+    virtual为True时不写出剪辑后的音频，只把保留区间记入虚拟剪辑清单（见prep_audio.saveSegmentManifest），
+    之后的识别与特征提取读取原始音频时按清单截取，不占用额外磁盘、不需要重新编码。
+
     参数:
     song_csv_dir (Path): 指定歌曲CSV文件的路径，默认位于RAW_DATA_DIR下的SONGNAME_CSV文件
     lyrics_dir (Path): 指定歌词文件夹的路径，默认为EIGEN_DIR
     scp_name (Optional[str]): 可选参数，指明scp文件名，用于定位上传的原始音频文件路径，默认为None
+    virtual (bool): 是否使用虚拟剪辑，默认值见setting.SEGMENT_VIRTUAL
+    punc_model (str): 标点模型名称，匹配歌词前gbkXfrFstLetter会去掉标点，因此默认不加载标点模型，
+        与batch_audio_catog、run_v2.batch_funasr_run共用同一组预热模型与同一份识别结果
     """
 
     # 读取CSV文件并转换为字典列表
@@ -233,28 +257,34 @@ def batch_audio_seg(
     # 提取并处理歌词内容，生成歌词字典
     lyrics_dict = extract_lyrics_contents(lyrics_dir, style=2)
 
-    # 调用funasrRun函数获取音频文件的ASR识别结果并整理成字典格式
-    rs_dict = funasrRun(scp_name=scp_name, input_mode="scp")
-    audio_json_list = rs_dict["scp_rs"]
-    dict_indexed = {
-        d["key"]: {"text": d["text"], "timestamp": d["timestamp"]}
-        for d in audio_json_list
-    }
+    # 调用funasrRun函数获取音频文件的ASR识别结果存储，audio_seg通过偏移量索引按文件名读取单条结果
+    # 剪辑区间要以完整音频的时间戳确定，不按已有的虚拟剪辑清单截取
+    rs_store = funasrRun(
+        scp_name=scp_name, input_mode="scp", punc_model=punc_model, return_store=True, virtual_segment=False
+    )
 
-    # 封装audio_seg函数，实例化固定参数
+    # 封装audio_seg函数，实例化固定参数，只生成剪辑任务
     audio_seg_new = partial(
-        audio_seg, scp_name=scp_name, ad_dict=dict_indexed, lyrics_dict=lyrics_dict
+        audio_seg, scp_name=scp_name, ad_dict=rs_store, lyrics_dict=lyrics_dict, export=False, virtual=virtual
     )
 
-    # 使用多线程并行调用封装后的audio_seg_new函数，处理每一个CSV字典项
-    multipuleThread(audio_seg_new, csv_dict)
+    # 使用多线程并行匹配歌词、生成剪辑任务（只读识别结果，不涉及解码）
+    job_list = [job for job in multipuleThread(audio_seg_new, csv_dict) if job is not None]
+    rs_store.close()
+
+    if virtual:
+        # 只记录保留区间的采样点，不写出音频
+        saveSegmentManifest([makeSegmentRecord(job["input_audio"], *job["segment_list"][0]) for job in job_list])
+    else:
+        # 解码与编码交给进程池，不再被GIL串行化
+        batchExportSegments(job_list)
 
 
 def audio_pre_cat_seg(scp_name, mode):
     if mode == "catog":
         batch_audio_catog(scp_name)
     elif mode == "seg":
-        batch_audio_seg(scp_name)
+        batch_audio_seg(scp_name=scp_name)
 
 
 if __name__ == "__main__":
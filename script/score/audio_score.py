@@ -6,19 +6,19 @@
 主要功能包括：
 1. 对一维数据进行z-score标准化处理。
 2. 计算两个语音特征列表的动态时间规整(DTW)距离。
-3. 计算两个文本字符串的余弦相似度。
-4. 使用K-means算法对音乐评分数据进行分类。
+3. 与调号无关的音准DTW：把逐字基频转换为相邻字的音程或相对中位数主音的音分，每条录音只需一次DTW，并顺带估计演唱调号。
+4. 音准与节拍节奏的联合DTW：逐字的(频率, 音长)向量只对齐一次，两个维度的距离沿同一条规整路径计算。
+5. 计算两个文本字符串的余弦相似度。
+6. 使用K-means算法对音乐评分数据进行分类。
 
 """
 
 from setting import *
+from util import lazyImport
+from score.dtw_kernel import DTW_METRIC_DICT, calDtwDistance, searchDtw, calDtwMatrix, calDtwPath, getPathWeight
 import numpy as np
-from dtw import *
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
+
+dtw = lazyImport("dtw")
 
 
 def z_score_normalization(data: list):
@@ -40,7 +40,15 @@ def z_score_normalization(data: list):
     return normalized_data
 
 
-def useDtw(asr_list: list, org_list: list, dist_method: str = "euclidean", is_n: bool = True):
+def useDtw(
+    asr_list: list,
+    org_list: list,
+    dist_method: str = "euclidean",
+    is_n: bool = True,
+    window_type: str = None,
+    window_size: int = None,
+    engine: str = DTW_ENGINE,
+):
     """
     计算两个语音特征列表（ASR识别结果列表与原始语音特征列表）的动态时间规整(DTW)距离，
     并根据用户需求对输入数据进行z-score标准化处理，最后返回归一化的DTW距离。
@@ -50,6 +58,10 @@ def useDtw(asr_list: list, org_list: list, dist_method: str = "euclidean", is_n:
         org_list (list): 原始语音信号的特征列表
         dist_method (str, 默认="euclidean"): DTW计算中使用的距离度量方法，默认为欧式距离
         is_n (bool, 默认=True): 是否对输入数据进行z-score标准化处理
+        window_type (str, 可选): 窗口，None、"sakoechiba"或"itakura"，见dtw_kernel.getWindowBounds
+        window_size (int, 可选): Sakoe-Chiba带的宽度
+        engine (str, 默认=DTW_ENGINE): "native"为项目内的DTW内核（见dtw_kernel），"dtw-python"为原实现，
+            两者结果逐位一致；dist_method不在dtw_kernel.DTW_METRIC_DICT中时使用dtw-python
 
     返回:
         dtw_n (float): 归一化后的DTW距离
@@ -61,8 +73,14 @@ def useDtw(asr_list: list, org_list: list, dist_method: str = "euclidean", is_n:
         asr_list = z_score_normalization(asr_list)  # 对ASR列表进行标准化
         org_list = z_score_normalization(org_list)  # 对原始列表进行标准化
 
+    if engine == "native" and dist_method in DTW_METRIC_DICT:
+        return calDtwDistance(asr_list, org_list, dist_method, window_type, window_size)
+
     # 使用指定的距离度量方法计算两个列表间的DTW距离
-    dtw_rs = dtw(asr_list, org_list, dist_method=dist_method)
+    window_args = {} if window_size is None else {"window_size": window_size}
+    dtw_rs = dtw.dtw(
+        asr_list, org_list, dist_method=dist_method, window_type=window_type, window_args=window_args, distance_only=True
+    )
 
     # 提取并返回DTW距离的归一化值
     dtw_n = dtw_rs.normalizedDistance
@@ -70,6 +88,222 @@ def useDtw(asr_list: list, org_list: list, dist_method: str = "euclidean", is_n:
     return dtw_n
 
 
+def searchNearestDtw(
+    asr_list: list,
+    org_list_list: list,
+    dist_method: str = "euclidean",
+    is_n: bool = True,
+    window_type: str = None,
+    window_size: int = None,
+):
+    """
+    在多条候选参考序列（如各调号、八度变体）中找与asr_list的DTW距离最小的一条，
+    用LB_Kim、LB_Keogh下界与提前放弃跳过不可能更近的候选，结果与逐条调用useDtw后取最小值相同。
+
+    参数:
+        asr_list (list): 查询序列
+        org_list_list (list): 候选参考序列
+        dist_method、is_n、window_type、window_size: 见useDtw
+
+    返回:
+        (best_index, best_dist) (tuple): 最近候选的下标与归一化DTW距离
+    """
+    if is_n:
+        asr_list = z_score_normalization(asr_list)
+        org_list_list = [z_score_normalization(org_list) for org_list in org_list_list]
+    best_index, dist_list = searchDtw(asr_list, org_list_list, dist_method, window_type, window_size)
+
+    return best_index, dist_list[best_index]
+
+
+def batchDtw(
+    asr_list_list: list,
+    org_list_list: list,
+    dist_method: str = "euclidean",
+    is_n: bool = True,
+    window_type: str = None,
+    window_size: int = None,
+    prune: bool = False,
+    max_workers: int = None,
+) -> tuple:
+    """
+    一次计算多条查询序列（如同一首歌的全部录音）与多条参考序列（如乐谱的全部调号、八度变体）两两之间的DTW距离，
+    并给出每条查询序列最近的参考序列。全部距离在一次内核调用中计算，见dtw_kernel.calDtwMatrix，结果与逐对调用useDtw相同。
+
+    参数:
+        asr_list_list (list): 查询序列，长度可以各不相同
+        org_list_list (list): 参考序列
+        dist_method、is_n、window_type、window_size: 见useDtw，dist_method须在dtw_kernel.DTW_METRIC_DICT中
+        prune (bool, 默认=False): 只需要每条查询序列的最近参考时设为True，其余位置可能被剪枝为inf
+        max_workers (int, 可选): 线程数，见dtw_kernel.calDtwMatrix
+
+    返回:
+        (dist_matrix, best_index_array) (tuple): (查询数, 参考数)的归一化DTW距离（没有可行路径时为nan），
+            以及每条查询序列距离最小的参考序列下标（距离相同时取下标最小的）
+    """
+    if is_n:
+        asr_list_list = [z_score_normalization(asr_list) for asr_list in asr_list_list]
+        org_list_list = [z_score_normalization(org_list) for org_list in org_list_list]
+    dist_matrix = calDtwMatrix(
+        asr_list_list, org_list_list, dist_method, window_type, window_size, prune=prune, max_workers=max_workers
+    )
+    best_index_array = np.argmin(np.where(np.isnan(dist_matrix), np.inf, dist_matrix), axis=1)
+
+    return dist_matrix, best_index_array
+
+
+def calCents(freq_list) -> np.ndarray:
+    """
+    将频率（Hz）转换为以1Hz为参考的音分，并去掉非正数与nan（未识别的字、查不到的音符）。
+
+    参数:
+        freq_list (list): 逐字频率
+
+    返回:
+        cents (np.ndarray): 有效字的音分
+    """
+    freq_array = np.asarray(freq_list, dtype=np.float64)
+    freq_array = freq_array[np.isfinite(freq_array) & (freq_array > 0)]
+
+    return 1200 * np.log2(freq_array)
+
+
+def calPitchInterval(freq_list) -> np.ndarray:
+    """
+    计算相邻两个字的音程（音分），即log频率的一阶差分。整体升降调或移八度时频率乘以同一常数，音程不变。
+
+    参数:
+        freq_list (list): 逐字频率
+
+    返回:
+        interval (np.ndarray): 长度为有效字数-1的音程序列
+    """
+    return np.diff(calCents(freq_list))
+
+
+def calRelativeCents(freq_list) -> np.ndarray:
+    """
+    计算每个字相对主音的音分，主音取全部字log频率的中位数。整体升降调时主音随之移动，相对音分不变。
+
+    参数:
+        freq_list (list): 逐字频率
+
+    返回:
+        relative_cents (np.ndarray): 有效字相对主音的音分
+    """
+    cents = calCents(freq_list)
+
+    return cents - np.median(cents) if len(cents) else cents
+
+
+# 与调号无关的音准序列，键为PITCH_SCORE_MODE中"interval"、"relative"两种方式
+PITCH_SCORE_FUNC_DICT = {
+    "interval": calPitchInterval,
+    "relative": calRelativeCents,
+}
+
+
+def usePitchDtw(asr_freq_list, org_freq_list, mode: str = "interval", dist_method: str = "euclidean"):
+    """
+    与调号无关的音准DTW距离：两条逐字频率序列先转换为音程或相对音分，再计算一次DTW。
+
+    z-score标准化后的频率序列同样与调号无关，原先却要对24个调号、八度变体各计算一次DTW再取最小值；
+    这里的序列单位为音分，距离可以直接理解为平均每个字偏离的音分数。
+
+    参数:
+        asr_freq_list (list): 录音的逐字基频
+        org_freq_list (list): 乐谱的逐字频率，可以是任一调号、八度变体
+        mode (str, 默认="interval"): "interval"为相邻字音程，"relative"为相对中位数主音的音分
+        dist_method (str, 默认="euclidean"): DTW计算中使用的距离度量方法
+
+    返回:
+        dtw_n (float): 归一化后的DTW距离
+    """
+    pitch_func = PITCH_SCORE_FUNC_DICT[mode]
+
+    return useDtw(pitch_func(asr_freq_list), pitch_func(org_freq_list), dist_method=dist_method, is_n=False)
+
+
+def estimateKey(asr_freq_list, key_freq_array) -> tuple:
+    """
+    估计演唱所用的调号与八度：比较录音与各调号、八度变体的log频率中位数，取最接近的一个。
+
+    参数:
+        asr_freq_list (list): 录音的逐字基频
+        key_freq_array (np.ndarray): (变体数, 字数)的乐谱逐字频率，如CompiledScore.freq
+
+    返回:
+        (key_index, offset_cents) (tuple): 最接近的变体下标，以及录音整体相对该变体偏高的音分（负数为偏低）
+    """
+    asr_tonic = np.median(calCents(asr_freq_list))
+    key_tonic_array = np.array([np.median(calCents(freq_list)) for freq_list in key_freq_array])
+    offset_array = asr_tonic - key_tonic_array
+    key_index = int(np.argmin(np.abs(offset_array)))
+
+    return key_index, float(offset_array[key_index])
+
+
+def useJointDtw(
+    asr_freq_list,
+    asr_times_list,
+    org_freq_list,
+    org_times_list,
+    window_type: str = None,
+    window_size: int = None,
+    return_path: bool = False,
+) -> tuple:
+    """
+    音准与节拍节奏共用一条规整路径的联合DTW。
+
+    原先频率与音长各做一次DTW，两条规整路径可能互相矛盾（同一个字在音准上对齐到乐谱的一个字，在节奏上却对齐到另一个字）。
+    这里把每个字的(z-score后的频率, z-score后的音长)作为二维特征，只做一次欧式距离的DTW，
+    再沿得到的路径按步进权重分别累加两个维度的局部距离，除以n+m，得到音准与节拍节奏距离。
+    z-score后的频率与调号、八度无关，参考序列可以是任一变体。
+    基频或音长无效（如未发声的字基频为nan）的字先去掉再对齐，返回的路径仍使用原序列中的下标。
+
+    参数:
+        asr_freq_list、asr_times_list (list): 录音的逐字基频与音长
+        org_freq_list、org_times_list (list): 乐谱的逐字频率与音长
+        window_type、window_size: 窗口，见useDtw
+        return_path (bool, 默认=False): 是否同时返回规整路径
+
+    返回:
+        (freq_dist, tempo_dist) (tuple): 沿同一路径的音准、节拍节奏归一化距离，有效的字不足以标准化或窗口内没有可行路径时为nan；
+            return_path为True时再加上(路径长度, 2)的规整路径，每行为对齐的(录音字下标, 乐谱字下标)，无法对齐时为空
+    """
+    feat_list = []
+    index_list = []
+    for freq_list, times_list in [(asr_freq_list, asr_times_list), (org_freq_list, org_times_list)]:
+        freq_array = np.asarray(freq_list, dtype=np.float64)
+        times_array = np.asarray(times_list, dtype=np.float64)
+        valid_index = np.flatnonzero((freq_array > 0) & np.isfinite(freq_array) & np.isfinite(times_array))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            feat_list.append(
+                np.column_stack(
+                    [z_score_normalization(freq_array[valid_index]), z_score_normalization(times_array[valid_index])]
+                )
+            )
+        index_list.append(valid_index)
+    asr_feat, org_feat = feat_list
+
+    try:
+        if not (len(asr_feat) and len(org_feat) and np.isfinite(asr_feat).all() and np.isfinite(org_feat).all()):
+            raise ValueError("Not enough valid words to normalize")
+        _, path = calDtwPath(asr_feat, org_feat, "euclidean", window_type, window_size)
+    except ValueError:
+        freq_dist = tempo_dist = np.nan
+        path = np.empty((0, 2), dtype=np.int64)
+    else:
+        # 一维时欧式距离即差的绝对值，每个维度的结果等于该维度单独沿这条路径的DTW累计代价
+        diff = np.abs(asr_feat[path[:, 0]] - org_feat[path[:, 1]])
+        freq_dist, tempo_dist = getPathWeight(path) @ diff / (len(asr_feat) + len(org_feat))
+        path = np.column_stack([index_list[0][path[:, 0]], index_list[1][path[:, 1]]])
+    if return_path:
+        return freq_dist, tempo_dist, path
+
+    return freq_dist, tempo_dist
+
+
 def calculate_cosine_similarity(text1: str, text2: str, vectorizer_type: int = 0) -> float:
     """
     计算两个文本字符串的余弦相似度。
@@ -85,6 +319,9 @@ def calculate_cosine_similarity(text1: str, text2: str, vectorizer_type: int = 0
 
     """
 
+    from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+
     # 创建一个包含待处理文本的列表
     corpus = [text1, text2]
 
@@ -120,6 +357,9 @@ def kmeanCatogery(score_dir_list, cat_num):
     返回：
     - result_dict: 字典类型，键为歌曲名，值为对应歌曲经过K-means聚类后得到的类别标签。
     """
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import silhouette_score
+
     # 初始化一个空的结果字典，用于存放歌曲名称及其所属类别
     result_dict = {}
 
@@ -0,0 +1,554 @@
+# -*- coding: utf-8 -*-
+
+"""项目内的DTW距离内核，供audio_score.useDtw、batchDtw使用。
+
+原先每次useDtw都调用dtw-python：先用cdist生成完整的n×m局部距离矩阵，再计算完整的累计代价矩阵并包装为结果对象，
+而评分只用到normalizedDistance。本模块只计算距离：
+    1. 累计代价按行递推，只保留两行，内存为O(min(n, m))；
+    2. 支持Sakoe-Chiba带（sakoechiba）与Itakura平行四边形（itakura）窗口，窗口外的格子不计算；
+    3. 给定当前最优距离时提前放弃（early abandoning）：某一行的最小累计代价已超过它，最终距离只会更大；
+    4. searchDtw在多条候选参考序列中找最近的一条，先用LB_Kim、LB_Keogh下界跳过不可能更近的候选；
+    5. calDtwMatrix把一批长度不一的查询序列与参考序列分别拼接为连续数组，在编译后的内核中计算全部距离，
+       按查询序列分给多个线程（内核不持有GIL）并行；
+    6. calDtwPath保留完整的累计代价矩阵并回溯最优规整路径，供多个特征共用同一对齐结果。
+内核在首次调用时由numba编译（librosa的依赖，缓存到__pycache__），未安装numba时以纯Python执行，结果相同。
+
+步进模式、窗口定义与dtw-python的默认设置（symmetric2，N+M归一化）一致，递推中的每一步浮点运算也相同，
+与dtw.dtw(x, y, dist_method=..., window_type=...).normalizedDistance逐位一致。
+
+经典的使用案例：
+    dist = calDtwDistance(x, y)  # 与dtw.dtw(x, y).normalizedDistance相同
+    dist = calDtwDistance(x, y, window_type="sakoechiba", window_size=10)
+    best_index, dist_list = searchDtw(x, [y_1, y_2, y_3])
+    dist_matrix = calDtwMatrix([x_1, x_2, ...], [y_1, y_2, ...])  # (查询数, 参考数)
+    dist, path = calDtwPath(x, y)  # 同时返回最优规整路径，每行为对齐的(x下标, y下标)
+"""
+
+from setting import *
+from util import lazyImport
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import psutil
+
+numba = lazyImport("numba")
+
+# 支持的局部距离，编号传给内核：0为各维差的平方和开方，1为各维差的绝对值之和，2为各维差的平方和；一维时0、1相同
+DTW_METRIC_DICT = {"euclidean": 0, "cityblock": 1, "sqeuclidean": 2}
+# 支持的窗口，名称与dtw-python的window_type相同，编号传给内核（0为不加窗口）
+DTW_WINDOW_DICT = {None: 0, "sakoechiba": 1, "itakura": 2}
+
+# 尚未交给numba的内核
+_jit_func_list = []
+
+
+def _compileKernels():
+    """把登记的内核按定义顺序交给numba（实际编译在首次以具体类型调用时进行），并替换模块中的同名全局变量，
+    使内核之间可以互相调用。未安装numba时替换为原Python函数。"""
+    if not _jit_func_list:
+        return
+    try:
+        jit = numba.njit(cache=True, nogil=True)
+    except ImportError:
+        jit = None
+    for func in _jit_func_list:
+        func.__globals__[func.__name__] = func if jit is None else jit(func)
+    _jit_func_list.clear()
+
+
+def _lazyJit(func):
+    """登记需要numba编译的内核，首次调用任一内核时统一编译，见_compileKernels。"""
+    _jit_func_list.append(func)
+
+    @wraps(func)
+    def wrapper(*args):
+        _compileKernels()
+        return func.__globals__[func.__name__](*args)
+
+    return wrapper
+
+
+@_lazyJit
+def _localDist(a, b, metric):
+    """两个特征向量的局部距离，各维按顺序累加，与cdist的结果相同。"""
+    d = 0.0
+    for c in range(a.shape[0]):
+        diff = a[c] - b[c]
+        if metric == 1:
+            d += abs(diff)
+        else:
+            d += diff * diff
+
+    return np.sqrt(d) if metric == 0 else d
+
+
+@_lazyJit
+def _windowBounds(n, m, window_code, window_size):
+    """n×m代价矩阵每一行窗口内的列区间[lo[i], hi[i]]，lo[i] > hi[i]时该行为空，见getWindowBounds。"""
+    lo = np.empty(n, dtype=np.int64)
+    hi = np.empty(n, dtype=np.int64)
+    for i in range(n):
+        if window_code == 1:
+            start, end = i - window_size, i + window_size
+        elif window_code == 2:
+            # j <= 2i，i <= 2j + 1，i >= n - 2m + 2j，j > m - 2n + 2i
+            start = max(-((1 - i) // 2), m - 2 * n + 2 * i + 1)
+            end = min(2 * i, (i - n + 2 * m) // 2)
+        else:
+            start, end = 0, m - 1
+        lo[i] = max(start, 0)
+        hi[i] = min(end, m - 1)
+
+    return lo, hi
+
+
+@_lazyJit
+def _transposeBounds(lo, hi, m):
+    """由单调不减的行区间得到转置后（每一列）的行区间。"""
+    j = np.arange(m)
+
+    return np.searchsorted(hi, j, side="left"), np.searchsorted(lo, j, side="right") - 1
+
+
+@_lazyJit
+def _dtwCost(x, y, lo, hi, metric, threshold):
+    """
+    按行递推symmetric2步进模式的累计代价，返回终点的累计代价（未归一化）。
+
+    与dtw-python的computeCM相同：起点的累计代价为其局部距离；其余格子取三个前驱中严格小于inf的最小值，
+    对角前驱加2倍局部距离，横、竖前驱加1倍局部距离；没有可用前驱或在窗口外的格子为nan。
+
+    参数：
+        x、y: (n, k)、(m, k)的float64数组，y为列方向。
+        lo、hi: 长度为n的int64数组，第i行窗口内的列为[lo[i], hi[i]]。
+        metric(int): DTW_METRIC_DICT中的编号。
+        threshold(float): 某一行的最小累计代价除以n+m后大于该值时提前放弃，返回inf。
+    """
+    n, m, k = x.shape[0], y.shape[0], x.shape[1]
+    norm = n + m
+    prev = np.full(m, np.nan)
+    cur = np.full(m, np.nan)
+    old_lo, old_hi = 0, -1  # cur中残留的上上一行的区间
+
+    for i in range(n):
+        for j in range(old_lo, old_hi + 1):
+            cur[j] = np.nan
+        row_min = np.inf
+        for j in range(lo[i], hi[i] + 1):
+            # 与_localDist相同，内联以免逐格创建数组视图
+            d = 0.0
+            for c in range(k):
+                diff = x[i, c] - y[j, c]
+                if metric == 1:
+                    d += abs(diff)
+                else:
+                    d += diff * diff
+            if metric == 0:
+                d = np.sqrt(d)
+            if i == 0 and j == 0:
+                cost = d
+            else:
+                best = np.inf
+                if i > 0 and j > 0:
+                    candidate = prev[j - 1] + 2.0 * d
+                    if candidate < best:
+                        best = candidate
+                if j > 0:
+                    candidate = cur[j - 1] + d
+                    if candidate < best:
+                        best = candidate
+                if i > 0:
+                    candidate = prev[j] + d
+                    if candidate < best:
+                        best = candidate
+                cost = best if best < np.inf else np.nan
+            cur[j] = cost
+            if cost < row_min:
+                row_min = cost
+
+        if not row_min < np.inf:
+            return np.nan
+        if row_min / norm > threshold:
+            return np.inf
+        old_lo, old_hi = (lo[i - 1], hi[i - 1]) if i > 0 else (0, -1)
+        prev, cur = cur, prev
+
+    return prev[m - 1]
+
+
+@_lazyJit
+def _calDtwPair(x, y, metric, window_code, window_size, threshold):
+    """归一化DTW距离，提前放弃时为inf，窗口内没有可行路径时为nan。"""
+    n, m = x.shape[0], y.shape[0]
+    lo, hi = _windowBounds(n, m, window_code, window_size)
+    if m > n:
+        # 步进模式对称，转置后逐格的运算相同，按较短的序列分配行缓冲
+        col_lo, col_hi = _transposeBounds(lo, hi, m)
+        cost = _dtwCost(y, x, col_lo, col_hi, metric, threshold)
+    else:
+        cost = _dtwCost(x, y, lo, hi, metric, threshold)
+
+    return cost / (n + m)
+
+
+@_lazyJit
+def _dtwCostMatrix(x, y, lo, hi, metric):
+    """
+    完整的累计代价矩阵与每个格子所取的前驱，供回溯规整路径，逐格的运算与_dtwCost相同。
+
+    返回：
+        (cm, step): (n, m)的累计代价，窗口外或不可达的格子为nan；(n, m)的int8前驱编号，
+            0为对角(i-1, j-1)，1为左(i, j-1)，2为上(i-1, j)，-1为起点或不可达。
+    """
+    n, m, k = x.shape[0], y.shape[0], x.shape[1]
+    cm = np.full((n, m), np.nan)
+    step = np.full((n, m), -1, dtype=np.int8)
+
+    for i in range(n):
+        for j in range(lo[i], hi[i] + 1):
+            d = 0.0
+            for c in range(k):
+                diff = x[i, c] - y[j, c]
+                if metric == 1:
+                    d += abs(diff)
+                else:
+                    d += diff * diff
+            if metric == 0:
+                d = np.sqrt(d)
+            if i == 0 and j == 0:
+                cm[i, j] = d
+                continue
+            best, best_step = np.inf, -1
+            if i > 0 and j > 0:
+                candidate = cm[i - 1, j - 1] + 2.0 * d
+                if candidate < best:
+                    best, best_step = candidate, 0
+            if j > 0:
+                candidate = cm[i, j - 1] + d
+                if candidate < best:
+                    best, best_step = candidate, 1
+            if i > 0:
+                candidate = cm[i - 1, j] + d
+                if candidate < best:
+                    best, best_step = candidate, 2
+            if best < np.inf:
+                cm[i, j] = best
+                step[i, j] = best_step
+
+    return cm, step
+
+
+@_lazyJit
+def _backtrackPath(step):
+    """由前驱编号从终点回溯到起点，返回(路径长度, 2)的int64下标，按从起点到终点的顺序。"""
+    n, m = step.shape
+    path = np.empty((n + m - 1, 2), dtype=np.int64)
+    i, j, length = n - 1, m - 1, 0
+    while True:
+        path[length, 0], path[length, 1] = i, j
+        length += 1
+        s = step[i, j]
+        if s == 0:
+            i, j = i - 1, j - 1
+        elif s == 1:
+            j -= 1
+        elif s == 2:
+            i -= 1
+        else:
+            break
+
+    return path[:length][::-1].copy()
+
+
+@_lazyJit
+def _lbKimPair(x, y, metric):
+    """LB_Kim下界（未归一化），见lbKim。"""
+    lb = _localDist(x[0], y[0], metric)
+    if x.shape[0] + y.shape[0] > 2:
+        lb += _localDist(x[x.shape[0] - 1], y[y.shape[0] - 1], metric)
+
+    return lb
+
+
+@_lazyJit
+def _envelopeDist(x, y, lo, hi, metric):
+    """x每个点到y在其窗口[lo[i], hi[i]]内的上下包络的距离之和，多维特征按各维分别取包络。"""
+    total = 0.0
+    for i in range(x.shape[0]):
+        d = 0.0
+        for c in range(x.shape[1]):
+            upper, lower = -np.inf, np.inf
+            for j in range(lo[i], hi[i] + 1):
+                upper = max(upper, y[j, c])
+                lower = min(lower, y[j, c])
+            diff = max(x[i, c] - upper, lower - x[i, c], 0.0)
+            d += diff if metric == 1 else diff * diff
+        total += np.sqrt(d) if metric == 0 else d
+
+    return total
+
+
+@_lazyJit
+def _dtwMatrixKernel(x_pack, x_offset, y_pack, y_offset, query_array, metric, window_code, window_size, prune, out):
+    """
+    计算query_array中每条查询序列与全部参考序列的归一化DTW距离，写入out的对应行。
+
+    prune为True时只保证每行最小值及其下标正确：LB_Kim已大于当前最小值的参考直接跳过，其余以当前最小值为阈值提前放弃，
+    跳过或放弃的位置为inf。窗口内没有可行路径的位置为nan。
+    """
+    for q in query_array:
+        x = x_pack[x_offset[q]: x_offset[q + 1]]
+        best = np.inf
+        for r in range(y_offset.shape[0] - 1):
+            y = y_pack[y_offset[r]: y_offset[r + 1]]
+            if prune and _lbKimPair(x, y, metric) / (x.shape[0] + y.shape[0]) > best:
+                continue
+            dist = _calDtwPair(x, y, metric, window_code, window_size, best if prune else np.inf)
+            out[q, r] = dist
+            if dist < best:
+                best = dist
+
+
+def _asSeries(x) -> np.ndarray:
+    """一维序列转换为(n, 1)，多维特征序列保持(n, k)。"""
+    x = np.asarray(x, dtype=np.float64)
+
+    return np.ascontiguousarray(x.reshape(len(x), -1))
+
+
+def _packSeries(x_list: list) -> tuple:
+    """把长度不一的序列拼接为(总长度, k)的连续数组，返回(数组, 长度为序列数+1的起始下标)。"""
+    x_list = [_asSeries(x) for x in x_list]
+    offset = np.cumsum([0] + [len(x) for x in x_list]).astype(np.int64)
+
+    return np.ascontiguousarray(np.vstack(x_list)), offset
+
+
+def _getWindowCode(window_type: str, window_size: int) -> tuple:
+    """窗口名称转换为内核使用的(编号, 宽度)。"""
+    if window_type not in DTW_WINDOW_DICT:
+        raise ValueError(f"Unsupported window_type: {window_type}, choose from {list(DTW_WINDOW_DICT)}")
+    if window_type == "sakoechiba" and window_size is None:
+        raise ValueError("sakoechiba window requires window_size")
+
+    return DTW_WINDOW_DICT[window_type], int(window_size or 0)
+
+
+def getWindowBounds(n: int, m: int, window_type: str = None, window_size: int = None) -> tuple:
+    """
+    返回n×m代价矩阵每一行窗口内的列区间，与dtw-python同名窗口函数允许的格子相同。
+
+    参数：
+        n、m(int): 查询序列（行）、参考序列（列）的长度。
+        window_type(str, 可选): None（不加窗口）、"sakoechiba"或"itakura"。
+        window_size(int, 可选): Sakoe-Chiba带的宽度，即允许的|i-j|最大值。
+
+    返回：
+        (lo, hi): 长度为n的int64数组，第i行允许的列为[lo[i], hi[i]]，lo[i] > hi[i]时该行为空。两者都单调不减。
+    """
+    return _windowBounds(n, m, *_getWindowCode(window_type, window_size))
+
+
+def lbKim(x, y, dist_method: str = "euclidean") -> float:
+    """
+    LB_Kim下界（首尾）：任何规整路径都经过起点与终点，且两点的权重至少为1，DTW累计代价不小于两点局部距离之和。
+
+    返回：
+        未归一化的下界，除以n+m后可与归一化距离比较。
+    """
+    return float(_lbKimPair(_asSeries(x), _asSeries(y), DTW_METRIC_DICT[dist_method]))
+
+
+def _calLbKeogh(x: np.ndarray, y: np.ndarray, lo: np.ndarray, hi: np.ndarray, metric: int) -> float:
+    """由已计算的窗口区间求LB_Keogh，见lbKeogh。"""
+    col_lo, col_hi = _transposeBounds(lo, hi, len(y))
+    if np.any(lo > hi) or np.any(col_lo > col_hi):
+        return 0.0
+    lb = max(_envelopeDist(x, y, lo, hi, metric), _envelopeDist(y, x, col_lo, col_hi, metric))
+
+    # 路径上实际的累加顺序与此不同，按浮点求和误差上界留出余量，保证仍是下界
+    return lb * (1 - 4 * (len(x) + len(y)) * np.finfo(np.float64).eps)
+
+
+def lbKeogh(x, y, dist_method: str = "euclidean", window_type: str = None, window_size: int = None) -> float:
+    """
+    LB_Keogh下界：规整路径在每一行、每一列都至少经过一个窗口内的格子，权重至少为1，
+    因此DTW累计代价不小于每个点到另一序列在窗口内的上下包络的距离之和；行、列两个方向取较大者。
+    多维特征按各维分别取包络，仍是下界。
+
+    返回：
+        未归一化的下界，除以n+m后可与归一化距离比较；窗口内有空行时返回0。
+    """
+    x, y = _asSeries(x), _asSeries(y)
+    lo, hi = getWindowBounds(len(x), len(y), window_type, window_size)
+
+    return _calLbKeogh(x, y, lo, hi, DTW_METRIC_DICT[dist_method])
+
+
+def calDtwDistance(
+    x,
+    y,
+    dist_method: str = "euclidean",
+    window_type: str = None,
+    window_size: int = None,
+    threshold: float = np.inf,
+) -> float:
+    """
+    计算两条序列的归一化DTW距离（symmetric2步进模式，除以n+m），与dtw-python的normalizedDistance一致。
+
+    参数：
+        x、y: 一维序列或(长度, 特征维数)的多维特征序列。
+        dist_method(str): 局部距离，见DTW_METRIC_DICT。
+        window_type、window_size: 窗口，见getWindowBounds。
+        threshold(float): 提前放弃的阈值，确定距离大于该值时不再计算，返回inf。
+
+    返回：
+        dist(float): 归一化DTW距离，提前放弃时为inf。窗口内没有可行路径时抛出ValueError，与dtw-python相同。
+    """
+    window_code, window_size = _getWindowCode(window_type, window_size)
+    dist = _calDtwPair(_asSeries(x), _asSeries(y), DTW_METRIC_DICT[dist_method], window_code, window_size, threshold)
+    if np.isnan(dist):
+        raise ValueError("No warping path found compatible with the local constraints")
+
+    return dist
+
+
+def calDtwPath(
+    x,
+    y,
+    dist_method: str = "euclidean",
+    window_type: str = None,
+    window_size: int = None,
+) -> tuple:
+    """
+    计算归一化DTW距离并回溯最优规整路径，距离与calDtwDistance相同，路径与dtw-python的index1、index2相同。
+
+    需要完整的n×m累计代价矩阵，只需距离时用calDtwDistance。
+
+    返回：
+        (dist, path): 归一化DTW距离；(路径长度, 2)的int64数组，每行为对齐的(x下标, y下标)，从(0, 0)到(n-1, m-1)。
+            窗口内没有可行路径时抛出ValueError。
+    """
+    x, y = _asSeries(x), _asSeries(y)
+    lo, hi = getWindowBounds(len(x), len(y), window_type, window_size)
+    cm, step = _dtwCostMatrix(x, y, lo, hi, DTW_METRIC_DICT[dist_method])
+    if np.isnan(cm[-1, -1]):
+        raise ValueError("No warping path found compatible with the local constraints")
+
+    return cm[-1, -1] / (len(x) + len(y)), _backtrackPath(step)
+
+
+def getPathWeight(path: np.ndarray) -> np.ndarray:
+    """
+    规整路径上每个格子在symmetric2步进模式中的权重：起点与横、竖步为1，对角步为2。
+    路径上各格局部距离按此加权求和即为累计代价，按特征分别求和可得到各特征沿同一路径的代价。
+    """
+    path = np.asarray(path)
+    weight = np.ones(len(path))
+    weight[1:][np.all(np.diff(path, axis=0) == 1, axis=1)] = 2.0
+
+    return weight
+
+
+def searchDtw(
+    x,
+    y_list: list,
+    dist_method: str = "euclidean",
+    window_type: str = None,
+    window_size: int = None,
+) -> tuple:
+    """
+    在y_list中找与x的DTW距离最小的参考序列。
+
+    候选按LB_Kim从小到大计算：LB_Kim或LB_Keogh已不小于当前最优距离的候选直接跳过，
+    其余候选以当前最优距离为阈值提前放弃。距离相同时取下标最小的候选，与逐个计算后取最小值的结果相同。
+
+    参数：
+        x: 查询序列。
+        y_list(list): 候选参考序列。
+        其余参数见calDtwDistance。
+
+    返回：
+        (best_index, dist_list): 最近候选的下标；各候选的归一化距离，被跳过或提前放弃的为inf。
+    """
+    x = _asSeries(x)
+    y_list = [_asSeries(y) for y in y_list]
+    metric = DTW_METRIC_DICT[dist_method]
+    window_code, window_size = _getWindowCode(window_type, window_size)
+    lb_list = [_lbKimPair(x, y, metric) / (len(x) + len(y)) for y in y_list]
+    dist_list = [np.inf] * len(y_list)
+    best_index, best_dist = -1, np.inf
+
+    def isPruned(lb, index):
+        """下界已大于当前最优距离，或相等而下标更大时，该候选不可能成为结果。"""
+        return lb > best_dist or (lb == best_dist and index > best_index)
+
+    for index in np.argsort(lb_list, kind="stable"):
+        y = y_list[index]
+        if isPruned(lb_list[index], index):
+            continue
+        if best_index >= 0:
+            lo, hi = _windowBounds(len(x), len(y), window_code, window_size)
+            if isPruned(_calLbKeogh(x, y, lo, hi, metric) / (len(x) + len(y)), index):
+                continue
+        dist = _calDtwPair(x, y, metric, window_code, window_size, best_dist)
+        if np.isnan(dist):
+            raise ValueError("No warping path found compatible with the local constraints")
+        dist_list[index] = dist
+        if dist < best_dist or (dist == best_dist and index < best_index):
+            best_index, best_dist = int(index), dist
+
+    return best_index, dist_list
+
+
+def calDtwMatrix(
+    x_list: list,
+    y_list: list,
+    dist_method: str = "euclidean",
+    window_type: str = None,
+    window_size: int = None,
+    prune: bool = False,
+    max_workers: int = None,
+) -> np.ndarray:
+    """
+    一次计算一批查询序列与一批参考序列两两之间的归一化DTW距离。
+
+    长度不一的序列先分别拼接为连续数组，全部距离在编译后的内核中计算，不再逐对经过Python；
+    查询序列交错分给max_workers个线程，内核执行时不持有GIL，线程之间真正并行。
+
+    参数：
+        x_list(list): 查询序列，如同一首歌的全部录音。
+        y_list(list): 参考序列，如乐谱的全部调号、八度变体，特征维数须与查询序列相同。
+        dist_method、window_type、window_size: 见calDtwDistance。
+        prune(bool): 只需要每条查询序列的最近参考时设为True，用LB_Kim与提前放弃跳过不可能更近的参考，
+            跳过的位置为inf，每行的最小值及其下标（距离相同时取下标最小的参考）与不剪枝时相同。
+        max_workers(int, 可选): 线程数，缺省为物理核心数，为1时在当前线程计算。
+
+    返回：
+        dist_matrix(np.ndarray): (查询数, 参考数)的归一化距离，窗口内没有可行路径的位置为nan。
+    """
+    if len(x_list) == 0 or len(y_list) == 0:
+        return np.full((len(x_list), len(y_list)), np.inf)
+    x_pack, x_offset = _packSeries(x_list)
+    y_pack, y_offset = _packSeries(y_list)
+    if x_pack.shape[1] != y_pack.shape[1]:
+        raise ValueError(f"Feature dimension mismatch: {x_pack.shape[1]} != {y_pack.shape[1]}")
+    metric = DTW_METRIC_DICT[dist_method]
+    window_code, window_size = _getWindowCode(window_type, window_size)
+    dist_matrix = np.full((len(x_list), len(y_list)), np.inf)
+
+    def run(query_array):
+        _dtwMatrixKernel(
+            x_pack, x_offset, y_pack, y_offset, query_array, metric, window_code, window_size, prune, dist_matrix
+        )
+
+    max_workers = max_workers or psutil.cpu_count(logical=False) or 1
+    query_array = np.arange(len(x_list), dtype=np.int64)
+    if max_workers == 1 or len(x_list) < 2:
+        run(query_array)
+    else:
+        _compileKernels()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(run, [query_array[i::max_workers] for i in range(max_workers)]))
+
+    return dist_matrix
@@ -38,12 +38,27 @@ INDEX_CSV = "指标结果表.csv"
 
 # eigen_json
 EIGEN_DIR = ROOT / "eigen_json"
+# 编译后的乐谱（全部调号及八度变体的逐字频率与音长），按简谱JSON与频率表的修改时间失效，见compiled_score模块
+COMPILED_SCORE_PERSIST = True
+COMPILED_SCORE_DIR = EIGEN_DIR / "compiled"
 
 # audio
 UPLOAD_FILE_DIR = ROOT / "audio"
 
 # resultJson
 DOWNLOAD_DIR = ROOT / "resultJson"
+# 按音频内容哈希+模型版本缓存的逐条ASR结果
+ASR_CACHE_DIR = DOWNLOAD_DIR / "cache"
+# 按音频内容哈希+基频估计参数缓存的帧级基频轨迹，超过大小上限（字节）时按最近使用时间淘汰
+FEATURE_STORE_ENABLE = True
+FEATURE_STORE_DIR = DOWNLOAD_DIR / "feature"
+FEATURE_STORE_MAX_BYTES = 2 * 1024 ** 3
+# 规范化PCM存储：每条输入音频只解码、重采样一次为16k单声道int16的.npy（约115MB/小时），ASR、基频分析、切分都从这里读取，
+# 采样率与funASR及"default"分析配置一致，见pcm_store模块；超过大小上限（字节）时按最近使用时间淘汰
+PCM_STORE_ENABLE = True
+PCM_STORE_DIR = DOWNLOAD_DIR / "pcm"
+PCM_STORE_SR = 16000
+PCM_STORE_MAX_BYTES = 20 * 1024 ** 3
 
 # lyrics
 LYRICS_DIR = ROOT / "lyrics"
@@ -51,6 +66,79 @@ LYRICS_DIR = ROOT / "lyrics"
 # resultAudio
 AUDIO_DIR = ROOT / "resultAudio"
 
+# funASR模型配置，模型管理器以(model, vad_model, punc_model, revision)为键缓存已加载的模型
+ASR_MODEL = "iic/speech_paraformer-large-vad-punc_asr_nat-zh-cn-16k-common-vocab8404-pytorch"
+ASR_VAD_MODEL = "fsmn-vad"
+ASR_PUNC_MODEL = "ct-punc-c"
+ASR_MODEL_REVISION = "v2.0.4"
+
+# 常驻ASR守护进程监听的本地地址，funasrRun优先把识别任务发给守护进程，未运行时退回进程内识别
+ASR_DAEMON_HOST = "127.0.0.1"
+ASR_DAEMON_PORT = 10096
+
+# 音频分析配置：采样率、帧长、帧移（采样点数），xfrVocalTract、calAudioFreq、getSongFeat、ASR阶段共用同一套配置。
+# "default"与funASR同为16k，一次解码同时供识别与音高分析使用；"low"为8k低采样率模式，更快；
+# "legacy"为原先librosa.load默认的22050Hz分析方式。各模式帧移均约24毫秒。
+# 默认仍为"legacy"，与已有结果一致；"default"、"low"需显式指定，切换前先用run/benchmark_analysis.py对比准确率
+ANALYSIS_CONFIG_DICT = {
+    "default": {"sr": 16000, "frame_length": 1024, "hop_length": 384},
+    "low": {"sr": 8000, "frame_length": 512, "hop_length": 192},
+    "legacy": {"sr": 22050, "frame_length": 2048, "hop_length": 512},
+}
+ANALYSIS_MODE = "legacy"
+
+# funASR模型要求的输入采样率
+ASR_SAMPLE_RATE = 16000
+
+# 降噪：估计的信噪比（dB）不低于NOISE_SKIP_SNR_DB时跳过降噪，不低于NOISE_STATIONARY_SNR_DB时使用平稳降噪，
+# 否则使用非平稳降噪，见prep_audio.noiseReduce
+NOISE_SKIP_SNR_DB = 35.0
+NOISE_STATIONARY_SNR_DB = 20.0
+# 由首个ASR字之前的静音估计噪声样本：静音至少NOISE_PROFILE_MIN_S秒，首字前NOISE_PROFILE_GUARD_S秒以内的部分不用
+NOISE_PROFILE_MIN_S = 0.5
+NOISE_PROFILE_GUARD_S = 0.1
+# 长录音分块降噪的块长与两侧重叠（秒）
+NOISE_CHUNK_S = 30.0
+NOISE_CHUNK_PAD_S = 2.0
+
+# 压缩格式（mp3、m4a等）优先通过ffmpeg管道解码，直接输出目标采样率的单声道float32，见prep_audio.decodeAudio；
+# 未安装ffmpeg或关闭该开关时由soundfile/librosa解码
+AUDIO_DECODE_FFMPEG = True
+FFMPEG_BIN = "ffmpeg"
+FFPROBE_BIN = "ffprobe"
+# 虚拟剪辑：batch_audio_seg只把保留区间（源文件、起止采样点、采样率）记入清单，不写出剪辑后的音频；
+# xfrVocalTract、funASR输入准备、getSongFeat读取音频时按清单截取同一区间，见prep_audio.getSegmentWindow
+SEGMENT_VIRTUAL = True
+SEGMENT_MANIFEST_PATH = DATA_DIR / "segment_manifest.json"
+# exportSegments导出片段的默认格式："flac"/"wav"为无损格式，"copy"为ffmpeg流复制（不重新编码）
+SEGMENT_FORMAT = "flac"
+
+# 基频估计算法，可选"pyin"（最准，用于最终评分）、"yin"、"acf"（更快，用于批量初筛），见audio_eigen_new.calAudioFreq
+PITCH_BACKEND = "pyin"
+
+# 由乐谱音符频率收窄基频搜索范围时，在最低、最高音符之外各留出的余量（音分），见audio_eigen_new.getPitchSearchRange
+PITCH_RANGE_MARGIN_CENTS = 300.0
+
+# 是否只在ASR字时间戳合并出的发声区间内估计基频，以及每个字两侧扩展的秒数，见audio_eigen_new.mergeWordSpan
+PITCH_VOICED_SPAN = False
+PITCH_SPAN_PAD_S = 0.2
+
+# 长录音分块估计基频时每块的秒数与两侧重叠秒数，见audio_eigen_new.iterAudioFreq
+PITCH_CHUNK_S = 60.0
+PITCH_CHUNK_OVERLAP_S = 2.0
+
+# DTW计算引擎，见audio_score.useDtw："native"为项目内的DTW内核（numba编译，按行递推、支持窗口与下界剪枝），
+# "dtw-python"为原实现，两者不加窗口时结果逐位一致
+DTW_ENGINE = "native"
+
+# 音准评分方式，见audio_score.usePitchDtw：
+# "interval"为相邻字音程、"relative"为相对中位数主音的音分，与调号无关，每条录音只需一次DTW并由estimateKey估计调号；
+# "key"为原方式，对24个调号、八度变体各计算一次z-score后的DTW并取最小值；
+# "joint"为音准与节拍节奏联合对齐，逐字(频率, 音长)只做一次DTW，两个维度沿同一条路径计算，见audio_score.useJointDtw。
+# 默认保持原方式。"interval"、"relative"的音准距离单位为音分，与"key"的z-score距离不可比较；
+# 除"key"外的方式在结果中多一列"调号"，切换方式时应换用新的RESULT_CSV，writeCsv会向已有文件追加
+PITCH_SCORE_MODE = "key"
+
 # json结果的名字后缀
 OUTPUT_JSON_NAME = "orderResult.json"
 
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import unittest
+import tempfile
+from unittest import mock
+from setting import *
+from preprocess.asr_cache import readScpFile
+from preprocess import asr_batch
+from preprocess.asr_batch import *
+
+
+class _StubModel(object):
+    """代替AutoModel：记录每批收到的key，识别文本为音频文件名。"""
+
+    def __init__(self):
+        self.batch_key_list = []
+
+    def generate(self, input, **kwargs):
+        item_list = readScpFile(input)
+        self.batch_key_list.append([key for key, _ in item_list])
+        return [{"key": key, "text": Path(audio_path).stem, "timestamp": []} for key, audio_path in item_list]
+
+
+class TestAsrBatch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        self.duration_dict = {"a": 30.0, "b": 5.0, "c": 100.0, "d": 20.0, "e": 10.0, "f": 40.0}
+        self.item_list = [(f"song_{name}", f"{name}.wav") for name in self.duration_dict]
+        self.duration_func = lambda audio_path: self.duration_dict[Path(audio_path).stem]
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def _getBatchName(self, batch_list: list) -> list:
+        return [[Path(audio_path).stem for _, audio_path, _ in batch] for batch in batch_list]
+
+    def test_bucket(self):
+        # 按时长升序装箱，补齐后总时长超出预算时另起一批，单条超出预算的音频单独成批
+        batch_list = bucketAudioByDuration(self.item_list, batch_size_s=60.0, duration_func=self.duration_func)
+        self.assertEqual(self._getBatchName(batch_list), [["b", "e", "d"], ["a"], ["f"], ["c"]])
+        for batch in batch_list:
+            self.assertEqual([duration for _, _, duration in batch], sorted(duration for _, _, duration in batch))
+            if len(batch) > 1:
+                self.assertLessEqual(len(batch) * batch[-1][2], 60.0)
+        # 每条音频恰好出现一次
+        self.assertEqual(sorted(key for batch in batch_list for key, _, _ in batch), sorted(dict(self.item_list)))
+
+    def test_bucketLimit(self):
+        # 内存上限：补齐后20秒×0.5MB/秒
+        batch_list = bucketAudioByDuration(
+            self.item_list, batch_size_s=300.0, max_memory_mb=10.0, mem_per_s_mb=0.5, duration_func=self.duration_func
+        )
+        self.assertEqual(self._getBatchName(batch_list), [["b", "e"], ["d"], ["a"], ["f"], ["c"]])
+        # 条数上限
+        batch_list = bucketAudioByDuration(
+            self.item_list, batch_size_s=1000.0, max_batch_num=4, duration_func=self.duration_func
+        )
+        self.assertEqual(self._getBatchName(batch_list), [["b", "e", "d", "a"], ["f", "c"]])
+        self.assertEqual(bucketAudioByDuration([], duration_func=self.duration_func), [])
+
+    def test_generateByBucket(self):
+        model = _StubModel()
+        throughput_dict = {}
+        tmp_scp_path = self.tmp_path / "miss.scp"
+        with mock.patch.object(asr_batch, "getAudioDuration", self.duration_func):
+            rs_list = [
+                record
+                for batch_rs_list in generateByBucket(
+                    model,
+                    self.item_list,
+                    tmp_scp_path,
+                    batch_size_s=60.0,
+                    max_batch_num=2,
+                    throughput_dict=throughput_dict,
+                    virtual_segment=False,
+                )
+                for record in batch_rs_list
+            ]
+        self.assertEqual(model.batch_key_list, [["song_b", "song_e"], ["song_d", "song_a"], ["song_f"], ["song_c"]])
+        self.assertFalse(tmp_scp_path.exists())
+        # 按key回填后恢复原始顺序，每条结果对应各自的音频
+        rs_dict = {record["key"]: record for record in rs_list}
+        self.assertEqual([rs_dict[key]["text"] for key, _ in self.item_list], list(self.duration_dict))
+
+        # 吞吐统计累计全部批次
+        self.assertEqual(throughput_dict["batch_num"], 4)
+        self.assertEqual(throughput_dict["audio_s"], sum(self.duration_dict.values()))
+        self.assertGreaterEqual(throughput_dict["wall_s"], 0)
+
+    def test_formatThroughput(self):
+        report = formatThroughput({"audio_s": 205.0, "wall_s": 10.0, "batch_num": 5})
+        self.assertEqual(report, "5 batches, 205.0 audio-s in 10.0 wall-s, throughput 20.50 audio-s/wall-s")
+        self.assertIn("throughput nan", formatThroughput({}))
+
+
+if __name__ == "__main__":
+    unittest.main()
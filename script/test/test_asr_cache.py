@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+import unittest
+import tempfile
+import shutil
+from unittest import mock
+import numpy as np
+import soundfile as sf
+from setting import *
+from preprocess.asr_cache import *
+from preprocess import funasr_go
+
+
+class _StubModel(object):
+    """代替AutoModel：记录每次generate收到的音频，识别文本为音频文件名。"""
+
+    def __init__(self):
+        self.input_list = []
+
+    def generate(self, input, **kwargs):
+        item_list = readScpFile(input)
+        self.input_list.extend(item_list)
+        return [{"key": key, "text": Path(audio_path).stem, "timestamp": [[0, 100]]} for key, audio_path in item_list]
+
+
+class TestAsrCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        self.cache_dir = self.tmp_path / "cache"
+        self.audio_path = self.tmp_path / "qilai.wav"
+        sf.write(self.audio_path, np.sin(np.arange(16000) * 0.1) * 0.5, 16000)
+        self.record = {"key": "qilai", "text": "起来", "timestamp": [[0, 100], [100, 300]]}
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_modelTag(self):
+        model_tag = getAsrModelTag("paraformer", "fsmn-vad", "ct-punc", "v2.0.4")
+        self.assertTrue(model_tag.startswith("v2.0.4_"))
+        self.assertEqual(getAsrModelTag("paraformer", "fsmn-vad", "ct-punc", "v2.0.4"), model_tag)
+        # 模型版本或标点模型变化都落到不同的分区
+        self.assertNotEqual(getAsrModelTag("paraformer", "fsmn-vad", "ct-punc", "v2.0.5"), model_tag)
+        self.assertNotEqual(getAsrModelTag("paraformer", "fsmn-vad", None, "v2.0.4"), model_tag)
+
+    def test_readWrite(self):
+        model_tag = getAsrModelTag()
+        audio_hash = getAudioHash(self.audio_path)
+        self.assertIsNone(readAsrCache(audio_hash, model_tag, self.cache_dir))
+        writeAsrCache(audio_hash, model_tag, self.record, self.cache_dir)
+        # 缓存中不含key；内容相同的改名副本命中同一条记录
+        expect = {k: v for k, v in self.record.items() if k != "key"}
+        copy_path = self.tmp_path / "renamed.wav"
+        shutil.copy(self.audio_path, copy_path)
+        self.assertEqual(readAsrCache(getAudioHash(copy_path), model_tag, self.cache_dir), expect)
+        # 模型版本或标点模型变化时不命中
+        for model_revision, punc_model in [("v0.0.0", ASR_PUNC_MODEL), (ASR_MODEL_REVISION, None)]:
+            other_tag = getAsrModelTag(punc_model=punc_model, model_revision=model_revision)
+            self.assertIsNone(readAsrCache(audio_hash, other_tag, self.cache_dir))
+
+    def test_hashIndex(self):
+        hash_index = {}
+        audio_hash = getAudioHash(self.audio_path, hash_index)
+        saveHashIndex(hash_index, self.cache_dir)
+        hash_index = loadHashIndex(self.cache_dir)
+        self.assertEqual(hash_index[os.path.abspath(self.audio_path)][2], audio_hash)
+        # 大小与修改时间未变时直接使用索引中的哈希，不重新计算
+        with mock.patch("preprocess.asr_cache.calFileHash") as cal_mock:
+            self.assertEqual(getAudioHash(self.audio_path, hash_index), audio_hash)
+        cal_mock.assert_not_called()
+
+        # 修改时间变化或大小变化后重新计算，并更新索引
+        stat = os.stat(self.audio_path)
+        sf.write(self.audio_path, np.sin(np.arange(16000) * 0.2) * 0.5, 16000)
+        os.utime(self.audio_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual(os.stat(self.audio_path).st_size, stat.st_size)
+        new_hash = getAudioHash(self.audio_path, hash_index)
+        self.assertNotEqual(new_hash, audio_hash)
+        self.assertEqual(new_hash, calFileHash(self.audio_path))
+        self.assertEqual(hash_index[os.path.abspath(self.audio_path)][1], stat.st_mtime_ns + 10 ** 9)
+        mtime_ns = os.stat(self.audio_path).st_mtime_ns
+        sf.write(self.audio_path, np.sin(np.arange(8000) * 0.2) * 0.5, 16000)
+        os.utime(self.audio_path, ns=(stat.st_atime_ns, mtime_ns))
+        self.assertEqual(getAudioHash(self.audio_path, hash_index), calFileHash(self.audio_path))
+
+
+class TestFunasrRunCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        audio_dir = self.tmp_path / "audio"
+        audio_dir.mkdir()
+        for i, name in enumerate(["a", "b", "d"]):
+            sf.write(audio_dir / f"{name}.wav", np.sin(np.arange(16000 * (i + 1)) * 0.1 * (i + 1)) * 0.5, 16000)
+        # c是a改名的副本
+        shutil.copy(audio_dir / "a.wav", audio_dir / "c.wav")
+        self.item_list = [(f"song_{name}", audio_dir / f"{name}.wav") for name in ["d", "a", "b", "c"]]
+        writeScpFile(self.item_list, self.tmp_path / "song.scp")
+
+        self.model = _StubModel()
+        self.patch_list = [
+            mock.patch.object(funasr_go, "loadAsrModel", lambda **kwargs: self.model),
+            mock.patch.object(funasr_go, "PCM_STORE_ENABLE", False),
+        ]
+        for patch in self.patch_list:
+            patch.start()
+
+    def tearDown(self) -> None:
+        for patch in self.patch_list:
+            patch.stop()
+        self.tmp_dir.cleanup()
+
+    def _run(self) -> dict:
+        return funasr_go.funasrRun(
+            input_scp_dir=self.tmp_path,
+            scp_name="song",
+            input_mode="scp",
+            download_json_dir=self.tmp_path / "result",
+            cache_dir=self.tmp_path / "cache",
+            use_daemon=False,
+            virtual_segment=False,
+        )
+
+    def test_mergeHitMiss(self):
+        # 预先缓存a的结果：a与其副本c命中，只有b、d交给模型识别
+        model_tag = getAsrModelTag()
+        hash_list = [getAudioHash(audio_path) for _, audio_path in self.item_list]
+        a_hash = hash_list[1]
+        cache_record = {"key": "old", "text": "cached", "timestamp": [[0, 50]]}
+        writeAsrCache(a_hash, model_tag, cache_record, self.tmp_path / "cache")
+
+        rs_dict = self._run()
+        self.assertEqual(sorted(self.model.input_list), sorted([
+            (hash_list[0], str(self.item_list[0][1]).replace(os.sep, "/")),
+            (hash_list[2], str(self.item_list[2][1]).replace(os.sep, "/")),
+        ]))
+        # 命中与识别的结果按scp顺序合并，key为scp中的key
+        self.assertEqual([record["key"] for record in rs_dict["scp_rs"]], [key for key, _ in self.item_list])
+        self.assertEqual([record["text"] for record in rs_dict["scp_rs"]], ["d", "cached", "b", "cached"])
+        self.assertEqual(rs_dict["scp_rs"][1]["audio_hash"], a_hash)
+        # 识别结果写入缓存，再次运行不再调用模型
+        self.assertEqual(readAsrCache(hash_list[2], model_tag, self.tmp_path / "cache")["text"], "b")
+        self.model.input_list.clear()
+        self.assertEqual(self._run(), rs_dict)
+        self.assertEqual(self.model.input_list, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
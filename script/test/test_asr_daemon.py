@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import unittest
+import tempfile
+import threading
+import functools
+import socket
+from unittest import mock
+import numpy as np
+import soundfile as sf
+from setting import *
+from preprocess.asr_cache import readScpFile, writeScpFile
+from preprocess.asr_daemon import *
+from preprocess.asr_daemon import _loadItemPcm
+from preprocess import funasr_go
+
+
+class _StubModel(object):
+    """代替AutoModel：scp输入的识别文本为音频文件名，数组输入的识别文本为采样点数，返回的key不可用，需按顺序回填。"""
+
+    def __init__(self):
+        self.input_list = []
+
+    def generate(self, input, fs=None, batch_size_s=None):
+        self.input_list.append(input)
+        if isinstance(input, str):
+            return [{"key": key, "text": Path(path).stem, "timestamp": []} for key, path in readScpFile(input)]
+        return [{"key": "rand_key", "text": str(len(pcm)), "timestamp": []} for pcm in input]
+
+
+def _getFreePort() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestAsrDaemon(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        for name, duration_s in [("a", 1.0), ("b", 2.0)]:
+            sf.write(self.tmp_path / f"{name}.wav", np.zeros(int(16000 * duration_s)), 16000)
+        self.npy_path = self.tmp_path / "a.npy"
+        np.save(self.npy_path, np.zeros(16000, dtype=np.float32))
+
+        self.model = _StubModel()
+        self.config_list = []
+        self.patch = mock.patch.object(funasr_go, "loadAsrModel", self._loadAsrModel)
+        self.patch.start()
+        self.server = AsrDaemonServer("127.0.0.1", 0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = AsrDaemonClient(punc_model=None, host="127.0.0.1", port=self.server.server_address[1])
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.patch.stop()
+        self.tmp_dir.cleanup()
+
+    def _loadAsrModel(self, *model_config):
+        self.config_list.append(model_config)
+        return self.model
+
+    def test_pathItem(self):
+        self.assertTrue(self.client.ping())
+        self.assertTrue(self.client.isLocal())
+        scp_path = self.tmp_path / "song.scp"
+        writeScpFile([("song_b", self.tmp_path / "b.wav"), ("song_a", self.tmp_path / "a.wav")], scp_path)
+        rs_list = self.client.generate(input=str(scp_path))
+        self.assertEqual([(record["key"], record["text"]) for record in rs_list], [("song_b", "b"), ("song_a", "a")])
+        rs_list = self.client.generate(input=str(self.tmp_path / "a.wav"))
+        self.assertEqual([(record["key"], record["text"]) for record in rs_list], [("a", "a")])
+        # 守护进程按客户端的模型组合取用模型
+        self.assertEqual(self.config_list[0], self.client.model_config)
+
+    def test_pcmItem(self):
+        # 数组、PCM存储的.npy引用、原始音频引用混合发送，按输入顺序回填key
+        input_list = [
+            {"npy": str(self.npy_path), "sr": 16000, "start": 0.5, "end": 0.75},
+            np.zeros(100, dtype=np.float32),
+            {"audio": str(self.tmp_path / "b.wav"), "sr": 16000, "start": 0.25, "end": None},
+            {"npy": str(self.npy_path), "sr": 16000, "start": 0.0, "end": None},
+        ]
+        rs_list = self.client.generate(input=input_list, key=["npy_1", "pcm_1", "audio_1", "npy_2"])
+        rs_list = [(record["key"], record["text"]) for record in rs_list]
+        self.assertEqual(rs_list, [("npy_1", "4000"), ("pcm_1", "100"), ("audio_1", "28000"), ("npy_2", "16000")])
+        self.assertEqual(len(self.model.input_list), 1)
+        self.assertEqual(self.client.generate(input=[np.zeros(10)])[0]["key"], "pcm_0")
+
+        # PCM存储中的int16采样还原为float32后交给模型
+        np.save(self.npy_path, np.array([-32768, 0, 16384, 32767], dtype=np.int16))
+        y = _loadItemPcm({"npy": str(self.npy_path), "sr": 4, "start": 0.25, "end": None})
+        self.assertEqual(y.dtype, np.float32)
+        np.testing.assert_array_equal(y, [0.0, 0.5, 32767 / 32768])
+
+    def test_error(self):
+        with self.assertRaises(RuntimeError):
+            self.client.request({"op": "unknown"})
+
+
+class TestDaemonFallback(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        sf.write(self.tmp_path / "a.wav", np.zeros(16000), 16000)
+        writeScpFile([("song_a", self.tmp_path / "a.wav")], self.tmp_path / "song.scp")
+        self.port = _getFreePort()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_fallback(self):
+        # 端口上没有守护进程时返回None，funasrRun退回进程内识别
+        self.assertIsNone(connectAsrDaemon(port=self.port))
+        model = _StubModel()
+        with mock.patch.object(funasr_go, "connectAsrDaemon", functools.partial(connectAsrDaemon, port=self.port)), \
+                mock.patch.object(funasr_go, "loadAsrModel", lambda **kwargs: model), \
+                mock.patch.object(funasr_go, "PCM_STORE_ENABLE", False):
+            rs_dict = funasr_go.funasrRun(
+                input_scp_dir=self.tmp_path,
+                scp_name="song",
+                input_mode="scp",
+                download_json_dir=self.tmp_path / "result",
+                cache_dir=self.tmp_path / "cache",
+                use_daemon=True,
+                virtual_segment=False,
+            )
+        self.assertEqual(len(model.input_list), 1)
+        self.assertEqual([(record["key"], record["text"]) for record in rs_dict["scp_rs"]], [("song_a", "a")])
+
+
+if __name__ == "__main__":
+    unittest.main()
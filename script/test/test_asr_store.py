@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import unittest
+import tempfile
+import pickle
+import json
+from concurrent.futures import ProcessPoolExecutor
+from setting import *
+from preprocess.asr_store import *
+
+
+def _makeRecord(key: str, text: str = "起来") -> dict:
+    return {"key": key, "text": text, "timestamp": [[0, 100], [100, 300]]}
+
+
+class TestAsrResultStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store_path = Path(self.tmp_dir.name) / "qilai.jsonl"
+        self.store = AsrResultStore(self.store_path)
+        for i in range(3):
+            self.store.append(_makeRecord(f"qilai_{i}"))
+        self.store.close()
+        self.data_bytes = self.store_path.read_bytes()
+        self.index_bytes = self.store.index_path.read_bytes()
+
+    def tearDown(self) -> None:
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def _reopen(self) -> AsrResultStore:
+        self.store.close()
+        self.store = AsrResultStore(self.store_path)
+        return self.store
+
+    def _restore(self):
+        """恢复到setUp写入的三条完整记录。"""
+        self.store.close()
+        self.store_path.write_bytes(self.data_bytes)
+        self.store.index_path.write_bytes(self.index_bytes)
+
+    def _writeRaw(self, data_bytes: bytes = b"", index_text: str = ""):
+        """模拟append在不同位置中断：直接向数据文件、索引文件末尾追加原始内容。"""
+        with open(self.store_path, "ab") as f:
+            f.write(data_bytes)
+        with open(self.store.index_path, "a", encoding="utf-8") as f:
+            f.write(index_text)
+
+    def test_appendGet(self):
+        store = self._reopen()
+        self.assertEqual(store.keys(), ["qilai_0", "qilai_1", "qilai_2"])
+        self.assertEqual(store["qilai_1"], _makeRecord("qilai_1"))
+        self.assertEqual([record["key"] for record in store], store.keys())
+        self.assertIsNone(store.get("qilai_3"))
+        with self.assertRaises(KeyError):
+            store["qilai_3"]
+
+    def test_halfLine(self):
+        # 数据行只写了一半：截断，索引不变
+        line = json.dumps(_makeRecord("qilai_3"), ensure_ascii=False).encode("utf-8")
+        self._writeRaw(line[: len(line) // 2])
+        store = self._reopen()
+        self.assertNotIn("qilai_3", store)
+        self.assertEqual(self.store_path.read_bytes(), self.data_bytes)
+        # 截断后继续追加，新记录从完整的行尾开始
+        store.append(_makeRecord("qilai_3"))
+        self.assertEqual(self._reopen()["qilai_3"], _makeRecord("qilai_3"))
+
+    def test_lineWithoutIndex(self):
+        # 数据行已完整写入，索引行未写或只写了一半：扫描补回该条记录并重写索引
+        line = (json.dumps(_makeRecord("qilai_3"), ensure_ascii=False) + "\n").encode("utf-8")
+        offset = len(self.data_bytes)
+        for index_text in ("", f"{offset}\tqil"):
+            with self.subTest(index_text=index_text):
+                self._restore()
+                self._writeRaw(line, index_text)
+                store = self._reopen()
+                self.assertEqual(store["qilai_3"], _makeRecord("qilai_3"))
+                self.assertEqual(store.offset_dict["qilai_3"], offset)
+                index_text = store.index_path.read_text(encoding="utf-8")
+                self.assertTrue(index_text.endswith(f"{offset}\tqilai_3\n"))
+                # 恢复只做一次，重复打开结果不变
+                self.assertEqual(self._reopen().keys(), ["qilai_0", "qilai_1", "qilai_2", "qilai_3"])
+                self.assertEqual(store.index_path.read_text(encoding="utf-8"), index_text)
+
+    def test_indexPastData(self):
+        # 索引已写入但数据丢失（如数据文件未落盘）：丢弃指向不完整数据的索引项
+        last_offset = self.store.offset_dict["qilai_2"]
+        with open(self.store_path, "r+b") as f:
+            f.truncate(last_offset + 5)
+        self._writeRaw(index_text=f"{len(self.data_bytes)}\tqilai_3\n")
+        store = self._reopen()
+        self.assertEqual(store.keys(), ["qilai_0", "qilai_1"])
+        self.assertEqual(self.store_path.stat().st_size, last_offset)
+        self.assertNotIn("qilai_2", store.index_path.read_text(encoding="utf-8"))
+
+    def test_duplicateKey(self):
+        # 同一key重复写入时，按key读取、遍历与重新打开后都以最后一次为准
+        store = self._reopen()
+        store.append(_makeRecord("qilai_1", "起来不愿"))
+        self.assertEqual(store["qilai_1"]["text"], "起来不愿")
+        self.assertEqual(len(store), 3)
+        rs_list = [(record["key"], record["text"]) for record in store]
+        self.assertEqual(rs_list, [("qilai_0", "起来"), ("qilai_2", "起来"), ("qilai_1", "起来不愿")])
+        store = self._reopen()
+        self.assertEqual(store["qilai_1"]["text"], "起来不愿")
+        self.assertEqual([(record["key"], record["text"]) for record in store], rs_list)
+
+    def test_pickle(self):
+        # 传给子进程时只带路径与索引，文件句柄在子进程中重新打开
+        store = self._reopen()
+        store.get("qilai_0")
+        rs_store = pickle.loads(pickle.dumps(store))
+        self.assertEqual(rs_store.offset_dict, store.offset_dict)
+        self.assertIsNone(rs_store._read_file)
+        self.assertEqual(rs_store["qilai_2"], _makeRecord("qilai_2"))
+        rs_store.close()
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            rs_list = list(executor.map(store.get, store.keys()))
+        self.assertEqual(rs_list, [_makeRecord(key) for key in store.keys()])
+
+
+if __name__ == "__main__":
+    unittest.main()
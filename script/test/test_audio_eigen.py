@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+import unittest
+import pickle
+import tempfile
+import numpy as np
+import soundfile as sf
+from setting import *
+from preprocess.word_timeline import *
+from preprocess.audio_eigen_new import *
+from preprocess.prep_audio import xfrVocalTract
+
+
+class TestWordTimeline(unittest.TestCase):
+    def setUp(self) -> None:
+        self.eigen_dict = {
+            "eigen_list": [
+                {"word": "起", "eigen": {"start_time": 0.51, "end_time": 0.873}},
+                {"word": "来", "eigen": {"start_time": 0.873, "end_time": 1.337}},
+            ]
+        }
+
+    def test_eigenDictRoundTrip(self):
+        timeline = WordTimeline.fromEigenDict(self.eigen_dict)
+        self.assertEqual(timeline.start.dtype, np.float32)
+        # float32存储后转换回字典，数值与原字典完全一致
+        self.assertDictEqual(timeline.toEigenDict(), self.eigen_dict)
+
+    def test_pickle(self):
+        timeline = WordTimeline.fromEigenDict(self.eigen_dict)
+        rs_timeline = pickle.loads(pickle.dumps(timeline))
+        self.assertDictEqual(rs_timeline.toEigenDict(), self.eigen_dict)
+
+
+class TestGetPerWordFeat(unittest.TestCase):
+    def setUp(self) -> None:
+        self.eigen_dict = {
+            "eigen_list": [
+                # 裁剪区间[1.2, 1.8]内有两个有效值
+                {"word": "起", "eigen": {"start_time": 1.0, "end_time": 2.0}},
+                # 裁剪区间[2.2, 2.8]内全部为nan，退回完整区间[2.0, 3.0]
+                {"word": "来", "eigen": {"start_time": 2.0, "end_time": 3.0}},
+                # 完整区间内也没有有效值，该字被移除
+                {"word": "不", "eigen": {"start_time": 5.0, "end_time": 5.05}},
+            ]
+        }
+        self.times_list = [1.0, 1.3, 1.5, 1.7, 2.0, 2.5, 3.0, 5.02]
+        self.freq_list = [100.0, 200.0, np.nan, 300.0, 400.0, np.nan, 500.0, np.nan]
+
+    def test_getPerWordFeat(self):
+        rs_dict = getPerWordFeat(
+            eigen_dict=self.eigen_dict, freq_list=self.freq_list, times_list=self.times_list
+        )
+        self.assertEqual([item["word"] for item in rs_dict["eigen_list"]], ["起", "来"])
+        self.assertEqual(rs_dict["eigen_list"][0]["eigen"]["freq"], 250.0)
+        self.assertEqual(rs_dict["eigen_list"][1]["eigen"]["freq"], 450.0)
+        self.assertEqual(rs_dict["eigen_list"][1]["eigen"]["times"], 1.0)
+
+    def test_getPerWordFeatTimeline(self):
+        timeline = getPerWordFeat(
+            eigen_dict=WordTimeline.fromEigenDict(self.eigen_dict),
+            freq_list=np.array(self.freq_list),
+            times_list=np.array(self.times_list),
+        )
+        self.assertIsInstance(timeline, WordTimeline)
+        np.testing.assert_array_equal(timeline.getFeat()[0], [250.0, 450.0])
+
+
+class TestPitchBackend(unittest.TestCase):
+    def setUp(self) -> None:
+        # 前1秒为220Hz谐波音，后0.5秒静音
+        self.sr = 22050
+        t = np.arange(self.sr) / self.sr
+        tone = np.sin(2 * np.pi * 220 * t) + 0.5 * np.sin(2 * np.pi * 440 * t)
+        self.y = np.concatenate([tone, np.zeros(self.sr // 2)])
+
+    def test_backendContract(self):
+        for backend in ("yin", "acf"):
+            with self.subTest(backend=backend):
+                freq_array, times_array = calAudioFreq(self.y, self.sr, backend=backend, to_list=False)
+                self.assertEqual(len(freq_array), len(times_array))
+                voiced = freq_array[(times_array > 0.2) & (times_array < 0.8)]
+                np.testing.assert_allclose(voiced, 220.0, rtol=0.01)
+                self.assertTrue(np.isnan(freq_array[times_array > 1.2]).all())
+
+    def test_voicedSpan(self):
+        span_list = [(0.375, 0.5), (0.5, 0.625)]
+        self.assertEqual(mergeWordSpan(span_list, pad_s=0.125), [(0.25, 0.75)])
+        freq_array, times_array = calAudioFreq(self.y, self.sr, backend="acf", to_list=False)
+        span_freq_array, span_times_array = calAudioFreq(
+            self.y, self.sr, backend="acf", to_list=False, span_list=span_list, span_pad_s=0.125
+        )
+        np.testing.assert_array_equal(span_times_array, times_array)
+        in_span = (times_array >= 0.25) & (times_array <= 0.75)
+        # 区间内逐帧与整条估计一致，区间外为nan
+        np.testing.assert_array_equal(span_freq_array[in_span], freq_array[in_span])
+        self.assertTrue(np.isnan(span_freq_array[times_array > 0.9]).all())
+
+    def test_iterAudioFreq(self):
+        freq_array, times_array = calAudioFreq(self.y, self.sr, backend="acf", to_list=False)
+        block_list = list(iterAudioFreq(self.y, self.sr, chunk_s=0.3, chunk_overlap_s=0.1, backend="acf"))
+        self.assertGreater(len(block_list), 1)
+        np.testing.assert_array_equal(np.concatenate([b[0] for b in block_list]), freq_array)
+        np.testing.assert_array_equal(np.concatenate([b[1] for b in block_list]), times_array)
+
+    def test_iterAudioFreqPyin(self):
+        # pyin分块计算时清浊音与基频状态在重叠上下文中延续，拼接后与整段计算在容差内一致
+        freq_array, times_array = calAudioFreq(self.y, self.sr, backend="pyin", to_list=False)
+        block_list = list(iterAudioFreq(self.y, self.sr, chunk_s=0.5, chunk_overlap_s=0.25, backend="pyin"))
+        self.assertGreater(len(block_list), 2)
+        chunk_freq_array = np.concatenate([b[0] for b in block_list])
+        np.testing.assert_array_equal(np.concatenate([b[1] for b in block_list]), times_array)
+        np.testing.assert_array_equal(np.isnan(chunk_freq_array), np.isnan(freq_array))
+        self.assertLess(np.nanmax(np.abs(1200 * np.log2(chunk_freq_array / freq_array))), 1.0)
+
+    def test_unknownBackend(self):
+        with self.assertRaises(ValueError):
+            calAudioFreq(self.y, self.sr, backend="crepe")
+
+
+class TestPitchSearchRange(unittest.TestCase):
+    def test_getPitchSearchRange(self):
+        fmin, fmax = getPitchSearchRange([196.0, None, 0, 392.0], margin_cents=300)
+        self.assertLessEqual(fmin, 196.0 * 2 ** (-300 / 1200))
+        self.assertGreaterEqual(fmax, 392.0 * 2 ** (300 / 1200))
+        # 收窄后的边界落在宽范围的pyin候选网格（每半音10格）上
+        for f in (fmin, fmax):
+            bin_num = 1200 * np.log2(f / 65.0) / 10
+            self.assertAlmostEqual(bin_num, round(bin_num))
+        self.assertEqual(getPitchSearchRange([]), (65.0, 2093.0))
+
+    def test_isPitchOutOfRange(self):
+        in_range = np.array([np.nan, 200.0, 220.0, 250.0, 300.0])
+        self.assertFalse(isPitchOutOfRange(in_range, 100.0, 400.0))
+        at_edge = np.array([399.0, 398.0, 220.0, 250.0])
+        self.assertTrue(isPitchOutOfRange(at_edge, 100.0, 400.0))
+        unvoiced = np.array([np.nan] * 19 + [220.0])
+        self.assertTrue(isPitchOutOfRange(unvoiced, 100.0, 400.0))
+
+    def test_calAudioFreqInRange(self):
+        # 固定分帧配置，不随setting.ANALYSIS_MODE变化
+        sr = 22050
+        t = np.arange(sr) / sr
+        frame = {"analysis_mode": "default"}
+
+        def tone(freq, amp=1.0, duration_s=1.0):
+            n = int(duration_s * sr)
+            return amp * (np.sin(2 * np.pi * freq * t[:n]) + 0.5 * np.sin(2 * np.pi * 2 * freq * t[:n]))
+
+        # 演唱高于fmax：收窄范围会锁定到1/2分频，粗估已超出范围，直接返回宽范围的结果
+        y = tone(440.0)
+        narrow_array = calAudioFreq(y, sr, fmin=100.0, fmax=300.0, backend="yin", to_list=False, **frame)[0]
+        self.assertAlmostEqual(np.nanmedian(narrow_array), 220.0, delta=5.0)
+        freq_array, _ = calAudioFreqInRange(y, sr, freq_range=(100.0, 300.0), backend="yin", to_list=False, **frame)
+        np.testing.assert_array_equal(freq_array, calAudioFreq(y, sr, backend="yin", to_list=False, **frame)[0])
+        self.assertAlmostEqual(np.nanmedian(freq_array), 440.0, delta=5.0)
+
+        # 粗估在范围内，但正式估计发声帧过少，用宽范围重算：开头响亮的440Hz不再被估计为220Hz
+        y = np.concatenate([tone(440.0, duration_s=0.05), tone(220.0, amp=0.4)])
+        probe_array = calAudioFreq(y, sr, backend="acf", to_list=False, **frame)[0]
+        self.assertFalse(isPitchOutOfRange(probe_array, 100.0, 300.0))
+        freq_array, _ = calAudioFreqInRange(
+            y, sr, freq_range=(100.0, 300.0), backend="acf", top_db=3.0, to_list=False, **frame
+        )
+        expect_array = calAudioFreq(y, sr, backend="acf", top_db=3.0, to_list=False, **frame)[0]
+        np.testing.assert_array_equal(freq_array, expect_array)
+        self.assertAlmostEqual(np.nanmedian(freq_array), 440.0, delta=5.0)
+
+
+class TestAnalysisConfig(unittest.TestCase):
+    def setUp(self) -> None:
+        # 44.1kHz录音，0.5~1.5秒为220Hz谐波音
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.audio_dir = Path(self.tmp_dir.name)
+        (self.audio_dir / "wav").mkdir()
+        sr = 44100
+        t = np.arange(sr) / sr
+        tone = np.sin(2 * np.pi * 220 * t) + 0.5 * np.sin(2 * np.pi * 440 * t)
+        silence = np.zeros(sr // 2)
+        sf.write(self.audio_dir / "wav" / "song.wav", np.concatenate([silence, tone, silence]) * 0.5, sr)
+        self.eigen_dict = {"eigen_list": [{"word": "起", "eigen": {"start_time": 0.5, "end_time": 1.5}}]}
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_defaultMode(self):
+        # 默认沿用旧的22050Hz分析方式，"default"、"low"须显式指定
+        self.assertEqual(ANALYSIS_MODE, "legacy")
+        self.assertEqual(getAnalysisConfig(), getAnalysisConfig("legacy"))
+
+    def test_configReachesPipeline(self):
+        for analysis_mode in ANALYSIS_CONFIG_DICT:
+            with self.subTest(analysis_mode=analysis_mode):
+                config = getAnalysisConfig(analysis_mode)
+                y, sr = xfrVocalTract(self.audio_dir, "wav", "song.wav", analysis_mode=analysis_mode)
+                self.assertEqual(sr, config["sr"])
+                self.assertAlmostEqual(len(y) / sr, 2.0, delta=1e-3)
+
+                freq_array, times_array = calAudioFreq(
+                    y, sr, backend="yin", analysis_mode=analysis_mode, to_list=False
+                )
+                np.testing.assert_allclose(np.diff(times_array), config["hop_length"] / config["sr"])
+
+                rs_dict = getPerWordFeat(self.eigen_dict, freq_array, times_array)
+                self.assertAlmostEqual(rs_dict["eigen_list"][0]["eigen"]["freq"], 220.0, delta=2.0)
+                self.assertAlmostEqual(rs_dict["eigen_list"][0]["eigen"]["times"], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import unittest
+import numpy as np
+from scipy.spatial.distance import cdist
+from setting import *
+from score.audio_score import *
+from score.dtw_kernel import *
+
+
+class TestPitchDtw(unittest.TestCase):
+    def setUp(self) -> None:
+        # 乐谱逐字频率，第3个字音符未知
+        self.org_freq = np.array([261.63, 293.66, np.nan, 329.63, 392.0, 349.23, 329.63, 261.63])
+        self.key_freq_array = np.stack([self.org_freq, self.org_freq * 2 ** (3 / 12), self.org_freq / 2])
+
+    def test_keyInvariant(self):
+        # 整体升3个半音演唱，音准距离与原调演唱相同
+        asr_freq = self.org_freq[np.isfinite(self.org_freq)]
+        for mode in PITCH_SCORE_FUNC_DICT:
+            self.assertAlmostEqual(usePitchDtw(asr_freq * 2 ** (3 / 12), self.org_freq, mode=mode), 0.0)
+            self.assertAlmostEqual(
+                usePitchDtw(asr_freq * 1.5 * [1, 1, 1.05, 1, 1, 1, 1], self.org_freq, mode=mode),
+                usePitchDtw(asr_freq * [1, 1, 1.05, 1, 1, 1, 1], self.org_freq, mode=mode),
+            )
+        np.testing.assert_allclose(calPitchInterval([100, 200, 0, 400]), [1200, 1200])
+
+    def test_estimateKey(self):
+        asr_freq = self.org_freq[np.isfinite(self.org_freq)] * 2 ** (3 / 12) * 2 ** (20 / 1200)
+        key_index, offset_cents = estimateKey(asr_freq, self.key_freq_array)
+        self.assertEqual(key_index, 1)
+        self.assertAlmostEqual(offset_cents, 20.0)
+
+
+class TestDtwKernel(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        self.pair_list = [(rng.normal(size=n), np.round(rng.normal(size=m), 1)) for n, m in [(1, 1), (7, 12), (30, 25)]]
+        self.pair_list.append((rng.normal(size=(9, 2)), rng.normal(size=(6, 2))))
+
+    def test_matchDtwPython(self):
+        # 与dtw-python逐位一致，窗口内没有可行路径时同样抛出ValueError
+        for x, y in self.pair_list:
+            for dist_method in DTW_METRIC_DICT:
+                for window_type, window_size in [(None, None), ("sakoechiba", 3), ("itakura", None)]:
+                    with self.subTest(shape=(x.shape, y.shape), dist_method=dist_method, window_type=window_type):
+                        window_args = {} if window_size is None else {"window_size": window_size}
+                        try:
+                            expect = dtw.dtw(
+                                x, y, dist_method=dist_method, window_type=window_type, window_args=window_args
+                            ).normalizedDistance
+                        except ValueError:
+                            with self.assertRaises(ValueError):
+                                calDtwDistance(x, y, dist_method, window_type, window_size)
+                            continue
+                        dist = calDtwDistance(x, y, dist_method, window_type, window_size)
+                        self.assertEqual(dist, expect)
+                        # 下界不大于真实距离，阈值不小于真实距离时不提前放弃
+                        norm = len(x) + len(y)
+                        self.assertLessEqual(lbKim(x, y, dist_method) / norm, dist)
+                        self.assertLessEqual(lbKeogh(x, y, dist_method, window_type, window_size) / norm, dist)
+                        self.assertEqual(calDtwDistance(x, y, dist_method, window_type, window_size, dist), dist)
+        x, y = self.pair_list[2]
+        self.assertEqual(useDtw(x, y), useDtw(x, y, engine="dtw-python"))
+
+    def test_searchDtw(self):
+        x = self.pair_list[2][0]
+        y_list = [y for _, y in self.pair_list[:3]] + [x * 2 + 1, x[::-1], x * 2 + 1]
+        dist_list = [calDtwDistance(x, y) for y in y_list]
+        best_index, search_dist_list = searchDtw(x, y_list)
+        self.assertEqual(best_index, int(np.argmin(dist_list)))
+        self.assertEqual(search_dist_list[best_index], min(dist_list))
+        # 剪枝跳过的候选为inf，其余与逐个计算相同
+        for search_dist, dist in zip(search_dist_list, dist_list):
+            self.assertIn(search_dist, (dist, np.inf))
+        # z-score标准化后，线性变换的副本与x最近，重复的候选取靠前的一个
+        best_index, best_dist = searchNearestDtw(x, y_list[1:])
+        self.assertEqual(best_index, 2)
+        self.assertAlmostEqual(best_dist, 0.0)
+
+    def test_batchDtw(self):
+        # 与逐对调用useDtw相同，没有可行路径时为nan
+        x_list = [x for x, _ in self.pair_list[1:3]]
+        y_list = [y for _, y in self.pair_list[1:3]] + [x_list[1] * 2 + 1]
+        for window_type, window_size in [(None, None), ("sakoechiba", 3)]:
+            dist_matrix, best_index_array = batchDtw(
+                x_list, y_list, window_type=window_type, window_size=window_size, max_workers=2
+            )
+            for i, x in enumerate(x_list):
+                for j, y in enumerate(y_list):
+                    try:
+                        dist = useDtw(x, y, window_type=window_type, window_size=window_size)
+                    except ValueError:
+                        self.assertTrue(np.isnan(dist_matrix[i, j]))
+                        continue
+                    self.assertEqual(dist_matrix[i, j], dist)
+        # 剪枝后每条查询的最近参考与最小距离不变
+        dist_matrix, best_index_array = batchDtw(x_list, y_list)
+        prune_matrix, prune_index_array = batchDtw(x_list, y_list, prune=True)
+        np.testing.assert_array_equal(prune_index_array, best_index_array)
+        self.assertEqual(best_index_array[1], 2)
+        for i, best_index in enumerate(best_index_array):
+            self.assertEqual(prune_matrix[i, best_index], dist_matrix[i, best_index])
+        self.assertEqual(batchDtw([], y_list)[0].shape, (0, 3))
+
+    def test_calDtwPath(self):
+        # 距离与规整路径都与dtw-python相同，各格局部距离按步进权重求和等于累计代价
+        for x, y in self.pair_list:
+            for dist_method in DTW_METRIC_DICT:
+                with self.subTest(shape=(x.shape, y.shape), dist_method=dist_method):
+                    expect = dtw.dtw(x, y, dist_method=dist_method)
+                    dist, path = calDtwPath(x, y, dist_method)
+                    self.assertEqual(dist, expect.normalizedDistance)
+                    np.testing.assert_array_equal(path, np.column_stack([expect.index1, expect.index2]))
+                    local_matrix = cdist(x.reshape(len(x), -1), y.reshape(len(y), -1), dist_method)
+                    local_dist = local_matrix[path[:, 0], path[:, 1]]
+                    self.assertAlmostEqual(getPathWeight(path) @ local_dist / (len(x) + len(y)), dist)
+
+    def test_useJointDtw(self):
+        org_freq = np.array([261.63, 293.66, 329.63, 392.0, 349.23, 329.63, 261.63])
+        org_times = np.array([0.5, 0.5, 1.0, 0.5, 0.5, 1.0, 2.0])
+        # 整体升调、放慢演唱，漏唱第3个字
+        keep = [0, 1, 3, 4, 5, 6]
+        freq_dist, tempo_dist, path = useJointDtw(
+            org_freq[keep] * 1.5, org_times[keep] * 1.2, org_freq, org_times, return_path=True
+        )
+        self.assertEqual(path[:, 0].tolist(), [0, 1, 1, 2, 3, 4, 5])
+        self.assertEqual(path[:, 1].tolist(), [0, 1, 2, 3, 4, 5, 6])
+        # 两个维度的距离都不小于各自单独DTW的最优距离
+        self.assertGreaterEqual(freq_dist, useDtw(org_freq[keep], org_freq) - 1e-12)
+        self.assertGreaterEqual(tempo_dist, useDtw(org_times[keep], org_times) - 1e-12)
+        self.assertAlmostEqual(useJointDtw(org_freq * 2, org_times, org_freq, org_times)[0], 0.0)
+
+        # 未发声的字（基频为nan）对齐前去掉，路径仍使用原下标；有效的字不足以标准化时距离为nan，不抛出异常
+        asr_freq = org_freq * 1.5
+        asr_freq[2] = np.nan
+        freq_dist, tempo_dist, path = useJointDtw(asr_freq, org_times, org_freq, org_times, return_path=True)
+        expect = useJointDtw(org_freq[keep] * 1.5, org_times[keep], org_freq, org_times, return_path=True)
+        self.assertEqual((freq_dist, tempo_dist), expect[:2])
+        self.assertEqual(path[:, 0].tolist(), np.array(keep)[expect[2][:, 0]].tolist())
+        self.assertEqual(path[:, 1].tolist(), expect[2][:, 1].tolist())
+        freq_dist, tempo_dist, path = useJointDtw([np.nan, 220.0], [0.5, 0.5], org_freq, org_times, return_path=True)
+        self.assertTrue(np.isnan(freq_dist) and np.isnan(tempo_dist))
+        self.assertEqual(path.shape, (0, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import unittest
+import tempfile
+import pickle
+import json
+import numpy as np
+from setting import *
+from preprocess.compiled_score import *
+
+
+class TestCompiledScore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.json_dir = Path(self.tmp_dir.name)
+        eigen_dict = {
+            "bpm": 60,
+            "time_signature": [4, 4],
+            "eigen_list": [
+                {"word": "起", "eigen": {"note": ["1", "+1"], "time": [0.5, 0.5]}},
+                {"word": "来", "eigen": {"note": ["5"], "time": [1]}},
+            ],
+        }
+        with open(self.json_dir / "song.json", "w", encoding="utf-8") as f:
+            json.dump(eigen_dict, f, ensure_ascii=False)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_compile(self):
+        score = getCompiledScore("song", json_dir=self.json_dir, cache_dir=None)
+        self.assertEqual(score.key_list[:4], ["A", "A/2", "A#", "A#/2"])
+        self.assertEqual(score.note_freq.shape, (24, 3))
+        # 逐字特征与对每个字调用np.average、np.sum一致
+        feat_dict = score.toFeatDict()
+        for i, key in enumerate(score.key_list):
+            eigen_list = feat_dict[key]["eigen_list"]
+            self.assertEqual(
+                score.freq[i].tolist(),
+                [np.average(item["eigen"]["note"], weights=item["eigen"]["time"]) for item in eigen_list],
+            )
+        np.testing.assert_array_equal(score.freq[score.getKeyIndex("G/2")], score.freq[score.getKeyIndex("G")] / 2)
+        self.assertEqual(score.duration.tolist(), [1.0, 1.0])
+        self.assertEqual(feat_dict["C"]["bpm"], 60)
+
+        # 字典格式与CompiledScore可以互相转换，序列化后内容不变
+        self.assertEqual(asCompiledScore(feat_dict).toFeatDict(), feat_dict)
+        self.assertIs(asCompiledScore(score), score)
+        self.assertEqual(pickle.loads(pickle.dumps(score)).toFeatDict(), feat_dict)
+
+    def test_persist(self):
+        cache_dir = self.json_dir / "compiled"
+        score = getCompiledScore("song", json_dir=self.json_dir, cache_dir=cache_dir)
+        self.assertIs(getCompiledScore("song", json_dir=self.json_dir, cache_dir=cache_dir), score)
+        npz_list = list(cache_dir.glob("song_*.npz"))
+        self.assertEqual(len(npz_list), 1)
+        npz_path = npz_list[0]
+
+        # 源文件修改时间与保存时不同即视为过期
+        json_mtime = os.stat(self.json_dir / "song.json").st_mtime_ns
+        loaded = CompiledScore.load(npz_path, [json_mtime, os.stat(RAW_DATA_DIR / FREQ_CSV).st_mtime_ns])
+        self.assertEqual(loaded.toFeatDict(), score.toFeatDict())
+        self.assertIsNone(CompiledScore.load(npz_path, [json_mtime + 1, 0]))
+
+    def test_csvChange(self):
+        # 频率表修改后重新编译使用新表；不同频率表的.npz各存一份
+        cache_dir = self.json_dir / "compiled"
+        data_dir = self.json_dir / "data"
+        data_dir.mkdir()
+        csv_path = data_dir / FREQ_CSV
+        for freq_do, mtime_ns in [(262.63, 10 ** 18), (200.0, 2 * 10 ** 18)]:
+            with open(csv_path, "w", encoding="gbk", newline="") as f:
+                f.write(f"音名1,音名2,唱名,频率\nC,B#,1,{freq_do}\nC,B#,5,392\n")
+            os.utime(csv_path, ns=(mtime_ns, mtime_ns))
+            score = getCompiledScore("song", json_dir=self.json_dir, data_dir=data_dir, cache_dir=cache_dir)
+            self.assertEqual(score.note_freq[score.getKeyIndex("C"), 0], freq_do)
+            rs_score = CompiledScore.load(
+                next(cache_dir.glob("song_*.npz")), [os.stat(self.json_dir / "song.json").st_mtime_ns, mtime_ns]
+            )
+            self.assertEqual(rs_score.note_freq[rs_score.getKeyIndex("C"), 0], freq_do)
+        getCompiledScore("song", json_dir=self.json_dir, cache_dir=cache_dir)
+        self.assertEqual(len(list(cache_dir.glob("song_*.npz"))), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
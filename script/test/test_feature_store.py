@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import unittest
+import tempfile
+import time
+import numpy as np
+from setting import *
+from preprocess.feature_store import *
+
+
+class TestPitchFeatureStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = PitchFeatureStore(Path(self.tmp_dir.name), max_bytes=None)
+        self.freq_array = np.array([np.nan, 220.0, 221.5, np.nan, np.nan, 330.25, np.nan])
+        self.prob_array = np.array([0.0, 0.9, 0.95, 0.1, 0.0, 0.8, 0.2])
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_putGet(self):
+        key = PitchFeatureStore.makeKey("abc", backend="pyin", fmin=65.0)
+        self.assertIsNone(self.store.get(key))
+        self.store.put(key, self.freq_array, self.prob_array, sr=16000, hop_length=384)
+        freq_array, times_array, prob_array = self.store.get(key)
+        np.testing.assert_array_equal(freq_array, self.freq_array.astype(np.float32))
+        np.testing.assert_allclose(times_array, np.arange(7) * 384 / 16000)
+        np.testing.assert_allclose(prob_array, self.prob_array, atol=1e-3)
+        # 参数不同的键互不干扰
+        self.assertNotIn(PitchFeatureStore.makeKey("abc", backend="yin", fmin=65.0), self.store)
+
+    def test_evict(self):
+        key_list = [PitchFeatureStore.makeKey(str(i)) for i in range(3)]
+        for key in key_list[:2]:
+            self.store.put(key, self.freq_array, self.prob_array, sr=16000, hop_length=384)
+            time.sleep(0.01)
+        # 读取第一条，使第二条成为最久未使用的条目
+        self.store.get(key_list[0])
+        entry_bytes = sum(nbytes for _, nbytes, _ in self.store._scanEntry()) // 2
+        self.store.max_bytes = entry_bytes * 2
+        self.store.put(key_list[2], self.freq_array, self.prob_array, sr=16000, hop_length=384)
+        self.assertIn(key_list[0], self.store)
+        self.assertNotIn(key_list[1], self.store)
+        self.assertIn(key_list[2], self.store)
+
+    def test_shared(self):
+        # 同一进程内共用一个实例，总大小只在第一次写入时统计
+        store = getFeatureStore(self.store.store_dir, max_bytes=10**6)
+        self.assertIs(getFeatureStore(self.store.store_dir, max_bytes=10**6), store)
+        store.put(PitchFeatureStore.makeKey("abc"), self.freq_array, self.prob_array, sr=16000, hop_length=384)
+        self.assertIsNotNone(store._total_bytes)
+        self.assertIsNot(getFeatureStore(self.store.store_dir, max_bytes=None), store)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import unittest
+import sys
+import types
+from unittest import mock
+from setting import *
+from preprocess.funasr_go import *
+
+
+class _StubAutoModel(object):
+    """代替funasr.AutoModel，记录每次初始化的参数。"""
+
+    init_list = []
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        _StubAutoModel.init_list.append(kwargs)
+
+
+class TestAsrModelManager(unittest.TestCase):
+    def setUp(self) -> None:
+        _StubAutoModel.init_list.clear()
+        releaseAsrModel()
+        # funasr在loadAsrModel内部才导入，替换sys.modules中的模块即可
+        self.patch = mock.patch.dict(sys.modules, {"funasr": types.SimpleNamespace(AutoModel=_StubAutoModel)})
+        self.patch.start()
+
+    def tearDown(self) -> None:
+        self.patch.stop()
+        releaseAsrModel()
+
+    def test_reuse(self):
+        # 同一(model, vad, punc, revision)组合只初始化一次
+        model = loadAsrModel(punc_model=None)
+        self.assertIs(loadAsrModel(punc_model=None), model)
+        self.assertEqual(len(_StubAutoModel.init_list), 1)
+        self.assertNotIn("punc_model", model.kwargs)
+        self.assertEqual(model.kwargs["vad_model"], ASR_VAD_MODEL)
+
+        # 组合中任一组件不同都是另一个实例
+        punc_model = loadAsrModel(punc_model=ASR_PUNC_MODEL)
+        self.assertIsNot(punc_model, model)
+        self.assertEqual(punc_model.kwargs["punc_model"], ASR_PUNC_MODEL)
+        self.assertIsNot(loadAsrModel(punc_model=None, model_revision="v0.0.0"), model)
+        self.assertEqual(len(_StubAutoModel.init_list), 3)
+
+    def test_release(self):
+        model = loadAsrModel(punc_model=None)
+        punc_model = loadAsrModel(punc_model=ASR_PUNC_MODEL)
+        # 只释放指定组合，其余组合仍复用
+        releaseAsrModel(ASR_MODEL, punc_model=None)
+        self.assertIsNot(loadAsrModel(punc_model=None), model)
+        self.assertIs(loadAsrModel(punc_model=ASR_PUNC_MODEL), punc_model)
+        # 不指定模型时全部释放
+        releaseAsrModel()
+        self.assertIsNot(loadAsrModel(punc_model=ASR_PUNC_MODEL), punc_model)
+        self.assertEqual(len(_StubAutoModel.init_list), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
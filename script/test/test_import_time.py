@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import unittest
+import subprocess
+import sys
+from setting import *
+
+# 各入口模块的导入耗时预算（秒），以python -X importtime统计的累计耗时为准
+IMPORT_BUDGET_DICT = {
+    "util": 0.3,
+    "preprocess.prep_extract": 0.3,
+    "preprocess.prep_notation": 0.3,
+    "preprocess.audio_eigen_new": 0.3,
+    "preprocess.funasr_go": 0.5,
+    "score.audio_score": 0.5,
+    "run.run_v2": 0.6,
+    "run.temp_audio_catog_seg": 0.6,
+}
+
+# 只应在真正调用到相关函数时才导入的重量级依赖
+HEAVY_MODULE_LIST = ["funasr", "torch", "librosa", "numba", "sklearn", "dtw", "pandas", "pypinyin"]
+
+SCRIPT_DIR = Path(__file__).resolve().parents[1]
+
+
+def measureImportTime(module_name: str) -> dict:
+    """
+    在新的解释器中以python -X importtime导入module_name，返回{模块名: 累计导入耗时（秒）}。
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=SCRIPT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+
+    cost_dict = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        cost_dict[name.strip()] = int(cumulative_us) / 1e6
+
+    return cost_dict
+
+
+class TestImportTime(unittest.TestCase):
+    def test_importBudget(self):
+        for module_name, budget in IMPORT_BUDGET_DICT.items():
+            with self.subTest(module=module_name):
+                cost_dict = measureImportTime(module_name)
+                heavy_list = [m for m in HEAVY_MODULE_LIST if m in cost_dict]
+                # 入口模块不应在导入阶段加载重量级依赖
+                self.assertEqual(heavy_list, [], f"{module_name} imports heavy modules at import time")
+                self.assertLessEqual(
+                    cost_dict[module_name], budget, f"{module_name}: {cost_dict[module_name]:.3f}s (budget {budget}s)"
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
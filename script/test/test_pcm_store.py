@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import unittest
+import tempfile
+import shutil
+import time
+import numpy as np
+import soundfile as sf
+from setting import *
+from preprocess.pcm_store import *
+
+
+class TestPcmStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        tmp_path = Path(self.tmp_dir.name)
+        self.store = PcmStore(tmp_path / "pcm")
+        t = np.arange(22050 * 2) / 22050
+        self.audio_path = tmp_path / "a.wav"
+        sf.write(self.audio_path, 0.5 * np.stack([np.sin(2 * np.pi * 220 * t)] * 2, axis=1), 22050)
+        # 改名的副本内容相同，只转换一次
+        self.copy_path = tmp_path / "b.wav"
+        shutil.copy(self.audio_path, self.copy_path)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_prepareLoad(self):
+        hash_list = self.store.prepare([self.audio_path, self.copy_path], max_workers=1)
+        self.assertEqual(hash_list[0], hash_list[1])
+        self.assertEqual(len(list(self.store.store_dir.glob("*/*.npy"))), 1)
+
+        # 以int16存储，读取时还原为float32，误差不超过半个量化步长
+        pcm_path = self.store.getPcmPath(self.audio_path)
+        self.assertEqual(np.load(pcm_path, mmap_mode="r").dtype, np.int16)
+        y, sr = self.store.load(self.audio_path)
+        expect_y, _ = decodeAudio(self.audio_path, sr=PCM_STORE_SR)
+        self.assertEqual((sr, y.dtype), (PCM_STORE_SR, np.float32))
+        np.testing.assert_allclose(y, expect_y, rtol=0, atol=0.5 / PCM_SCALE)
+        self.assertAlmostEqual(self.store.getDuration(self.copy_path), 2.0)
+
+        # 区间读取按采样点截取
+        y_range, _ = self.store.load(audio_hash=hash_list[0], start=0.5, end=1.25)
+        np.testing.assert_array_equal(y_range, y[8000:20000])
+
+        # 索引写回后，新打开的存储不必重新计算哈希
+        self.assertIn(os.path.abspath(self.audio_path), PcmStore(self.store.store_dir).hash_index)
+
+    def test_float32Compat(self):
+        # 旧版本以float32存储的PCM原样读取
+        audio_hash = self.store.ensure(self.audio_path)
+        pcm_path = self.store.getPcmPath(self.audio_path)
+        expect_y = self.store.load(audio_hash=audio_hash)[0]
+        np.save(pcm_path, expect_y)
+        y = self.store.load(audio_hash=audio_hash, start=0.5)[0]
+        self.assertEqual(y.dtype, np.float32)
+        np.testing.assert_array_equal(y, expect_y[8000:])
+
+    def test_evict(self):
+        tmp_path = Path(self.tmp_dir.name)
+        path_list = []
+        for i in range(3):
+            path_list.append(tmp_path / f"tone_{i}.wav")
+            sf.write(path_list[-1], 0.1 * (i + 1) * np.ones(16000), 16000)
+        entry_bytes = os.stat(self.store.getPcmPath(path_list[0])).st_size
+        time.sleep(0.01)
+        self.store.prepare(path_list[1:2], max_workers=1)
+        time.sleep(0.01)
+        # 读取第一条，使第二条成为最久未使用的PCM
+        self.store.load(path_list[0])
+        self.store.max_bytes = entry_bytes * 2
+        self.store.prepare(path_list[2:], max_workers=1)
+        pcm_path_list = [self.store._getPcmPath(self.store.getHash(audio_path)) for audio_path in path_list]
+        self.assertEqual([pcm_path.exists() for pcm_path in pcm_path_list], [True, False, True])
+        # 被淘汰的音频再次使用时重新转换
+        self.assertEqual(len(self.store.load(path_list[1])[0]), 16000)
+
+    def test_shared(self):
+        # 同一进程内共用一个实例，索引只读取一次
+        store = getPcmStore(self.store.store_dir)
+        self.assertIs(getPcmStore(self.store.store_dir), store)
+        self.assertIsNot(getPcmStore(self.store.store_dir, sr=8000), store)
+        self.assertIsNot(getPcmStore(self.store.store_dir, max_bytes=None), store)
+
+
+if __name__ == "__main__":
+    unittest.main()
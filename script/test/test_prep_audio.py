@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import unittest
+import tempfile
+import numpy as np
+import soundfile as sf
+from setting import *
+from preprocess.prep_audio import *
+from preprocess import prep_audio
+
+
+class TestDecodeAudio(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.sr = 22050
+        t = np.arange(self.sr * 3) / self.sr
+        self.data = 0.5 * np.stack([np.sin(2 * np.pi * 220 * t), np.sin(2 * np.pi * 330 * t)], axis=1)
+        self.audio_path = Path(self.tmp_dir.name) / "stereo.wav"
+        sf.write(self.audio_path, self.data, self.sr, subtype="FLOAT")
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_audioInfo(self):
+        info = getAudioInfo(self.audio_path)
+        self.assertEqual((info["sr"], info["channels"], info["frames"]), (self.sr, 2, len(self.data)))
+        self.assertAlmostEqual(info["duration"], 3.0)
+
+    def test_rangeDecode(self):
+        y, sr = decodeAudio(self.audio_path, mono=False)
+        self.assertEqual((sr, y.shape), (self.sr, (2, len(self.data))))
+        # 区间读取与完整解码后切片一致
+        y_range, _ = decodeAudio(self.audio_path, mono=False, start=1.0, end=2.5)
+        np.testing.assert_array_equal(y_range, y[:, self.sr: int(2.5 * self.sr)])
+        # 先混合为单声道
+        y_mono, _ = decodeAudio(self.audio_path, start=1.0, end=2.5)
+        np.testing.assert_allclose(y_mono, y_range.mean(axis=0), atol=1e-6)
+
+    def test_resample(self):
+        y, sr = decodeAudio(self.audio_path, sr=16000, start=0.5, end=1.5)
+        self.assertEqual((sr, y.ndim, len(y)), (16000, 1, 16000))
+        self.assertEqual(y.dtype, np.float32)
+
+    def test_exportSegments(self):
+        y, _ = decodeAudio(self.audio_path, mono=False)
+        output_dir = Path(self.tmp_dir.name) / "segment"
+        record_list = exportSegments(self.audio_path, [(0.5, 1.0), (2.0, None)], output_dir, audio_format="wav")
+        self.assertEqual(
+            [(record["start_sample"], record["end_sample"]) for record in record_list],
+            [(self.sr // 2, self.sr), (2 * self.sr, 3 * self.sr)],
+        )
+        for record in record_list:
+            segment, sr = sf.read(record["output_path"], always_2d=True, dtype="float32")
+            self.assertEqual(sr, self.sr)
+            np.testing.assert_allclose(segment.T, y[:, record["start_sample"]: record["end_sample"]], atol=1e-4)
+
+    def test_segmentManifest(self):
+        manifest_path = Path(self.tmp_dir.name) / "segment_manifest.json"
+        saveSegmentManifest([makeSegmentRecord(self.audio_path, 0.5, 2.0)], manifest_path)
+        record = loadSegmentManifest(manifest_path)[os.path.abspath(self.audio_path)]
+        self.assertEqual(record, {"start_sample": self.sr // 2, "end_sample": 2 * self.sr, "sr": self.sr})
+        # 按区间读取与导出实际剪辑文件的采样点一致
+        start, end = getSegmentWindow(self.audio_path, manifest_path)
+        y, _ = decodeAudio(self.audio_path, mono=False)
+        y_window, _ = decodeAudio(self.audio_path, mono=False, start=start, end=end)
+        np.testing.assert_array_equal(y_window, y[:, record["start_sample"]: record["end_sample"]])
+        self.assertIsNone(getSegmentWindow(Path(self.tmp_dir.name) / "other.wav", manifest_path))
+
+
+class TestNoiseReduce(unittest.TestCase):
+    def setUp(self) -> None:
+        self.sr = 16000
+        t = np.arange(self.sr * 8) / self.sr
+        # 每2秒唱1秒，其余为静音
+        self.signal = (0.3 * np.sin(2 * np.pi * 220 * t) * (np.sin(2 * np.pi * 0.25 * t) > 0)).astype(np.float32)
+        self.noise = np.random.default_rng(0).standard_normal(len(t)).astype(np.float32)
+
+    def tearDown(self) -> None:
+        # 噪声样本按会话缓存在模块全局变量中，避免影响其它测试
+        prep_audio._noise_profile_dict.clear()
+
+    def test_chooseMode(self):
+        # 干净的录音直接跳过，原样返回
+        y, sr, mode, _ = noiseReduce(y=self.signal, sr=self.sr, return_mode=True)
+        self.assertEqual(mode, "skip")
+        np.testing.assert_array_equal(y, self.signal)
+        _, _, mode, _ = noiseReduce(y=self.signal + 0.1 * self.noise, sr=self.sr, return_mode=True)
+        self.assertEqual(mode, "nonstationary")
+        # 强制指定降噪方式时不再跳过
+        _, _, mode, _ = noiseReduce(y=self.signal, sr=self.sr, stationary=True, return_mode=True)
+        self.assertEqual(mode, "stationary")
+
+    def test_noiseProfile(self):
+        y = self.signal + 0.01 * self.noise
+        y_noise = getNoiseProfile(y, self.sr, speech_start=1.0, session="test_device")
+        self.assertEqual(len(y_noise), int(0.9 * self.sr))
+        # 同一会话直接复用第一次估计的噪声样本
+        self.assertIs(getNoiseProfile(session="test_device"), y_noise)
+        self.assertIsNone(getNoiseProfile(y, self.sr, speech_start=0.3))
+
+
+if __name__ == "__main__":
+    unittest.main()
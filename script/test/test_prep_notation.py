@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import unittest
+import tempfile
+import numpy as np
+from setting import *
+from preprocess.prep_notation import *
+
+
+class TestNoteFreq(unittest.TestCase):
+    def setUp(self) -> None:
+        self.eigen_dict_t = {
+            "eigen_list": [
+                {"word": "起", "eigen": {"note": ["1", "+1"], "time": [0.5, 0.5]}},
+                {"word": "来", "eigen": {"note": ["--5", "0.25"], "time": [1.0, 0.5]}},
+            ]
+        }
+
+    def test_calNoteFreq(self):
+        freq_table = getNoteFreqTable()
+        self.assertIs(freq_table, getNoteFreqTable())
+        with self.assertRaises(TypeError):
+            freq_table["G"]["1"] = 0.0
+
+        calNoteFreq(self.eigen_dict_t, note_sig="G")
+        note_list = [item["eigen"]["note"] for item in self.eigen_dict_t["eigen_list"]]
+        g_1, g_5 = freq_table["G"]["1"], freq_table["G"]["5"]
+        self.assertEqual(note_list, [[g_1, g_1 * 2], [g_5 * 0.25, None]])
+
+    def test_freqMatrix(self):
+        key_sig_list = ["C", "B#", "G"]
+        freq_array = calNoteFreqArray(["1", "-6", "+3", "1"], key_sig_list)
+        self.assertEqual(freq_array.shape, (3, 4))
+        # 同音异名的调号查到同一行
+        np.testing.assert_array_equal(freq_array[0], freq_array[1])
+        np.testing.assert_array_equal(freq_array[2], calNoteFreqArray(["1", "-6", "+3", "1"], "G"))
+
+    def test_equalTemperament(self):
+        # 频率表不存在时按十二平均律计算
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            freq_table = getNoteFreqTable(Path(tmp_dir), FREQ_CSV)
+        self.assertEqual(freq_table["A"]["1"], 440.0)
+        self.assertEqual(freq_table["Bb"]["1"], freq_table["A#"]["1"])
+        self.assertEqual(freq_table["C"]["7"], 493.88)
+
+
+if __name__ == "__main__":
+    unittest.main()
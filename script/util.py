@@ -9,12 +9,57 @@
 import concurrent.futures
 # noinspection PyUnresolvedReferences
 import multiprocessing
+import importlib
 import psutil
 import csv
-from pypinyin import pinyin, lazy_pinyin, Style
+import hashlib
 from setting import *
 
 
+class LazyModule(object):
+    """延迟导入的模块代理，第一次访问属性时才真正导入模块。
+
+    torch/funasr、librosa/numba、sklearn、pandas、pypinyin等重量级依赖在模块顶层用lazyImport声明后，
+    只有真正调用到相关函数时才付出导入开销，multipuleProcess启动的子进程也不会在导入阶段重复加载。
+
+    属性：
+        module_name(str): 被代理的模块名，如"librosa"或"sklearn.cluster"。
+    """
+
+    def __init__(self, module_name: str):
+        self.__dict__["module_name"] = module_name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        if self._module is None:
+            self.__dict__["_module"] = importlib.import_module(self.module_name)
+        return self._module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule '{self.module_name}' ({state})>"
+
+
+def lazyImport(module_name: str) -> LazyModule:
+    """
+    返回module_name的延迟导入代理，用法与import语句得到的模块对象相同。
+
+    >>> pd = lazyImport("pandas")
+    >>> pd
+    <LazyModule 'pandas' (not loaded)>
+    """
+    return LazyModule(module_name)
+
+
+pypinyin = lazyImport("pypinyin")
+
+
 def multipuleProcess(
         func_name=None,
         arg_list: list = None,
@@ -149,10 +194,49 @@ def gbkXfrFstLetter(gbk_str: str, style: int) -> str:
         pattern = re.compile(r'[^\u4e00-\u9fa5]')
         return pattern.sub('', gbk_str)
     elif style == 1:
-        pinyin_list = lazy_pinyin(gbk_str)
+        pinyin_list = pypinyin.lazy_pinyin(gbk_str)
         pinyin_result = " ".join("".join(inner_list) for inner_list in pinyin_list)
     elif style == 2:
-        pinyin_list = pinyin(gbk_str, style=Style.FIRST_LETTER)
+        pinyin_list = pypinyin.pinyin(gbk_str, style=pypinyin.Style.FIRST_LETTER)
         pinyin_result = "".join("".join(inner_list) for inner_list in pinyin_list)
     reg_pinyin_result = re.sub(r"[^a-z\s]", "", pinyin_result)
-    return reg_pinyin_result
\ No newline at end of file
+    return reg_pinyin_result
+
+
+def getAnalysisConfig(analysis_mode: str = None) -> dict:
+    """
+    返回分析配置{"sr", "frame_length", "hop_length"}的副本。
+
+    参数：
+    - analysis_mode (str, 可选): setting.ANALYSIS_CONFIG_DICT中的键，缺省为setting.ANALYSIS_MODE。
+
+    >>> getAnalysisConfig("low")["sr"]
+    8000
+    """
+    if analysis_mode is None:
+        analysis_mode = ANALYSIS_MODE
+    if analysis_mode not in ANALYSIS_CONFIG_DICT:
+        raise ValueError(
+            f"unknown analysis mode {analysis_mode!r}, expected one of {list(ANALYSIS_CONFIG_DICT)}"
+        )
+
+    return dict(ANALYSIS_CONFIG_DICT[analysis_mode])
+
+
+def calFileHash(file_path, chunk_size: int = 1 << 20) -> str:
+    """
+    按文件内容计算sha1哈希，用作内容寻址缓存的键。文件按chunk_size分块读取，不会一次性载入内存。
+
+    参数：
+    - file_path (Path 或 str): 文件路径。
+    - chunk_size (int, 默认1MB): 每次读取的字节数。
+
+    返回：
+    - 十六进制形式的sha1字符串。
+    """
+    sha1 = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha1.update(chunk)
+
+    return sha1.hexdigest()